@@ -0,0 +1,248 @@
+"""
+Контроль допуска задач в очередь по ее глубине.
+
+Контроллер периодически (не чаще раза в ADMISSION_SAMPLE_INTERVAL секунд)
+получает глубину очередей задач и число воркеров пассивным queue_declare,
+оценивает время ожидания новой задачи и либо отклоняет ее с рекомендуемым
+временем повтора, либо возвращает оценку времени завершения. Модуль общий
+для REST API и не зависит от конкретного способа подключения к RabbitMQ.
+
+Глубина складывается из всех очередей, в которых задачи ждут воркеров:
+входной ml_tasks, очереди воркеров справедливой диспетчеризации
+ml_tasks_fair, интерактивной полосы и очереди пользовательских подочередей
+диспетчера. Диспетчер быстро опустошает ml_tasks, поэтому свою очередь
+(сумму подочередей ml_tasks.user.*) он сообщает отдельно: последнее значение
+лежит в ADMISSION_BACKLOG_QUEUE. Воркеры считаются по потребителям
+интерактивной очереди, которую читает каждый воркер при любом режиме.
+
+Снимок обновляется блокирующими вызовами pika: в асинхронных обработчиках
+admit() вызывается в пуле потоков.
+"""
+import os
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from ml_service import codec
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Очереди, сообщения в которых ждут воркеров; несуществующие очереди пропускаются
+ADMISSION_QUEUES = [
+    q.strip()
+    for q in os.getenv("ADMISSION_QUEUES", "ml_tasks,ml_tasks_fair,ml_tasks_interactive").split(",")
+    if q.strip()
+]
+# Очередь, число потребителей которой равно числу воркеров (ее читает каждый воркер)
+ADMISSION_WORKER_QUEUE = os.getenv("ADMISSION_WORKER_QUEUE", "ml_tasks_interactive")
+# Очередь, в которой диспетчер хранит последнее значение длины своих подочередей
+ADMISSION_BACKLOG_QUEUE = os.getenv("ADMISSION_BACKLOG_QUEUE", "ml_tasks_backlog")
+# Отчет диспетчера старше этого срока не учитывается (диспетчер остановлен), секунды
+ADMISSION_BACKLOG_MAX_AGE = float(os.getenv("ADMISSION_BACKLOG_MAX_AGE", "30"))
+# Максимально допустимое ожидаемое время ожидания, секунды
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "600"))
+ADMISSION_SAMPLE_INTERVAL = float(os.getenv("ADMISSION_SAMPLE_INTERVAL", "5"))
+# Среднее время обработки одной задачи воркером, секунды
+ADMISSION_AVG_TASK_SECONDS = float(os.getenv("ADMISSION_AVG_TASK_SECONDS", "2.0"))
+# Границы заголовка Retry-After, секунды
+ADMISSION_MIN_RETRY_AFTER = 1
+ADMISSION_MAX_RETRY_AFTER = 300
+# Retry-After, когда у очереди нет ни одного воркера
+ADMISSION_NO_WORKERS_RETRY_AFTER = 60
+
+
+def backlog_queue_arguments() -> dict:
+    """Аргументы очереди отчетов диспетчера: хранится только последний отчет."""
+    return {"x-max-length": 1}
+
+
+def encode_backlog_report(backlog: int) -> bytes:
+    """Тело отчета диспетчера о длине его подочередей."""
+    return codec.dumps({"backlog": backlog, "reported_at": time.time()})
+
+
+def decode_backlog_report(body: bytes, max_age: float = ADMISSION_BACKLOG_MAX_AGE) -> int:
+    """
+    Длина подочередей диспетчера из отчета.
+
+    Returns:
+        int: Длина или 0, если отчет устарел
+    """
+    report = codec.loads(body)
+    if time.time() - float(report["reported_at"]) > max_age:
+        return 0
+    return int(report["backlog"])
+
+
+class AdmissionRejected(Exception):
+    """Очередь перегружена, задача не принимается."""
+
+    def __init__(self, retry_after: int, estimated_wait: Optional[float]):
+        self.retry_after = retry_after
+        self.estimated_wait = estimated_wait
+        if estimated_wait is None:
+            message = "Нет доступных воркеров для обработки задач"
+        else:
+            message = f"Очередь перегружена: ожидаемое время ожидания {int(estimated_wait)} с"
+        super().__init__(message)
+
+
+@dataclass
+class QueueSample:
+    """Снимок состояния очередей."""
+    depth: int
+    consumers: int
+    sampled_at: float
+
+
+class AdmissionController:
+    """
+    Допуск задач в очередь с оценкой времени ожидания.
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable,
+        queues: Optional[List[str]] = None,
+        worker_queue: str = ADMISSION_WORKER_QUEUE,
+        backlog_queue: Optional[str] = ADMISSION_BACKLOG_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        sample_interval: float = ADMISSION_SAMPLE_INTERVAL,
+        avg_task_seconds: float = ADMISSION_AVG_TASK_SECONDS,
+        enabled: bool = ADMISSION_ENABLED,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            connection_factory: Функция, создающая соединение pika
+            queues: Очереди, глубина которых суммируется
+            worker_queue: Очередь, по числу потребителей которой считаются воркеры
+            backlog_queue: Очередь отчетов диспетчера о длине подочередей (None - не учитывать)
+            max_wait: Максимально допустимое ожидаемое время ожидания
+            sample_interval: Время жизни снимка состояния очередей
+            avg_task_seconds: Среднее время обработки задачи
+            enabled: Включен ли контроль допуска
+            clock: Источник монотонного времени
+        """
+        self.connection_factory = connection_factory
+        self.queues = list(ADMISSION_QUEUES if queues is None else queues)
+        self.worker_queue = worker_queue
+        self.backlog_queue = backlog_queue
+        self.max_wait = max_wait
+        self.sample_interval = sample_interval
+        self.avg_task_seconds = avg_task_seconds
+        self.enabled = enabled
+        self._clock = clock
+        self._sample: Optional[QueueSample] = None
+        self._failed_at: Optional[float] = None
+
+    def _read_sample(self) -> QueueSample:
+        connection = self.connection_factory()
+        try:
+            depth = 0
+            consumers = 0
+            for queue in set(self.queues) | {self.worker_queue}:
+                # Ошибка пассивного объявления закрывает канал, поэтому каждая очередь
+                # проверяется в своем канале; отсутствующая очередь пуста
+                channel = connection.channel()
+                try:
+                    frame = channel.queue_declare(queue=queue, passive=True)
+                except Exception:
+                    continue
+                if queue in self.queues:
+                    depth += frame.method.message_count
+                if queue == self.worker_queue:
+                    consumers = frame.method.consumer_count
+                channel.close()
+            depth += self._read_backlog(connection)
+            return QueueSample(depth=depth, consumers=consumers, sampled_at=self._clock())
+        finally:
+            connection.close()
+
+    def _read_backlog(self, connection) -> int:
+        """Длина подочередей диспетчера по его последнему отчету."""
+        if not self.backlog_queue:
+            return 0
+        channel = connection.channel()
+        try:
+            method, _, body = channel.basic_get(queue=self.backlog_queue, auto_ack=False)
+        except Exception:
+            # Очереди нет: диспетчер не запущен
+            return 0
+        if method is None:
+            channel.close()
+            return 0
+        # Отчет остается в очереди для следующих чтений
+        channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        channel.close()
+        try:
+            return decode_backlog_report(body)
+        except Exception as e:
+            logger.warning(f"Некорректный отчет диспетчера: {e}")
+            return 0
+
+    def sample(self) -> Optional[QueueSample]:
+        """
+        Возвращает снимок состояния очередей, обновляя его по истечении интервала.
+
+        Returns:
+            QueueSample или None, если состояние очередей неизвестно
+        """
+        now = self._clock()
+        if self._sample is not None and now - self._sample.sampled_at < self.sample_interval:
+            return self._sample
+        # После ошибки не обращаемся к брокеру на каждый запрос
+        if self._failed_at is not None and now - self._failed_at < self.sample_interval:
+            return None
+        try:
+            self._sample = self._read_sample()
+            self._failed_at = None
+        except Exception as e:
+            logger.warning(f"Не удалось получить состояние очередей: {e}")
+            self._sample = None
+            self._failed_at = now
+        return self._sample
+
+    def estimate_wait(self, sample: QueueSample) -> Optional[float]:
+        """
+        Оценивает время ожидания новой задачи.
+
+        Returns:
+            float или None, если воркеров нет и оценка невозможна
+        """
+        if sample.consumers == 0:
+            return None if sample.depth > 0 else 0.0
+        return sample.depth / sample.consumers * self.avg_task_seconds
+
+    def admit(self) -> Optional[datetime]:
+        """
+        Проверяет, можно ли принять новую задачу.
+
+        Returns:
+            datetime или None: Оценка времени завершения задачи, если она известна
+
+        Raises:
+            AdmissionRejected: Ожидаемое время ожидания превышает допустимое
+        """
+        if not self.enabled:
+            return None
+        sample = self.sample()
+        if sample is None:
+            # Состояние очередей неизвестно: задачу принимаем без оценки
+            return None
+
+        wait = self.estimate_wait(sample)
+        if wait is None:
+            raise AdmissionRejected(ADMISSION_NO_WORKERS_RETRY_AFTER, None)
+        if wait > self.max_wait:
+            retry_after = int(min(ADMISSION_MAX_RETRY_AFTER, max(ADMISSION_MIN_RETRY_AFTER, wait - self.max_wait)))
+            logger.warning(
+                f"Задача отклонена: глубина {sample.depth}, воркеров {sample.consumers}, "
+                f"ожидание {int(wait)} с"
+            )
+            raise AdmissionRejected(retry_after, wait)
+
+        return datetime.now() + timedelta(seconds=wait + self.avg_task_seconds)
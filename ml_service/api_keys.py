@@ -0,0 +1,317 @@
+"""
+API ключи для межсерверных клиентов.
+
+Ключ имеет вид mlk_<случайная строка> и показывается пользователю один
+раз при создании. В таблице api_keys хранится только HMAC-SHA256 ключа с
+секретом API_KEY_SECRET: ключи длинные и случайные, поэтому медленный
+bcrypt для них не нужен, а без секрета сервера хеш из утекшей базы
+бесполезен. Проверка ключа - один HMAC и обращение к кэшу процесса;
+в БД запрос уходит только при промахе кэша (не чаще раза в
+API_KEY_CACHE_TTL секунд на ключ), неизвестные ключи кэшируются на
+API_KEY_NEGATIVE_CACHE_TTL секунд.
+
+Ключ несет набор разрешений (scopes) и, при необходимости, собственный
+тариф ограничения частоты запросов. Тариф ключа задается оператором в
+колонке api_keys.tier, без него ключ использует тариф пользователя.
+"""
+import os
+import hmac
+import hashlib
+import secrets
+import logging
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Iterable, List, Optional
+
+from ml_service.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+API_KEY_PREFIX = "mlk_"
+API_KEY_SECRET = os.getenv("API_KEY_SECRET", os.getenv("SECRET_KEY", "secret_key_for_jwt"))
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "10"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+API_KEY_MAX_PER_USER = int(os.getenv("API_KEY_MAX_PER_USER", "10"))
+
+# Разрешения API ключей
+SCOPE_PREDICTIONS_READ = "predictions:read"
+SCOPE_PREDICTIONS_WRITE = "predictions:write"
+API_KEY_SCOPES = frozenset({SCOPE_PREDICTIONS_READ, SCOPE_PREDICTIONS_WRITE})
+
+# Ключ найден и активен, пользователь активен; возвращает данные ключа и пользователя
+LOOKUP_API_KEY_SQL = """
+    UPDATE api_keys k
+    SET last_used_at = NOW()
+    FROM users u
+    WHERE k.key_hash = %(key_hash)s
+      AND k.revoked_at IS NULL
+      AND u.id = k.user_id
+    RETURNING k.id, k.scopes, k.tier, u.id, u.username, u.email, u.is_active, u.tier
+"""
+
+INSERT_API_KEY_SQL = """
+    INSERT INTO api_keys (user_id, name, key_prefix, key_hash, scopes)
+    SELECT %(user_id)s, %(name)s, %(key_prefix)s, %(key_hash)s, %(scopes)s
+    WHERE (SELECT COUNT(*) FROM api_keys WHERE user_id = %(user_id)s AND revoked_at IS NULL) < %(max_keys)s
+    RETURNING id, created_at
+"""
+
+LIST_API_KEYS_SQL = """
+    SELECT id, name, key_prefix, scopes, tier, created_at, last_used_at
+    FROM api_keys
+    WHERE user_id = %(user_id)s AND revoked_at IS NULL
+    ORDER BY created_at
+"""
+
+REVOKE_API_KEY_SQL = """
+    UPDATE api_keys
+    SET revoked_at = NOW()
+    WHERE id = %(key_id)s AND user_id = %(user_id)s AND revoked_at IS NULL
+    RETURNING key_hash
+"""
+
+
+class ApiKeyLimitExceeded(Exception):
+    """У пользователя уже максимальное количество активных ключей."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        super().__init__(f"Нельзя создать больше {max_keys} активных API ключей")
+
+
+@dataclass(frozen=True)
+class ApiKeyPrincipal:
+    """Владелец API ключа и параметры ключа."""
+    key_id: int
+    user_id: int
+    username: str
+    email: Optional[str]
+    is_active: bool
+    scopes: FrozenSet[str]
+    tier: str
+    key_tier: Optional[str]
+
+
+def is_api_key(value: Optional[str]) -> bool:
+    """Похожа ли строка на API ключ (а не на JWT)."""
+    return bool(value) and value.startswith(API_KEY_PREFIX)
+
+
+def generate_api_key() -> str:
+    """Создает новый API ключ."""
+    return API_KEY_PREFIX + secrets.token_urlsafe(32)
+
+
+def hash_api_key(api_key: str, secret: str = API_KEY_SECRET) -> str:
+    """
+    Вычисляет хеш API ключа для хранения и поиска.
+
+    Args:
+        api_key: API ключ
+        secret: Секрет сервера
+
+    Returns:
+        str: HMAC-SHA256 ключа в hex
+    """
+    return hmac.new(secret.encode('utf-8'), api_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def parse_scopes(scopes: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """
+    Проверяет набор разрешений.
+
+    Args:
+        scopes: Разрешения или None для всех разрешений
+
+    Returns:
+        frozenset: Разрешения
+
+    Raises:
+        ValueError: Если разрешение неизвестно или набор пуст
+    """
+    if scopes is None:
+        return API_KEY_SCOPES
+    result = frozenset(scope.strip() for scope in scopes if scope and scope.strip())
+    unknown = result - API_KEY_SCOPES
+    if unknown:
+        raise ValueError(f"Неизвестные разрешения: {', '.join(sorted(unknown))}")
+    if not result:
+        raise ValueError("Нужно указать хотя бы одно разрешение")
+    return result
+
+
+def _split_scopes(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(scope for scope in (value or "").split() if scope)
+
+
+class ApiKeyStore:
+    """
+    Хранилище API ключей в таблице api_keys с кэшем поиска.
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable,
+        cache_ttl: float = API_KEY_CACHE_TTL,
+        negative_cache_ttl: float = API_KEY_NEGATIVE_CACHE_TTL,
+        cache_size: int = API_KEY_CACHE_SIZE,
+        max_per_user: int = API_KEY_MAX_PER_USER
+    ):
+        """
+        Args:
+            connection_factory: Функция, возвращающая DB-API соединение с PostgreSQL
+            cache_ttl: Время жизни найденного ключа в кэше, секунды
+            negative_cache_ttl: Время жизни отметки о неизвестном ключе, секунды
+            cache_size: Максимальное количество ключей в кэше
+            max_per_user: Максимум активных ключей одного пользователя
+        """
+        self.connection_factory = connection_factory
+        self.negative_cache_ttl = negative_cache_ttl
+        self.max_per_user = max_per_user
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def _execute(self, sql: str, params: dict) -> List[tuple]:
+        conn = self.connection_factory()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def cached(self, api_key: str):
+        """
+        Результат поиска ключа из кэша, без обращения к БД.
+
+        Args:
+            api_key: API ключ из запроса
+
+        Returns:
+            ApiKeyPrincipal, False для известного неизвестного ключа или
+            None, если ключа нет в кэше
+        """
+        return self._cache.get(hash_api_key(api_key))
+
+    def lookup(self, api_key: str) -> Optional[ApiKeyPrincipal]:
+        """
+        Находит активный ключ. При промахе кэша выполняет запрос к БД.
+
+        Args:
+            api_key: API ключ из запроса
+
+        Returns:
+            ApiKeyPrincipal или None, если ключ неизвестен или отозван
+        """
+        key_hash = hash_api_key(api_key)
+        cached = self._cache.get(key_hash)
+        if cached is not None:
+            return cached or None
+
+        rows = self._execute(LOOKUP_API_KEY_SQL, {"key_hash": key_hash})
+        if not rows:
+            # Отметка о неизвестном ключе защищает БД от перебора
+            self._cache.set(key_hash, False, ttl=self.negative_cache_ttl)
+            return None
+
+        key_id, scopes, key_tier, user_id, username, email, is_active, user_tier = rows[0]
+        principal = ApiKeyPrincipal(
+            key_id=key_id,
+            user_id=user_id,
+            username=username,
+            email=email,
+            is_active=is_active,
+            scopes=_split_scopes(scopes),
+            tier=key_tier or user_tier,
+            key_tier=key_tier
+        )
+        self._cache.set(key_hash, principal)
+        return principal
+
+    def create(self, user_id: int, name: str, scopes: Optional[Iterable[str]] = None) -> dict:
+        """
+        Создает ключ пользователя.
+
+        Args:
+            user_id: ID пользователя
+            name: Название ключа
+            scopes: Разрешения, по умолчанию все
+
+        Returns:
+            dict: Данные ключа вместе с самим ключом (больше он нигде не доступен)
+
+        Raises:
+            ValueError: Если разрешения некорректны
+            ApiKeyLimitExceeded: Если у пользователя слишком много ключей
+        """
+        key_scopes = parse_scopes(scopes)
+        api_key = generate_api_key()
+        rows = self._execute(INSERT_API_KEY_SQL, {
+            "user_id": user_id,
+            "name": name,
+            "key_prefix": api_key[:len(API_KEY_PREFIX) + 6],
+            "key_hash": hash_api_key(api_key),
+            "scopes": " ".join(sorted(key_scopes)),
+            "max_keys": self.max_per_user
+        })
+        if not rows:
+            raise ApiKeyLimitExceeded(self.max_per_user)
+
+        key_id, created_at = rows[0]
+        logger.info(f"Создан API ключ {key_id} пользователя {user_id}")
+        return {
+            "id": key_id,
+            "name": name,
+            "key": api_key,
+            "key_prefix": api_key[:len(API_KEY_PREFIX) + 6],
+            "scopes": sorted(key_scopes),
+            "tier": None,
+            "created_at": created_at,
+            "last_used_at": None
+        }
+
+    def list(self, user_id: int) -> List[dict]:
+        """
+        Возвращает активные ключи пользователя (без самих ключей).
+
+        Args:
+            user_id: ID пользователя
+        """
+        rows = self._execute(LIST_API_KEYS_SQL, {"user_id": user_id})
+        return [
+            {
+                "id": key_id,
+                "name": name,
+                "key_prefix": key_prefix,
+                "scopes": sorted(_split_scopes(scopes)),
+                "tier": tier,
+                "created_at": created_at,
+                "last_used_at": last_used_at
+            }
+            for key_id, name, key_prefix, scopes, tier, created_at, last_used_at in rows
+        ]
+
+    def revoke(self, user_id: int, key_id: int) -> bool:
+        """
+        Отзывает ключ пользователя.
+
+        Ключ сразу перестает действовать в этом процессе; другие процессы
+        узнают об отзыве не позже чем через API_KEY_CACHE_TTL секунд.
+
+        Args:
+            user_id: ID пользователя
+            key_id: ID ключа
+
+        Returns:
+            bool: False, если активного ключа с таким ID у пользователя нет
+        """
+        rows = self._execute(REVOKE_API_KEY_SQL, {"user_id": user_id, "key_id": key_id})
+        if not rows:
+            return False
+        self._cache.invalidate(rows[0][0])
+        logger.info(f"Отозван API ключ {key_id} пользователя {user_id}")
+        return True
@@ -0,0 +1,108 @@
+"""
+Кэши в памяти процесса.
+
+TTLCache - ограниченный по размеру кэш с временем жизни записей и
+вытеснением давно неиспользуемых. Здесь же находится кэш
+аутентифицированных пользователей: его записи сбрасываются явно при
+изменении или удалении пользователя и в любом случае живут не дольше
+AUTH_USER_CACHE_TTL секунд, поэтому изменения, сделанные другими
+процессами, тоже вступают в силу за ограниченное время.
+
+Завершенные предсказания не меняются, поэтому их сериализованные ответы
+кэшируются по ID и сбрасываются только при отмене или возврате средств;
+PREDICTION_CACHE_TTL лишь ограничивает время жизни записи на случай
+изменений из других процессов.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU кэш с временем жизни записей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            maxsize: Максимальное количество записей
+            ttl: Время жизни записи, секунды
+            clock: Источник монотонного времени
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение или default, если записи нет или она устарела."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if self._clock() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение, вытесняя самую давно использованную запись при переполнении."""
+        with self._lock:
+            self._data[key] = (value, self._clock() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаляет запись."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Аутентифицированные пользователи по subject токена (имени пользователя)
+authenticated_users = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
+
+
+def invalidate_user(username: Optional[str]) -> None:
+    """
+    Сбрасывает кэшированные данные пользователя после его изменения.
+
+    Args:
+        username: Имя пользователя (subject токена)
+    """
+    if username:
+        authenticated_users.invalidate(username)
+
+
+# Ответы по завершенным предсказаниям: ID -> (ID пользователя, тело ответа, ETag)
+completed_predictions = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+
+
+def invalidate_prediction(prediction_id: Optional[str]) -> None:
+    """
+    Сбрасывает кэшированный ответ по предсказанию после отмены или возврата средств.
+
+    Args:
+        prediction_id: ID предсказания
+    """
+    if prediction_id:
+        completed_predictions.invalidate(prediction_id)
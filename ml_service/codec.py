@@ -0,0 +1,110 @@
+"""
+Общий JSON кодек для сообщений RabbitMQ и HTTP ответов.
+
+По умолчанию используется orjson (в несколько раз быстрее стандартного
+json), при его отсутствии - стандартная библиотека. Выбор можно задать
+переменной JSON_CODEC: auto, orjson или json. Кодек работает с bytes
+без промежуточных строк: dumps возвращает bytes в UTF-8, loads принимает
+bytes или str.
+
+Ошибки разбора в обоих вариантах - json.JSONDecodeError (подкласс ValueError).
+Сравнение скорости: python -m ml_service.codec_benchmark
+"""
+import os
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+JSONDecodeError = json.JSONDecodeError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if JSON_CODEC == "orjson" and orjson is None:
+    logger.warning("JSON_CODEC=orjson, но orjson не установлен, используется стандартный json")
+
+BACKEND = "orjson" if orjson is not None and JSON_CODEC in ("auto", "orjson") else "json"
+
+
+def to_serializable(obj: Any) -> Any:
+    """Преобразует типы, которые кодек не сериализует сам."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        # Массивы и скаляры numpy
+        return obj.tolist()
+    raise TypeError(f"Тип {type(obj).__name__} не сериализуется в JSON")
+
+
+def _safe_default(obj: Any) -> Any:
+    try:
+        return to_serializable(obj)
+    except TypeError:
+        return str(obj)
+
+
+def _dumps_json(obj: Any, default) -> bytes:
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads_json(data) -> Any:
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+if BACKEND == "orjson":
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _dumps(obj: Any, default) -> bytes:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+
+    _loads = orjson.loads
+else:
+    _dumps = _dumps_json
+    _loads = _loads_json
+
+
+def dumps(obj: Any, safe: bool = False) -> bytes:
+    """
+    Сериализует объект в JSON.
+
+    Args:
+        obj: Объект для сериализации
+        safe: Преобразовывать неподдерживаемые типы в строки вместо ошибки
+
+    Returns:
+        bytes: JSON в UTF-8
+
+    Raises:
+        TypeError: Если объект не сериализуется и safe=False
+    """
+    return _dumps(obj, _safe_default if safe else to_serializable)
+
+
+def loads(data) -> Any:
+    """
+    Разбирает JSON.
+
+    Args:
+        data: JSON в виде bytes, bytearray, memoryview или str
+
+    Returns:
+        Разобранный объект
+
+    Raises:
+        json.JSONDecodeError: Если данные не являются корректным JSON
+    """
+    return _loads(data)
@@ -0,0 +1,101 @@
+"""
+Сравнение скорости JSON кодеков на типичных сообщениях сервиса.
+
+Запуск: python -m ml_service.codec_benchmark [--number N]
+
+Для стандартного json и orjson (если установлен) измеряется время
+сериализации в bytes и разбора сообщений задачи, результата и страницы
+истории предсказаний.
+"""
+import json
+import time
+import uuid
+import argparse
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def sample_messages() -> dict:
+    """Типичные сообщения: задача, результат и страница истории."""
+    task = {
+        "prediction_id": str(uuid.uuid4()),
+        "user_id": 42,
+        "data": {"text": "Пример текста для анализа тональности " * 20},
+        "source": "api",
+        "timestamp": datetime.now().isoformat(),
+        "deadline": datetime.now().isoformat()
+    }
+    result = {
+        "prediction_id": task["prediction_id"],
+        "result": {
+            "label": "positive",
+            "confidence": 0.9731,
+            "model_version": "mock-1",
+            "latency_ms": 1840,
+            "extras": {"scores": [0.01, 0.0169, 0.9731]}
+        },
+        "timestamp": time.time()
+    }
+    history = {
+        "predictions": [
+            {
+                "prediction_id": str(uuid.uuid4()),
+                "status": "completed",
+                "result": result["result"],
+                "timestamp": datetime.now().isoformat(),
+                "completed_at": datetime.now().isoformat(),
+                "cost": 1.0
+            }
+            for _ in range(100)
+        ]
+    }
+    return {"task": task, "result": result, "history": history}
+
+
+def _measure(func, arg, number: int) -> float:
+    """Среднее время одного вызова, микросекунды."""
+    started = time.perf_counter()
+    for _ in range(number):
+        func(arg)
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def run(number: int) -> None:
+    """Печатает таблицу времени кодирования и разбора."""
+    codecs = {
+        "json": (
+            lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8"),
+            json.loads
+        )
+    }
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+    else:
+        print("orjson не установлен, измеряется только стандартный json")
+
+    print(f"{'сообщение':<10} {'кодек':<8} {'размер, Б':>10} {'dumps, мкс':>12} {'loads, мкс':>12}")
+    for name, message in sample_messages().items():
+        baseline = None
+        for codec_name, (dumps, loads) in codecs.items():
+            encoded = dumps(message)
+            dumps_time = _measure(dumps, message, number)
+            loads_time = _measure(loads, encoded, number)
+            speedup = ""
+            if baseline is None:
+                baseline = (dumps_time, loads_time)
+            else:
+                speedup = f"  (x{baseline[0] / dumps_time:.1f} / x{baseline[1] / loads_time:.1f})"
+            print(
+                f"{name:<10} {codec_name:<8} {len(encoded):>10} "
+                f"{dumps_time:>12.2f} {loads_time:>12.2f}{speedup}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение JSON кодеков")
+    parser.add_argument("--number", type=int, default=2000, help="Количество повторов")
+    run(parser.parse_args().number)
@@ -0,0 +1,168 @@
+"""
+Модель чтения user_dashboard: сводка пользователя одной строкой.
+
+Строка содержит баланс, число завершенных и выполняющихся предсказаний и
+последние DASHBOARD_RECENT_LIMIT предсказаний в готовом JSON. Веб-интерфейс
+и команда бота /summary читают ее по первичному ключу, не обращаясь к
+predictions, balances и transactions.
+
+Строку обновляет проектор (WORKER_MODE=projector) по событиям:
+
+- результаты предсказаний из очереди ml_results;
+- события журнала средств: триггер на balances после фиксации транзакции
+  отправляет ID пользователя в канал PostgreSQL USER_EVENTS_CHANNEL
+  (создание и отмена предсказания, пополнение, возвраты);
+- изменения предсказаний: такой же триггер на predictions срабатывает при
+  вставке и смене статуса. Списание средств может быть зафиксировано
+  отдельно и раньше вставки предсказания, тогда событие баланса придет до
+  появления строки, и сводку обновит уже событие вставки.
+
+Обновление пересобирает строку пользователя из исходных таблиц по индексам
+(счетчики предсказаний - по частичным индексам predictions по user_id),
+поэтому повторные и переставленные события безопасны. Если строки нет или
+она старше DASHBOARD_MAX_AGE секунд (проектор был остановлен и пропустил
+уведомления), она пересобирается при чтении.
+
+Функции работают с соединением psycopg2.
+"""
+import os
+import logging
+from typing import Optional
+
+from ml_service.results import result_json_sql
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_RECENT_LIMIT = int(os.getenv("DASHBOARD_RECENT_LIMIT", "10"))
+DASHBOARD_MAX_AGE = int(os.getenv("DASHBOARD_MAX_AGE", "600"))
+USER_EVENTS_CHANNEL = "user_events"
+
+DASHBOARD_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS user_dashboard (
+        user_id INTEGER PRIMARY KEY,
+        balance DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        completed_predictions INTEGER NOT NULL DEFAULT 0,
+        active_predictions INTEGER NOT NULL DEFAULT 0,
+        recent_predictions JSONB NOT NULL DEFAULT '[]'::jsonb,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+    """,
+    # Уведомление доставляется слушателям только после фиксации транзакции
+    f"""
+    CREATE OR REPLACE FUNCTION notify_user_event() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{USER_EVENTS_CHANNEL}', NEW.user_id::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS balances_user_event ON balances",
+    """
+    CREATE TRIGGER balances_user_event AFTER INSERT OR UPDATE OF amount ON balances
+    FOR EACH ROW EXECUTE FUNCTION notify_user_event()
+    """,
+    # Триггер на секционированной таблице наследуется всеми секциями;
+    # одинаковые уведомления одной транзакции PostgreSQL доставляет один раз
+    "DROP TRIGGER IF EXISTS predictions_user_event ON predictions",
+    """
+    CREATE TRIGGER predictions_user_event AFTER INSERT OR UPDATE OF status ON predictions
+    FOR EACH ROW EXECUTE FUNCTION notify_user_event()
+    """,
+]
+
+# Пересобирает строку пользователя: баланс, счетчики и последние предсказания
+REFRESH_DASHBOARD_SQL = """
+INSERT INTO user_dashboard (
+    user_id, balance, completed_predictions, active_predictions, recent_predictions, updated_at
+)
+SELECT
+    %(user_id)s,
+    COALESCE((SELECT amount FROM balances WHERE user_id = %(user_id)s), 0),
+    (SELECT count(*) FROM predictions WHERE user_id = %(user_id)s AND status = 'completed'),
+    (SELECT count(*) FROM predictions WHERE user_id = %(user_id)s AND status IN ('pending', 'processing')),
+    COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'prediction_id', p.id,
+            'status', p.status,
+            'result', """ + result_json_sql("p.") + """,
+            'timestamp', p.created_at,
+            'completed_at', p.completed_at,
+            'cost', p.cost
+        ) ORDER BY p.created_at DESC)
+        FROM (
+            SELECT id, status, result, label, confidence, model_version, latency_ms, created_at, completed_at, cost
+            FROM predictions
+            WHERE user_id = %(user_id)s
+            ORDER BY created_at DESC
+            LIMIT %(limit)s
+        ) p
+    ), '[]'::jsonb),
+    NOW()
+ON CONFLICT (user_id) DO UPDATE
+SET balance = EXCLUDED.balance,
+    completed_predictions = EXCLUDED.completed_predictions,
+    active_predictions = EXCLUDED.active_predictions,
+    recent_predictions = EXCLUDED.recent_predictions,
+    updated_at = EXCLUDED.updated_at
+"""
+
+READ_DASHBOARD_SQL = """
+SELECT json_build_object(
+    'user_id', user_id,
+    'balance', balance,
+    'completed_predictions', completed_predictions,
+    'active_predictions', active_predictions,
+    'recent_predictions', recent_predictions,
+    'updated_at', updated_at
+)::text,
+updated_at > NOW() - make_interval(secs => %(max_age)s)
+FROM user_dashboard
+WHERE user_id = %(user_id)s
+"""
+
+
+def setup_dashboard(cursor) -> None:
+    """Создает таблицу user_dashboard и триггеры событий средств и предсказаний."""
+    for statement in DASHBOARD_SCHEMA_SQL:
+        cursor.execute(statement)
+
+
+def refresh_dashboard(cursor, user_id) -> None:
+    """
+    Пересобирает строку сводки пользователя. Транзакцию фиксирует вызывающий код.
+
+    Args:
+        cursor: Курсор psycopg2
+        user_id: ID пользователя
+    """
+    cursor.execute(REFRESH_DASHBOARD_SQL, {"user_id": user_id, "limit": DASHBOARD_RECENT_LIMIT})
+
+
+def read_dashboard(conn, user_id) -> Optional[str]:
+    """
+    Читает сводку пользователя по первичному ключу.
+
+    Отсутствующая или устаревшая строка пересобирается.
+
+    Args:
+        conn: Соединение psycopg2
+        user_id: ID пользователя
+
+    Returns:
+        str или None: JSON сводки в формате UserDashboard или None, если
+        строку не удалось получить
+    """
+    params = {"user_id": user_id, "max_age": DASHBOARD_MAX_AGE}
+    with conn.cursor() as cursor:
+        cursor.execute(READ_DASHBOARD_SQL, params)
+        row = cursor.fetchone()
+        if row is not None and row[1]:
+            conn.commit()
+            return row[0]
+
+        refresh_dashboard(cursor, user_id)
+        cursor.execute(READ_DASHBOARD_SQL, params)
+        row = cursor.fetchone()
+    conn.commit()
+    return row[0] if row else None
@@ -6,6 +6,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 
+from ml_service.replicas import DB_REPLICAS, REPLICA_CONNECT_TIMEOUT, Replica, ReplicaRouter, replica_address
+
 # Настройки базы данных PostgreSQL
 DB_HOST = os.getenv("DB_HOST", "database")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
@@ -23,6 +25,23 @@ engine = create_engine(
     echo=False,  # установите True для отладки SQL запросов
 )
 
+def create_replica_engine(replica):
+    """
+    Создает движок реплики с теми же пользователем и базой, что у основного сервера.
+    
+    Args:
+        replica: Адрес реплики host или host:port
+    """
+    host, port = replica_address(replica, DB_PORT)
+    return create_engine(
+        f"postgresql://{DB_USER}:{DB_PASS}@{host}:{port}/{DB_NAME}",
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT},
+    )
+
+# Реплики для чтения (DB_REPLICAS)
+replica_router = ReplicaRouter([Replica(replica, create_replica_engine(replica)) for replica in DB_REPLICAS])
+
 # Создаем базовый класс для наших моделей
 Base = declarative_base()
 
@@ -32,6 +51,21 @@ session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Создаем обертку сессии, которая привязана к текущему потоку
 SessionLocal = scoped_session(session_factory)
 
+# Фабрика сессий только для чтения: движок выбирается при создании сессии
+read_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+def ReadSessionLocal():
+    """
+    Создает сессию для чтения, допускающего отставание реплики.
+    
+    Сессия привязана к реплике с допустимым отставанием или, если такой
+    нет, к основному серверу. Записи через нее не выполняются.
+    
+    Returns:
+        Сессия базы данных
+    """
+    return read_session_factory(bind=replica_router.read_engine(engine))
+
 # Функция для получения сессии базы данных
 def get_db_session():
     """
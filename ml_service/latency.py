@@ -0,0 +1,23 @@
+"""
+Сводка измерений времени (ожидание в очереди, выполнение) для отчетов в лог.
+"""
+from typing import Dict, Iterable
+
+
+def summarize_latencies(values: Iterable[float]) -> Dict[str, float]:
+    """
+    Считает среднее и 95-й перцентиль по окну измерений.
+
+    Args:
+        values: Измерения в секундах
+
+    Returns:
+        dict: {"avg": ..., "p95": ...}, нули для пустого окна
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return {"avg": 0.0, "p95": 0.0}
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+    }
@@ -0,0 +1,176 @@
+"""
+Формат сообщений очередей ml_tasks и ml_results.
+
+Поддерживаются два формата тела, формат указывается в content_type:
+
+- application/json - исходный формат (схема версии 1), словарь в JSON;
+- application/x-msgpack - компактная схема версии 2: msgpack массив
+  [версия, тип, поля в фиксированном порядке..., прочие поля]. Имена полей
+  не передаются, а результаты не повторяют входной текст (input_text),
+  он уже есть в задаче и в БД.
+
+Версия схемы дублируется в заголовке x-schema-version. Тело больше
+MESSAGE_COMPRESS_THRESHOLD байт сжимается (MESSAGE_COMPRESSION: zlib
+или zstd), алгоритм указывается в content_encoding.
+
+Потребители читают оба формата, поэтому переход выполняется постепенно:
+сначала обновляются воркеры и диспетчер, затем производители переключаются
+переменными MESSAGE_FORMAT=msgpack и MESSAGE_COMPRESSION.
+"""
+import os
+import zlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from ml_service import codec
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/x-msgpack"
+SCHEMA_VERSION_HEADER = "x-schema-version"
+SCHEMA_VERSION_JSON = 1
+SCHEMA_VERSION_COMPACT = 2
+
+# Формат и сжатие сообщений, которые публикует этот процесс
+MESSAGE_FORMAT = os.getenv("MESSAGE_FORMAT", "json").lower()
+MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "none").lower()
+MESSAGE_COMPRESS_THRESHOLD = int(os.getenv("MESSAGE_COMPRESS_THRESHOLD", "2048"))
+
+KIND_TASK = "task"
+KIND_RESULT = "result"
+
+# Поля компактной схемы в порядке передачи
+MESSAGE_FIELDS = {
+    KIND_TASK: ("prediction_id", "user_id", "data", "source", "timestamp", "deadline"),
+    KIND_RESULT: ("prediction_id", "result", "timestamp"),
+}
+_KIND_CODES = {KIND_TASK: 1, KIND_RESULT: 2}
+_KINDS_BY_CODE = {code: kind for kind, code in _KIND_CODES.items()}
+
+# Поля результата, повторяющие входные данные задачи
+RESULT_ECHO_FIELDS = ("input_text",)
+
+if MESSAGE_FORMAT == "msgpack" and msgpack is None:
+    logger.warning("MESSAGE_FORMAT=msgpack, но msgpack не установлен, сообщения публикуются в JSON")
+if MESSAGE_COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("MESSAGE_COMPRESSION=zstd, но zstandard не установлен, используется zlib")
+
+
+def _compact(message: Dict[str, Any], kind: str) -> list:
+    fields = MESSAGE_FIELDS[kind]
+    values = [message.get(name) for name in fields]
+    extras = {key: value for key, value in message.items() if key not in fields}
+    if kind == KIND_RESULT and isinstance(values[1], dict):
+        values[1] = {key: value for key, value in values[1].items() if key not in RESULT_ECHO_FIELDS}
+    return [SCHEMA_VERSION_COMPACT, _KIND_CODES[kind], *values, extras]
+
+
+def _expand(struct: list) -> Dict[str, Any]:
+    version, kind_code = struct[0], struct[1]
+    if version > SCHEMA_VERSION_COMPACT:
+        raise ValueError(f"Неподдерживаемая версия схемы сообщения: {version}")
+    kind = _KINDS_BY_CODE.get(kind_code)
+    if kind is None:
+        raise ValueError(f"Неизвестный тип сообщения: {kind_code}")
+    fields = MESSAGE_FIELDS[kind]
+    values = struct[2:2 + len(fields)]
+    message = {name: value for name, value in zip(fields, values) if value is not None}
+    message.update(struct[2 + len(fields)] if len(struct) > 2 + len(fields) else {})
+    return message
+
+
+def _compress(body: bytes, compression: str) -> Tuple[bytes, Optional[str]]:
+    if compression == "none" or len(body) <= MESSAGE_COMPRESS_THRESHOLD:
+        return body, None
+    if compression == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(body), "zstd"
+    return zlib.compress(body), "zlib"
+
+
+def _decompress(body: bytes, content_encoding: Optional[str]) -> bytes:
+    if not content_encoding or content_encoding == "identity":
+        return body
+    if content_encoding == "zlib":
+        return zlib.decompress(body)
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("Сообщение сжато zstd, но zstandard не установлен")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Неизвестное сжатие сообщения: {content_encoding}")
+
+
+def encode_message(
+    message: Dict[str, Any],
+    kind: str = KIND_TASK,
+    message_format: Optional[str] = None,
+    compression: Optional[str] = None
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Кодирует сообщение для публикации.
+
+    Args:
+        message: Сообщение задачи или результата
+        kind: KIND_TASK или KIND_RESULT
+        message_format: json или msgpack, по умолчанию MESSAGE_FORMAT
+        compression: none, zlib или zstd, по умолчанию MESSAGE_COMPRESSION
+
+    Returns:
+        Пара (тело, свойства для pika.BasicProperties: content_type,
+        content_encoding и headers)
+    """
+    message_format = message_format or MESSAGE_FORMAT
+    if message_format == "msgpack" and msgpack is not None:
+        body = msgpack.packb(_compact(message, kind), default=codec.to_serializable, use_bin_type=True)
+        content_type, version = CONTENT_TYPE_MSGPACK, SCHEMA_VERSION_COMPACT
+    else:
+        body = codec.dumps(message)
+        content_type, version = CONTENT_TYPE_JSON, SCHEMA_VERSION_JSON
+
+    body, content_encoding = _compress(body, compression or MESSAGE_COMPRESSION)
+    return body, {
+        "content_type": content_type,
+        "content_encoding": content_encoding,
+        "headers": {SCHEMA_VERSION_HEADER: version}
+    }
+
+
+def decode_message(body: bytes, properties=None) -> Dict[str, Any]:
+    """
+    Декодирует сообщение любого поддерживаемого формата.
+
+    Args:
+        body: Тело сообщения
+        properties: Свойства сообщения pika (content_type, content_encoding)
+
+    Returns:
+        dict: Сообщение в виде словаря, как в схеме версии 1
+
+    Raises:
+        ValueError: Если формат или сжатие не поддерживаются, либо тело повреждено
+    """
+    content_type = getattr(properties, "content_type", None) or CONTENT_TYPE_JSON
+    body = _decompress(body, getattr(properties, "content_encoding", None))
+
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Сообщение в формате msgpack, но msgpack не установлен")
+        try:
+            decoded = msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"Некорректное сообщение msgpack: {e}")
+        return _expand(decoded) if isinstance(decoded, list) else decoded
+
+    if content_type != CONTENT_TYPE_JSON:
+        raise ValueError(f"Неподдерживаемый формат сообщения: {content_type}")
+    return codec.loads(body)
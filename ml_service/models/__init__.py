@@ -6,6 +6,10 @@ from ml_service.models.user import User
 from ml_service.models.balance import Balance 
 from ml_service.models.prediction import Prediction
 from ml_service.models.transaction import Transaction
+from ml_service.models.idempotency_key import IdempotencyKey
+from ml_service.models.rate_limit_bucket import RateLimitBucket
+from ml_service.models.api_key import ApiKey
+from ml_service.models.prediction_stats import PredictionStatsDaily
 
 # Обновляем отношения между моделями
 from sqlalchemy.orm import relationship
@@ -19,5 +23,9 @@ __all__ = [
     "User",
     "Balance",
     "Prediction",
-    "Transaction"
+    "Transaction",
+    "IdempotencyKey",
+    "RateLimitBucket",
+    "ApiKey",
+    "PredictionStatsDaily"
 ] 
\ No newline at end of file
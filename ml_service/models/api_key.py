@@ -0,0 +1,24 @@
+"""
+ORM модель API ключей.
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ml_service.models.base import Base
+
+class ApiKey(Base):
+    """API ключ межсерверного клиента (см. ml_service.api_keys)."""
+    __tablename__ = "api_keys"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    key_prefix = Column(String(20), nullable=False)
+    key_hash = Column(String(64), nullable=False, unique=True)
+    scopes = Column(String(255), nullable=False)
+    tier = Column(String(20), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    last_used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ApiKey(id={self.id}, user_id={self.user_id}, key_prefix={self.key_prefix})>"
@@ -0,0 +1,19 @@
+"""
+ORM модель ключей идемпотентности.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+from ml_service.models.base import Base
+
+class IdempotencyKey(Base):
+    """Ключ идемпотентности запроса на предсказание."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (PrimaryKeyConstraint("user_id", "key"),)
+    
+    user_id = Column(Integer, nullable=False)
+    key = Column(String(255), nullable=False)
+    prediction_id = Column(String(36), nullable=False)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(user_id={self.user_id}, key={self.key}, prediction_id={self.prediction_id})>"
@@ -1,7 +1,7 @@
 """
 ORM модель предсказаний.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ml_service.models.base import Base
@@ -9,16 +9,33 @@ from ml_service.models.base import Base
 class Prediction(Base):
     """Модель предсказания ML модели."""
     __tablename__ = "predictions"
+    __table_args__ = (
+        # Поиск задач по статусу и возрасту: просроченные, зависшие
+        Index("ix_predictions_status_created_at", "status", "created_at"),
+        # История пользователя
+        Index("ix_predictions_user_created_at", "user_id", "created_at"),
+        # Фильтр истории пользователя по метке результата
+        Index("ix_predictions_user_label_created_at", "user_id", "label", "created_at"),
+    )
     
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     input_data = Column(JSON, nullable=False)
-    result = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)  # Дополнительные поля результата (extras)
+    label = Column(String(64), nullable=True)  # Метка результата
+    confidence = Column(Float, nullable=True)  # Уверенность модели
+    model_version = Column(String(50), nullable=True)  # Версия модели
+    latency_ms = Column(Integer, nullable=True)  # Время работы модели, мс
     status = Column(String(20), default="pending", nullable=False)
     cost = Column(Float, default=1.0)
-    created_at = Column(DateTime, default=func.now())
+    # Ключ помесячного секционирования таблицы (ml_service/partitions.py)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
     completed_at = Column(DateTime, nullable=True)
+    deadline = Column(DateTime, nullable=True)  # Срок, после которого задачу не выполняют
     processed_by = Column(String(100), nullable=True)  # ID воркера, обработавшего запрос
+    lease_expires_at = Column(DateTime, nullable=True)  # Срок захвата задачи воркером
+    attempts = Column(Integer, default=0, nullable=False)  # Количество захватов задачи воркерами
+    source = Column(String(20), nullable=True)  # Источник задачи (api, bot): определяет очередь при повторной отправке
     
     # Отношение к пользователю
     user = relationship("User", back_populates="predictions")
@@ -0,0 +1,18 @@
+"""
+ORM модель дневной статистики предсказаний.
+"""
+from sqlalchemy import Column, Integer, String, Date, Float
+from ml_service.models.base import Base
+
+class PredictionStatsDaily(Base):
+    """Счетчик завершенных предсказаний пользователя по дню и метке (см. ml_service.prediction_stats)."""
+    __tablename__ = "prediction_stats_daily"
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    label = Column(String(64), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)  # Сумма уверенности модели
+    
+    def __repr__(self):
+        return f"<PredictionStatsDaily(user_id={self.user_id}, day={self.day}, label={self.label}, count={self.count})>"
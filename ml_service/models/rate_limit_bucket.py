@@ -0,0 +1,16 @@
+"""
+ORM модель корзин ограничения частоты запросов.
+"""
+from sqlalchemy import Column, String, Float, DateTime
+from ml_service.models.base import Base
+
+class RateLimitBucket(Base):
+    """Корзина токенов пользователя (см. ml_service.rate_limit)."""
+    __tablename__ = "rate_limit_buckets"
+    
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<RateLimitBucket(key={self.key}, tokens={self.tokens})>"
@@ -15,6 +15,8 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     type = Column(String(20), nullable=False)  # "topup", "payment", "refund", и т.д.
     status = Column(String(20), default="pending", nullable=False)  # "pending", "completed", "failed"
+    description = Column(String(255), nullable=True)
+    related_entity_id = Column(String(36), nullable=True)  # ID связанной сущности, например предсказания
     created_at = Column(DateTime, default=func.now())
     completed_at = Column(DateTime, nullable=True)
     
@@ -14,6 +14,7 @@ class User(Base):
     email = Column(String(255), nullable=True)
     password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    tier = Column(String(20), default="default", nullable=False)  # Тариф ограничения частоты запросов
     created_at = Column(DateTime, default=func.now())
     
     def __repr__(self):
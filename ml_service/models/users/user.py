@@ -3,11 +3,11 @@
 """
 from typing import Dict, Any, Optional
 from datetime import datetime
-import bcrypt
 from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 
 from ml_service.models.base.entity import Entity
+from ml_service import password_hashing
 from ml_service.models.base.user_role import UserRole
 from ml_service.models.users.roles import RegularUserRole
 
@@ -52,7 +52,7 @@ class User(Entity):
     @staticmethod
     def hash_password(password: str) -> str:
         """
-        Хеширует пароль с использованием bcrypt.
+        Хеширует пароль с использованием bcrypt (стоимость BCRYPT_ROUNDS).
         
         Args:
             password: Пароль для хеширования
@@ -60,10 +60,7 @@ class User(Entity):
         Returns:
             Хеш пароля в виде строки
         """
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password_bytes, salt)
-        return hashed.decode('utf-8')
+        return password_hashing.hash_password(password)
 
     def verify_password(self, password: str) -> bool:
         """
@@ -75,9 +72,7 @@ class User(Entity):
         Returns:
             True если пароль верный, иначе False
         """
-        password_bytes = password.encode('utf-8')
-        hashed_bytes = self.password_hash.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
+        return password_hashing.check_password(password, self.password_hash)
 
     def has_permission(self, permission: str) -> bool:
         """
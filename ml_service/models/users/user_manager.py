@@ -8,6 +8,7 @@ from ml_service.models.users.user import User
 from ml_service.models.users.roles import AdminRole, RegularUserRole
 from ml_service.models.base.user_role import UserRole
 from ml_service.models.transactions.balance import Balance
+from ml_service.cache import invalidate_user
 
 
 class UserManager:
@@ -132,6 +133,8 @@ class UserManager:
         if not user:
             return None
         
+        previous_username = user.username
+        
         # Обновляем поля пользователя
         if 'username' in data:
             user.username = data['username']
@@ -149,6 +152,10 @@ class UserManager:
         self.db.commit()
         self.db.refresh(user)
         
+        # Токены выданы на имя пользователя: сбрасываем кэш для старого и нового имени
+        invalidate_user(previous_username)
+        invalidate_user(user.username)
+        
         return user
     
     def delete_user(self, user_id: str) -> bool:
@@ -165,8 +172,10 @@ class UserManager:
         if not user:
             return False
         
+        username = user.username
         self.db.delete(user)
         self.db.commit()
+        invalidate_user(username)
         
         return True
     
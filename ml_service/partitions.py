@@ -0,0 +1,227 @@
+"""
+Помесячное секционирование таблицы predictions.
+
+Таблица predictions секционируется по диапазону created_at: одна секция
+на календарный месяц (predictions_p202610) и секция по умолчанию
+(predictions_default) для строк вне созданных секций. Запросы по статусу,
+пользователю и времени обходят только индексы нужных секций, а старые
+месяцы архивируются и отсоединяются целиком (python -m ml_service.retention)
+без DELETE и последующего VACUUM.
+
+Первичный ключ секционированной таблицы - (id, created_at), так как
+PostgreSQL требует включать в него ключ секционирования.
+
+Функции принимают курсор psycopg2 и не фиксируют транзакцию.
+"""
+import os
+import re
+import logging
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREDICTIONS_TABLE = "predictions"
+# На сколько месяцев вперед создаются секции
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+# Индексы создаются на секционированной таблице и наследуются всеми секциями
+PREDICTION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_predictions_status_created_at ON predictions (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_predictions_user_created_at ON predictions (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_predictions_user_label_created_at ON predictions (user_id, label, created_at)",
+    # Выполняющиеся предсказания пользователя (сводка user_dashboard)
+    "CREATE INDEX IF NOT EXISTS ix_predictions_user_active ON predictions (user_id) "
+    "WHERE status IN ('pending', 'processing')",
+    # Завершенные предсказания пользователя (счетчик сводки user_dashboard)
+    "CREATE INDEX IF NOT EXISTS ix_predictions_user_completed ON predictions (user_id) "
+    "WHERE status = 'completed'",
+]
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(value) -> date:
+    """Первый день месяца даты или времени."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Первый день месяца, отстоящего от month на months месяцев."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Имя секции месяца, например predictions_p202610."""
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Месяц секции по ее имени или None для секции по умолчанию."""
+    match = _PARTITION_NAME.search(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(cursor, table: str) -> Optional[bool]:
+    """
+    Проверяет, секционирована ли таблица.
+
+    Returns:
+        True или False, либо None, если таблицы нет
+    """
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0] == "p"
+
+
+def list_partitions(cursor, table: str) -> List[Tuple[str, date]]:
+    """
+    Возвращает месячные секции таблицы по возрастанию месяца.
+
+    Returns:
+        list: Пары (имя секции, первый день месяца); секция по умолчанию не входит
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        (table,)
+    )
+    partitions = []
+    for (name,) in cursor.fetchall():
+        month = partition_month(name)
+        if month is not None:
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def create_partition(cursor, table: str, month: date) -> bool:
+    """
+    Создает секцию месяца, если ее нет.
+
+    Строки этого месяца, уже попавшие в секцию по умолчанию, переносятся
+    в новую секцию (иначе PostgreSQL не позволит ее создать).
+
+    Args:
+        cursor: Курсор psycopg2
+        table: Секционированная таблица
+        month: Первый день месяца
+
+    Returns:
+        bool: True, если секция создана
+    """
+    name = partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    lower, upper = month, add_months(month, 1)
+    default = f"{table}_default"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s)",
+        (lower, upper)
+    )
+    if cursor.fetchone()[0]:
+        logger.info(f"Перенос строк за {lower:%Y-%m} из {default} в новую секцию {name}")
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            (lower, upper)
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            (lower, upper)
+        )
+    else:
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+            (lower, upper)
+        )
+    logger.info(f"Создана секция {name}")
+    return True
+
+
+def ensure_partitions(
+    cursor,
+    table: str = PREDICTIONS_TABLE,
+    first_month: Optional[date] = None,
+    months_ahead: int = PARTITION_MONTHS_AHEAD
+) -> int:
+    """
+    Создает секцию по умолчанию и месячные секции до months_ahead месяцев вперед.
+
+    Args:
+        cursor: Курсор psycopg2
+        table: Секционированная таблица
+        first_month: Первый месяц; по умолчанию текущий
+        months_ahead: Сколько месяцев после текущего покрыть секциями
+
+    Returns:
+        int: Количество созданных месячных секций
+    """
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    current = month_start(datetime.utcnow())
+    month = min(first_month or current, current)
+    last = add_months(current, months_ahead)
+    created = 0
+    while month <= last:
+        created += create_partition(cursor, table, month)
+        month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(cursor, table: str = PREDICTIONS_TABLE) -> None:
+    """
+    Переносит обычную таблицу предсказаний в секционированную с тем же именем.
+
+    Старая таблица переименовывается, новая создается по ее структуре,
+    строки копируются в месячные секции, после чего старая таблица удаляется.
+    Выполняется один раз при обновлении схемы, в транзакции вызывающего кода.
+
+    Args:
+        cursor: Курсор psycopg2
+        table: Таблица предсказаний
+    """
+    legacy = f"{table}_unpartitioned"
+    cursor.execute(f"SELECT count(*), min(created_at) FROM {table}")
+    rows, oldest = cursor.fetchone()
+    logger.info(f"Секционирование таблицы {table}: {rows} строк будут перенесены")
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # Имена индексов уникальны в схеме, освобождаем их для новой таблицы
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (legacy,))
+    for (index_name,) in cursor.fetchall():
+        cursor.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:50]}_unpart"')
+
+    cursor.execute(f"UPDATE {legacy} SET created_at = COALESCE(completed_at, NOW()) WHERE created_at IS NULL")
+    cursor.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    cursor.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+    cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+    cursor.execute(f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) REFERENCES users(id)")
+
+    ensure_partitions(cursor, table, month_start(oldest) if oldest else None)
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    cursor.execute(f"DROP TABLE {legacy}")
+    logger.info(f"Таблица {table} секционирована по месяцам")
+
+
+def setup_predictions_partitioning(cursor) -> None:
+    """
+    Приводит таблицу predictions к секционированному виду и создает
+    секции на PARTITION_MONTHS_AHEAD месяцев вперед и индексы.
+
+    Вызывается при инициализации схемы после создания таблицы.
+
+    Args:
+        cursor: Курсор psycopg2
+    """
+    if is_partitioned(cursor, PREDICTIONS_TABLE) is False:
+        convert_to_partitioned(cursor, PREDICTIONS_TABLE)
+    ensure_partitions(cursor, PREDICTIONS_TABLE)
+    for statement in PREDICTION_INDEXES:
+        cursor.execute(statement)
@@ -0,0 +1,241 @@
+"""
+Хеширование паролей bcrypt в отдельном ограниченном пуле потоков.
+
+bcrypt намеренно медленный (100-300 мс на вызов), поэтому в асинхронных
+обработчиках его нельзя вызывать прямо в цикле событий: один вход
+останавливает все остальные запросы. Хеширование выполняется в пуле из
+PASSWORD_HASH_WORKERS потоков (bcrypt отпускает GIL, поэтому потоки
+работают параллельно). Число ожидающих и выполняемых операций ограничено
+PASSWORD_HASH_MAX_PENDING: при всплеске входов лишние запросы сразу
+отклоняются с рекомендуемым временем повтора, а не копятся в очереди.
+Пул периодически пишет в лог время ожидания и время хеширования.
+
+Стоимость хеша задается BCRYPT_ROUNDS. Хеши с другой стоимостью
+остаются рабочими, needs_rehash позволяет прозрачно пересчитать их при
+следующем успешном входе.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+
+import bcrypt
+
+from ml_service.latency import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Максимум операций в пуле (выполняемых и ожидающих)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_REPORT_INTERVAL = float(os.getenv("PASSWORD_HASH_REPORT_INTERVAL", "60"))
+
+
+class PasswordHashOverloaded(Exception):
+    """Пул хеширования паролей переполнен."""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__("Слишком много одновременных попыток входа, повторите позже")
+
+
+def hash_password(password: str, rounds: int = None) -> str:
+    """
+    Хеширует пароль с использованием bcrypt.
+
+    Args:
+        password: Пароль для хеширования
+        rounds: Стоимость хеша, по умолчанию BCRYPT_ROUNDS
+
+    Returns:
+        Хеш пароля в виде строки
+    """
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    """
+    Проверяет пароль по хешу bcrypt.
+
+    Args:
+        password: Пароль для проверки
+        password_hash: Сохраненный хеш
+
+    Returns:
+        True если пароль верный, иначе False
+    """
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Хеш не в формате bcrypt
+        return False
+
+
+def hash_rounds(password_hash: str) -> int:
+    """
+    Возвращает стоимость хеша bcrypt вида $2b$12$...
+
+    Returns:
+        int: Стоимость или 0, если хеш не в формате bcrypt
+    """
+    parts = (password_hash or "").split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return 0
+    return int(parts[2])
+
+
+def needs_rehash(password_hash: str, rounds: int = None) -> bool:
+    """
+    Проверяет, отличается ли стоимость хеша от настроенной.
+
+    Args:
+        password_hash: Сохраненный хеш
+        rounds: Требуемая стоимость, по умолчанию BCRYPT_ROUNDS
+
+    Returns:
+        True если хеш нужно пересчитать
+    """
+    return hash_rounds(password_hash) != (rounds or BCRYPT_ROUNDS)
+
+
+class PasswordHashPool:
+    """
+    Ограниченный пул потоков для операций bcrypt со статистикой.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        report_interval: float = PASSWORD_HASH_REPORT_INTERVAL,
+        window: int = 500
+    ):
+        """
+        Args:
+            workers: Количество потоков
+            max_pending: Максимум выполняемых и ожидающих операций
+            report_interval: Интервал записи статистики в лог, секунды
+            window: Количество последних операций для статистики
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.report_interval = report_interval
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_times: Deque[float] = deque(maxlen=window)
+        self.run_times: Deque[float] = deque(maxlen=window)
+        self._last_report = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        """Количество выполняемых и ожидающих операций."""
+        return self._pending
+
+    def retry_after(self) -> int:
+        """Оценка времени, за которое пул разберет текущую очередь, секунды."""
+        with self._lock:
+            avg_run = sum(self.run_times) / len(self.run_times) if self.run_times else 0.3
+            pending = self._pending
+        return max(1, math.ceil(avg_run * pending / self.workers))
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Выполняет функцию в пуле, не блокируя цикл событий.
+
+        Args:
+            func: Функция bcrypt
+            *args: Аргументы функции
+
+        Returns:
+            Результат функции
+
+        Raises:
+            PasswordHashOverloaded: Если пул переполнен
+        """
+        with self._lock:
+            overloaded = self._pending >= self.max_pending
+            if overloaded:
+                self.rejected += 1
+            else:
+                self._pending += 1
+        if overloaded:
+            raise PasswordHashOverloaded(self.retry_after())
+
+        queued_at = time.monotonic()
+
+        def _call():
+            started = time.monotonic()
+            try:
+                return func(*args)
+            finally:
+                self._observe(started - queued_at, time.monotonic() - started)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, _call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self.maybe_report()
+
+    def _observe(self, wait_time: float, run_time: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self.wait_times.append(wait_time)
+            self.run_times.append(run_time)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Возвращает сводку статистики пула."""
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait": summarize_latencies(self.wait_times),
+                "run": summarize_latencies(self.run_times)
+            }
+
+    def maybe_report(self) -> None:
+        """Пишет статистику в лог, если прошел интервал."""
+        if time.monotonic() - self._last_report < self.report_interval:
+            return
+        self._last_report = time.monotonic()
+        snapshot = self.snapshot()
+        logger.info(
+            f"Пул хеширования паролей: в очереди={snapshot['pending']}, "
+            f"выполнено={snapshot['completed']}, отклонено={snapshot['rejected']}, "
+            f"ожидание avg/p95={snapshot['wait']['avg']}/{snapshot['wait']['p95']} с, "
+            f"хеширование avg/p95={snapshot['run']['avg']}/{snapshot['run']['p95']} с"
+        )
+
+
+password_hash_pool = PasswordHashPool()
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Хеширует пароль в пуле хеширования.
+
+    Raises:
+        PasswordHashOverloaded: Если пул переполнен
+    """
+    return await password_hash_pool.run(hash_password, password)
+
+
+async def check_password_async(password: str, password_hash: str) -> bool:
+    """
+    Проверяет пароль в пуле хеширования.
+
+    Raises:
+        PasswordHashOverloaded: Если пул переполнен
+    """
+    return await password_hash_pool.run(check_password, password, password_hash)
@@ -0,0 +1,125 @@
+"""
+SQL предсказаний, общий для API и Telegram бота: резервирование ключа
+идемпотентности, отмена и возврат средств, страница истории в JSON.
+
+Запросы записаны с параметрами SQLAlchemy (:name) и выполняются в API
+через text(). Бот работает с psycopg2 напрямую и получает те же запросы
+с параметрами %(name)s через pyformat.
+"""
+import re
+
+from ml_service.results import result_json_sql
+
+# Имя параметра :name, но не приведение типа ::type
+_NAMED_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+# Отменяет ожидающее предсказание пользователя и возвращает его стоимость одним
+# запросом. Условие status = 'pending' не дает отменить задачу, которую уже
+# выполнил воркер. Возвращает (id, cost) отмененного предсказания.
+CANCEL_AND_REFUND_SQL = """
+WITH cancelled AS (
+    UPDATE predictions
+    SET status = 'cancelled', completed_at = NOW()
+    WHERE id = :prediction_id AND user_id = :user_id AND status = 'pending'
+    RETURNING id, user_id, cost
+),
+refunds AS (
+    INSERT INTO transactions (user_id, amount, type, status, description, related_entity_id)
+    SELECT user_id, cost, 'refund', 'completed', 'Возврат за отмененное предсказание #' || id, id
+    FROM cancelled
+    RETURNING user_id, amount
+),
+refunded AS (
+    UPDATE balances b
+    SET amount = b.amount + r.amount, updated_at = NOW()
+    FROM refunds r
+    WHERE b.user_id = r.user_id
+    RETURNING b.user_id
+)
+SELECT id, cost FROM cancelled
+"""
+
+
+# Переводит неотправленное в очередь предсказание в статус failed и возвращает его стоимость
+FAIL_UNPUBLISHED_SQL = """
+WITH failed AS (
+    UPDATE predictions
+    SET status = 'failed', completed_at = NOW()
+    WHERE id = :prediction_id AND status = 'pending'
+    RETURNING id, user_id, cost
+),
+refunds AS (
+    INSERT INTO transactions (user_id, amount, type, status, description, related_entity_id)
+    SELECT user_id, cost, 'refund', 'completed', 'Возврат за неотправленное предсказание #' || id, id
+    FROM failed
+    RETURNING user_id, amount
+)
+UPDATE balances b
+SET amount = b.amount + r.amount, updated_at = NOW()
+FROM refunds r
+WHERE b.user_id = r.user_id
+"""
+
+# Резервирует ключ за новым предсказанием. Ключ с истекшим сроком переиспользуется.
+# Параллельный запрос с тем же ключом ждет фиксации первого и получает пустой результат.
+RESERVE_IDEMPOTENCY_KEY_SQL = """
+INSERT INTO idempotency_keys (user_id, key, prediction_id, created_at)
+VALUES (:user_id, :key, :prediction_id, NOW())
+ON CONFLICT (user_id, key) DO UPDATE
+SET prediction_id = EXCLUDED.prediction_id, created_at = EXCLUDED.created_at
+WHERE idempotency_keys.created_at < NOW() - make_interval(secs => :ttl)
+RETURNING prediction_id
+"""
+
+
+# Страница истории собирается в JSON на стороне PostgreSQL в формате PredictionHistory
+# и отдается клиенту без проверки response_model, поэтому ключи должны совпадать
+# со схемой ответа. Фильтр по метке результата использует индекс (user_id, label, created_at).
+USER_PREDICTIONS_JSON_SQL = """
+SELECT json_build_object(
+    'predictions',
+    COALESCE(json_agg(json_build_object(
+        'prediction_id', p.id,
+        'status', p.status,
+        'result', {result},
+        '{created_at_key}', p.created_at,
+        'cost', p.cost,
+        'completed_at', p.completed_at,
+        'estimated_completion', NULL
+    ) ORDER BY p.created_at DESC), '[]'::json)
+)::text
+FROM (
+    SELECT id, status, result, label, confidence, model_version, latency_ms, created_at, completed_at, cost
+    FROM predictions
+    WHERE user_id = :user_id
+      AND (CAST(:label AS VARCHAR) IS NULL OR label = :label)
+    ORDER BY created_at DESC
+    OFFSET :skip LIMIT :limit
+) p
+"""
+
+def pyformat(sql: str) -> str:
+    """
+    Переводит параметры запроса из формата SQLAlchemy в формат psycopg2.
+
+    Args:
+        sql: Запрос с параметрами :name
+
+    Returns:
+        str: Запрос с параметрами %(name)s
+    """
+    return _NAMED_PARAM.sub(r"%(\1)s", sql.replace("%", "%%"))
+
+
+def user_predictions_json_sql(created_at_key: str) -> str:
+    """
+    Запрос страницы истории предсказаний в формате PredictionHistory.
+
+    Args:
+        created_at_key: Имя поля времени создания в схеме PredictionResponse
+            ("timestamp" в REST API, "created_at" в API app)
+
+    Returns:
+        str: Запрос с параметрами :user_id, :label, :skip и :limit
+    """
+    return USER_PREDICTIONS_JSON_SQL.format(result=result_json_sql("p."), created_at_key=created_at_key)
@@ -0,0 +1,167 @@
+"""
+Статистика результатов предсказаний по пользователям.
+
+Таблица prediction_stats_daily хранит счетчики по (пользователь, день
+создания предсказания, метка): число завершенных предсказаний и сумму
+уверенности модели. Воркер увеличивает счетчик в той же транзакции, в
+которой сохраняет результат, поэтому каждое завершение учитывается один раз.
+Чтение статистики за N дней обходит не более N * (число меток) строк,
+независимо от числа предсказаний; счетчики сохраняются и после
+архивирования старых секций predictions.
+
+Пересчет счетчиков по уже сохраненным предсказаниям (например, после
+обновления) выполняется одним проходом по каждой месячной секции:
+
+    python -m ml_service.prediction_stats [--since YYYY-MM-DD]
+"""
+import sys
+import time
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ml_service.partitions import add_months, month_start
+
+logger = logging.getLogger(__name__)
+
+# Период статистики по умолчанию и максимальный, дни
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+
+# Увеличивает счетчик при завершении предсказания (параметры SQLAlchemy text)
+INCREMENT_STATS_SQL = """
+INSERT INTO prediction_stats_daily (user_id, day, label, count, confidence_sum)
+VALUES (:user_id, :day, :label, 1, COALESCE(:confidence, 0))
+ON CONFLICT (user_id, day, label) DO UPDATE
+SET count = prediction_stats_daily.count + 1,
+    confidence_sum = prediction_stats_daily.confidence_sum + EXCLUDED.confidence_sum
+"""
+
+USER_STATS_SQL = """
+SELECT day, label, count, confidence_sum
+FROM prediction_stats_daily
+WHERE user_id = :user_id AND day >= :since
+ORDER BY day, label
+"""
+
+# Пересчитывает счетчики за период одним агрегирующим проходом (параметры psycopg2)
+BACKFILL_SQL = """
+INSERT INTO prediction_stats_daily (user_id, day, label, count, confidence_sum)
+SELECT user_id, created_at::date, label, count(*), COALESCE(sum(confidence), 0)
+FROM predictions
+WHERE status = 'completed' AND label IS NOT NULL
+  AND created_at >= %(lower)s AND created_at < %(upper)s
+GROUP BY user_id, created_at::date, label
+ON CONFLICT (user_id, day, label) DO UPDATE
+SET count = EXCLUDED.count, confidence_sum = EXCLUDED.confidence_sum
+"""
+
+
+def summarize(rows, since: date, days: int) -> Dict[str, Any]:
+    """
+    Собирает ответ статистики из дневных счетчиков.
+
+    Args:
+        rows: Строки (day, label, count, confidence_sum) по возрастанию дня
+        since: Первый день периода
+        days: Длина периода, дни
+
+    Returns:
+        dict: Итоги по меткам и разбивка по дням в формате PredictionStats
+    """
+    labels: Dict[str, Dict[str, float]] = {}
+    daily: List[Dict[str, Any]] = []
+    total = 0
+    for day, label, count, confidence_sum in rows:
+        totals = labels.setdefault(label, {"count": 0, "confidence_sum": 0.0})
+        totals["count"] += count
+        totals["confidence_sum"] += float(confidence_sum)
+        total += count
+        daily.append({"day": day, "label": label, "count": count})
+
+    return {
+        "since": since,
+        "days": days,
+        "total": total,
+        "labels": {
+            label: {
+                "count": totals["count"],
+                "share": round(totals["count"] / total, 4),
+                "avg_confidence": round(totals["confidence_sum"] / totals["count"], 4)
+            }
+            for label, totals in sorted(labels.items(), key=lambda item: -item[1]["count"])
+        },
+        "daily": daily
+    }
+
+
+def stats_since(days: int) -> date:
+    """Первый день периода из days дней, включая сегодняшний (UTC)."""
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def backfill(conn, since: Optional[date] = None, pause: float = 0.0) -> int:
+    """
+    Пересчитывает счетчики по сохраненным предсказаниям помесячно.
+
+    На время пересчета месяца таблица счетчиков блокируется от записи,
+    поэтому завершения предсказаний, идущие параллельно, не теряются и не
+    учитываются дважды: воркеры ждут окончания пересчета месяца.
+
+    Args:
+        conn: Соединение psycopg2
+        since: Первый день пересчета; по умолчанию с самого старого предсказания
+        pause: Пауза между месяцами, секунды
+
+    Returns:
+        int: Число записанных строк счетчиков
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT min(created_at) FROM predictions")
+        oldest = cursor.fetchone()[0]
+    conn.commit()
+    if oldest is None:
+        return 0
+
+    month = month_start(max(since, oldest.date()) if since else oldest)
+    last = month_start(datetime.utcnow())
+    written = 0
+    while month <= last:
+        lower = max(since, month) if since else month
+        upper = add_months(month, 1)
+        started = time.monotonic()
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE prediction_stats_daily IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(BACKFILL_SQL, {"lower": lower, "upper": upper})
+            written += cursor.rowcount
+            logger.info(f"Статистика за {month:%Y-%m} пересчитана: {cursor.rowcount} строк за {time.monotonic() - started:.1f} с")
+        conn.commit()
+        month = upper
+        if pause > 0:
+            time.sleep(pause)
+    return written
+
+
+if __name__ == "__main__":
+    import psycopg2
+    from ml_service.db_config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Пересчет статистики предсказаний по дням")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="Первый день, YYYY-MM-DD")
+    parser.add_argument("--pause", type=float, default=0.0, help="Пауза между месяцами, секунды")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+    try:
+        logger.info(f"Записано строк статистики: {backfill(connection, args.since, args.pause)}")
+    except Exception as e:
+        connection.rollback()
+        logger.error(f"Ошибка при пересчете статистики: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
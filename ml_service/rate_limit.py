@@ -0,0 +1,253 @@
+"""
+Ограничение частоты запросов пользователей (token bucket).
+
+У каждого пользователя своя корзина токенов: емкость и скорость пополнения
+задаются тарифом (RATE_LIMIT_TIERS). Состояние корзин хранится в общем
+хранилище, чтобы все экземпляры API и бот видели одни и те же лимиты.
+Чтобы не обращаться к хранилищу на каждый запрос, экземпляр забирает из
+общей корзины небольшую пачку токенов (RATE_LIMIT_LEASE_FRACTION емкости,
+не меньше одного) и расходует ее локально в течение RATE_LIMIT_LEASE_TTL
+секунд.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Тарифы в формате "имя:запросов/секунд,...": емкость корзины и период ее полного пополнения
+RATE_LIMIT_TIERS = os.getenv("RATE_LIMIT_TIERS", "default:20/60,bot:10/60,premium:120/60")
+RATE_LIMIT_DEFAULT_TIER = "default"
+# Время жизни локальной пачки токенов, секунды
+RATE_LIMIT_LEASE_TTL = float(os.getenv("RATE_LIMIT_LEASE_TTL", "1.0"))
+# Размер локальной пачки токенов как доля емкости корзины
+RATE_LIMIT_LEASE_FRACTION = float(os.getenv("RATE_LIMIT_LEASE_FRACTION", "0.1"))
+# Хранилище корзин: postgres - общее для экземпляров, memory - в памяти процесса
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "postgres")
+
+
+@dataclass(frozen=True)
+class RateLimitTier:
+    """Тариф: емкость корзины и скорость пополнения."""
+    name: str
+    capacity: int
+    refill_per_second: float
+
+
+class RateLimitExceeded(Exception):
+    """Пользователь превысил лимит запросов."""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Слишком много запросов, повторите через {retry_after} с")
+
+
+def parse_tiers(spec: str) -> Dict[str, RateLimitTier]:
+    """
+    Разбирает описание тарифов.
+
+    Args:
+        spec: Строка вида "default:20/60,premium:120/60"
+
+    Returns:
+        dict: Тарифы по имени
+    """
+    tiers = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, limit = item.strip().split(":")
+        requests, seconds = limit.split("/")
+        tiers[name] = RateLimitTier(name, int(requests), int(requests) / float(seconds))
+    return tiers
+
+
+def refill(tokens: float, elapsed: float, tier: RateLimitTier) -> float:
+    """Количество токенов после пополнения за elapsed секунд."""
+    return min(tier.capacity, tokens + max(0.0, elapsed) * tier.refill_per_second)
+
+
+class MemoryRateLimitBackend:
+    """
+    Хранилище корзин в памяти процесса. Используется в тестах и при одном экземпляре.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, tier: RateLimitTier, tokens: int) -> Tuple[int, float]:
+        """
+        Забирает из корзины до tokens токенов.
+
+        Returns:
+            Пара (выдано токенов, секунд до появления следующего токена)
+        """
+        with self._lock:
+            now = self._clock()
+            available, updated_at = self._buckets.get(key, (float(tier.capacity), now))
+            available = refill(available, now - updated_at, tier)
+            granted = min(tokens, int(available))
+            self._buckets[key] = (available - granted, now)
+            return granted, _retry_after(available - granted, tier)
+
+
+# Атомарно пополняет корзину по прошедшему времени и забирает из нее токены
+POSTGRES_ACQUIRE_SQL = """
+INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+VALUES (%(key)s, %(capacity)s, clock_timestamp())
+ON CONFLICT (key) DO UPDATE
+SET tokens = LEAST(%(capacity)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s),
+    updated_at = clock_timestamp()
+RETURNING tokens
+"""
+
+POSTGRES_TAKE_SQL = """
+UPDATE rate_limit_buckets SET tokens = tokens - %(granted)s WHERE key = %(key)s
+"""
+
+
+class PostgresRateLimitBackend:
+    """
+    Общее для экземпляров хранилище корзин в таблице rate_limit_buckets.
+    """
+
+    def __init__(self, connection_factory: Callable):
+        """
+        Args:
+            connection_factory: Функция, возвращающая DB-API соединение с PostgreSQL
+        """
+        self.connection_factory = connection_factory
+
+    def acquire(self, key: str, tier: RateLimitTier, tokens: int) -> Tuple[int, float]:
+        """
+        Забирает из корзины до tokens токенов.
+
+        Returns:
+            Пара (выдано токенов, секунд до появления следующего токена)
+        """
+        conn = self.connection_factory()
+        try:
+            cursor = conn.cursor()
+            # Строка корзины блокируется до конца транзакции
+            cursor.execute(
+                POSTGRES_ACQUIRE_SQL,
+                {"key": key, "capacity": tier.capacity, "rate": tier.refill_per_second}
+            )
+            available = float(cursor.fetchone()[0])
+            granted = min(tokens, int(available))
+            if granted:
+                cursor.execute(POSTGRES_TAKE_SQL, {"key": key, "granted": granted})
+            conn.commit()
+            return granted, _retry_after(available - granted, tier)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def _retry_after(available: float, tier: RateLimitTier) -> float:
+    if available >= 1:
+        return 0.0
+    return (1 - available) / tier.refill_per_second
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов с локальными пачками токенов.
+    """
+
+    def __init__(
+        self,
+        backend,
+        tiers: Optional[Dict[str, RateLimitTier]] = None,
+        lease_ttl: float = RATE_LIMIT_LEASE_TTL,
+        lease_fraction: float = RATE_LIMIT_LEASE_FRACTION,
+        enabled: bool = RATE_LIMIT_ENABLED,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            backend: Хранилище корзин (MemoryRateLimitBackend или PostgresRateLimitBackend)
+            tiers: Тарифы по имени
+            lease_ttl: Время жизни локальной пачки токенов
+            lease_fraction: Размер локальной пачки как доля емкости корзины
+            enabled: Включено ли ограничение
+            clock: Источник монотонного времени
+        """
+        self.backend = backend
+        self.tiers = tiers or parse_tiers(RATE_LIMIT_TIERS)
+        self.lease_ttl = lease_ttl
+        self.lease_fraction = lease_fraction
+        self.enabled = enabled
+        self._clock = clock
+        # Ключ -> (оставшиеся локальные токены, срок действия пачки)
+        self._leases: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def tier(self, name: Optional[str]) -> RateLimitTier:
+        """Тариф по имени; неизвестные тарифы получают тариф по умолчанию."""
+        return self.tiers.get(name or RATE_LIMIT_DEFAULT_TIER) or self.tiers[RATE_LIMIT_DEFAULT_TIER]
+
+    def lease_size(self, tier: RateLimitTier) -> int:
+        """Размер пачки: доля lease_fraction емкости корзины, не меньше одного токена."""
+        return max(1, min(tier.capacity, math.ceil(tier.capacity * self.lease_fraction)))
+
+    def _take_local(self, key: str) -> bool:
+        with self._lock:
+            remaining, expires_at = self._leases.get(key, (0, 0.0))
+            if remaining > 0 and self._clock() < expires_at:
+                self._leases[key] = (remaining - 1, expires_at)
+                return True
+            self._leases.pop(key, None)
+            return False
+
+    def check(self, key: str, tier_name: Optional[str] = None) -> None:
+        """
+        Учитывает запрос пользователя.
+
+        Args:
+            key: Ключ корзины, например "user:42" или "tg:123456"
+            tier_name: Тариф пользователя
+
+        Raises:
+            RateLimitExceeded: Лимит исчерпан
+        """
+        if not self.enabled or self._take_local(key):
+            return
+
+        tier = self.tier(tier_name)
+        try:
+            granted, retry_after = self.backend.acquire(key, tier, self.lease_size(tier))
+        except Exception as e:
+            # Недоступность хранилища лимитов не должна останавливать сервис
+            logger.warning(f"Хранилище лимитов недоступно, запрос пропущен без проверки: {e}")
+            return
+
+        if granted == 0:
+            raise RateLimitExceeded(max(1, math.ceil(retry_after)))
+        if granted > 1:
+            with self._lock:
+                self._leases[key] = (granted - 1, self._clock() + self.lease_ttl)
+
+
+def create_rate_limiter(connection_factory: Callable) -> RateLimiter:
+    """
+    Создает ограничитель с хранилищем из RATE_LIMIT_BACKEND.
+
+    Args:
+        connection_factory: Функция, возвращающая DB-API соединение с PostgreSQL
+
+    Returns:
+        RateLimiter: Ограничитель частоты запросов
+    """
+    if RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(MemoryRateLimitBackend())
+    return RateLimiter(PostgresRateLimitBackend(connection_factory))
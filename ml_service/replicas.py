@@ -0,0 +1,163 @@
+"""
+Маршрутизация чтения на реплики PostgreSQL с учетом отставания.
+
+Записи и чтения, которые должны видеть только что записанные данные, идут
+на основной сервер. Запросы, допускающие небольшое отставание (история и
+выгрузки, статистика, завершенные предсказания), ReplicaRouter направляет
+на одну из реплик DB_REPLICAS по кругу.
+
+Отставание каждой реплики измеряется не чаще раза в
+REPLICA_LAG_CHECK_INTERVAL секунд (время с последней примененной
+транзакции; реплика, применившая весь полученный WAL, отстает на 0).
+Реплика без работающего приема WAL (pg_stat_wal_receiver не в статусе
+streaming) считается недоступной: она могла применить весь полученный WAL
+и при этом сколь угодно отставать от основного сервера. Для чтения статуса
+пользователю БД нужна роль pg_read_all_stats (или права суперпользователя).
+Реплика, отстающая больше REPLICA_MAX_LAG секунд или недоступная,
+исключается до следующей проверки; если подходящих реплик нет, чтение
+идет на основной сервер.
+
+Сервер, не находящийся в режиме восстановления (например, второй локальный
+экземпляр PostgreSQL вместо настоящей реплики), считается репликой без
+отставания. Для проверки без БД в ReplicaRouter можно передать свою
+функцию измерения отставания.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Реплики через запятую: host или host:port (пусто - реплик нет)
+DB_REPLICAS = [host.strip() for host in os.getenv("DB_REPLICAS", "").split(",") if host.strip()]
+# Допустимое отставание реплики, секунды
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+# Как часто измерять отставание, секунды
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "2"))
+# Ожидание соединения с репликой, секунды
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+
+# NULL - реплика не получает WAL от основного сервера
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def replica_address(replica: str, default_port: int):
+    """
+    Разбирает адрес реплики.
+
+    Returns:
+        tuple: (хост, порт)
+    """
+    host, _, port = replica.partition(":")
+    return host, int(port) if port else default_port
+
+
+def measure_lag(engine) -> float:
+    """
+    Отставание реплики в секундах.
+
+    Raises:
+        RuntimeError: Реплика не получает WAL от основного сервера
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as connection:
+        lag = connection.execute(text(REPLICA_LAG_SQL)).scalar()
+    if lag is None:
+        raise RuntimeError("прием WAL от основного сервера не работает")
+    return float(lag)
+
+
+class Replica:
+    """
+    Реплика и результат последнего измерения ее отставания.
+    """
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+
+
+class ReplicaRouter:
+    """
+    Выбирает реплику для чтения или основной сервер.
+    """
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float = REPLICA_MAX_LAG,
+        check_interval: float = REPLICA_LAG_CHECK_INTERVAL,
+        probe: Callable = measure_lag
+    ):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.probe = probe
+        self._lock = threading.Lock()
+        self._next = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def _check(self, replica: Replica) -> None:
+        """Измеряет отставание реплики и сообщает об изменении ее доступности."""
+        try:
+            lag = self.probe(replica.engine)
+        except Exception as e:
+            lag = None
+            logger.warning(f"Реплика {replica.name} недоступна: {e}")
+
+        was_available = self._available(replica)
+        replica.lag = lag
+        if lag is not None and lag > self.max_lag and was_available:
+            logger.warning(f"Реплика {replica.name} отстает на {lag:.1f} с, чтение идет на основной сервер")
+        elif self._available(replica) and not was_available:
+            logger.info(f"Реплика {replica.name} используется для чтения (отставание {lag:.1f} с)")
+
+    def _available(self, replica: Replica) -> bool:
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def choose(self) -> Optional[Replica]:
+        """
+        Выбирает реплику для чтения по кругу.
+
+        Устаревшее измерение отставания обновляет один из запросов, остальные
+        используют предыдущее значение и не ждут проверки.
+
+        Returns:
+            Replica или None, если чтение должно идти на основной сервер
+        """
+        if not self.replicas:
+            return None
+
+        for _ in range(len(self.replicas)):
+            now = time.monotonic()
+            with self._lock:
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                due = now - replica.checked_at >= self.check_interval
+                if due:
+                    replica.checked_at = now
+            if due:
+                self._check(replica)
+            if self._available(replica):
+                self.replica_reads += 1
+                return replica
+        self.primary_reads += 1
+        return None
+
+    def read_engine(self, primary):
+        """Движок для чтения: реплика или основной сервер primary."""
+        replica = self.choose()
+        return replica.engine if replica is not None else primary
@@ -0,0 +1,131 @@
+"""
+Типизированный результат предсказания.
+
+Результат хранится в отдельных колонках таблицы predictions (label,
+confidence, model_version, latency_ms). В JSON колонке result остаются
+только дополнительные поля модели (extras). Входной текст в результат не
+копируется: он уже хранится в input_data.
+
+Клиентам API и боту результат отдается одним объектом (result_view и
+RESULT_JSON_SQL). Поле prediction повторяет label для старых клиентов.
+Строки, сохраненные до появления колонок (label IS NULL), отдаются как есть.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Версия модели, записываемая в результаты
+MODEL_VERSION = os.getenv("MODEL_VERSION", "mock-1")
+
+RESULT_FIELDS = ("label", "confidence", "model_version", "latency_ms")
+
+# Результат предсказания в виде JSON объекта; {p} - префикс колонок, например "p."
+RESULT_JSON_SQL = """
+CASE WHEN {p}label IS NULL THEN {p}result::jsonb
+ELSE COALESCE({p}result::jsonb, '{{}}'::jsonb) || jsonb_build_object(
+    'label', {p}label,
+    'prediction', {p}label,
+    'confidence', {p}confidence,
+    'model_version', {p}model_version,
+    'latency_ms', {p}latency_ms
+) END
+"""
+
+
+def result_json_sql(prefix: str = "") -> str:
+    """
+    SQL выражение результата предсказания в формате result_view.
+
+    Args:
+        prefix: Префикс колонок таблицы predictions, например "p."
+
+    Returns:
+        str: SQL выражение типа jsonb
+    """
+    return RESULT_JSON_SQL.format(p=prefix).strip()
+
+
+@dataclass
+class PredictionResult:
+    """Результат предсказания модели."""
+    label: str
+    confidence: float
+    model_version: str = MODEL_VERSION
+    latency_ms: int = 0
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Результат для сообщения в очередь ml_results."""
+        data = {name: getattr(self, name) for name in RESULT_FIELDS}
+        if self.extras:
+            data["extras"] = self.extras
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PredictionResult":
+        """
+        Восстанавливает результат из словаря to_dict.
+
+        Raises:
+            ValueError: Если в словаре нет метки или уверенности
+        """
+        if data.get("label") is None or data.get("confidence") is None:
+            raise ValueError("В результате предсказания нет label или confidence")
+        return cls(
+            label=str(data["label"]),
+            confidence=float(data["confidence"]),
+            model_version=data.get("model_version") or MODEL_VERSION,
+            latency_ms=int(data.get("latency_ms") or 0),
+            extras=dict(data.get("extras") or {})
+        )
+
+    def columns(self) -> Dict[str, Any]:
+        """Значения колонок таблицы predictions."""
+        values = {name: getattr(self, name) for name in RESULT_FIELDS}
+        values["result"] = self.extras or None
+        return values
+
+
+def result_view(
+    label: Optional[str],
+    confidence: Optional[float],
+    model_version: Optional[str],
+    latency_ms: Optional[int],
+    extras: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Собирает результат предсказания для ответа клиенту.
+
+    Args:
+        label: Метка результата
+        confidence: Уверенность модели
+        model_version: Версия модели
+        latency_ms: Время работы модели, мс
+        extras: Дополнительные поля (колонка result)
+
+    Returns:
+        dict или None: Результат, как его возвращает RESULT_JSON_SQL
+    """
+    if label is None:
+        # Строка сохранена до появления колонок результата
+        return extras
+    view = dict(extras or {})
+    view.update({
+        "label": label,
+        "prediction": label,
+        "confidence": confidence,
+        "model_version": model_version,
+        "latency_ms": latency_ms
+    })
+    return view
+
+
+def prediction_result_view(prediction) -> Optional[Dict[str, Any]]:
+    """Результат ORM объекта Prediction для ответа клиенту."""
+    return result_view(
+        prediction.label,
+        prediction.confidence,
+        prediction.model_version,
+        prediction.latency_ms,
+        prediction.result
+    )
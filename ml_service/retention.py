@@ -0,0 +1,217 @@
+"""
+Архивирование и отсоединение старых секций таблицы predictions.
+
+Запуск (например, раз в сутки по расписанию):
+
+    python -m ml_service.retention [--dry-run] [--keep-months N] [--archive-dir DIR]
+
+Задание создает секции на PARTITION_MONTHS_AHEAD месяцев вперед, затем
+каждую месячную секцию старше RETENTION_MONTHS месяцев:
+
+1. выгружает в DIR/<секция>.jsonl.gz (одна JSON строка на предсказание),
+   читая именованным курсором пачками по RETENTION_BATCH_SIZE строк с
+   паузой RETENTION_PAUSE секунд между пачками, чтобы не нагружать БД;
+2. сверяет число выгруженных строк с числом строк секции;
+3. отсоединяет секцию (DETACH PARTITION) с ожиданием блокировки не дольше
+   RETENTION_LOCK_TIMEOUT и удаляет ее (или оставляет отдельной таблицей
+   с --keep-detached).
+
+Режим --dry-run только показывает план: секции, число строк и размер.
+Файл архива сначала пишется во временный файл и переименовывается после
+сверки, поэтому прерванный запуск можно просто повторить.
+"""
+import os
+import sys
+import gzip
+import time
+import argparse
+import logging
+from datetime import date, datetime
+from typing import List, Tuple
+
+import psycopg2
+
+from ml_service import codec
+from ml_service.db_config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS
+from ml_service.partitions import (
+    PREDICTIONS_TABLE,
+    PARTITION_MONTHS_AHEAD,
+    add_months,
+    month_start,
+    list_partitions,
+    ensure_partitions
+)
+
+logger = logging.getLogger(__name__)
+
+# Сколько полных месяцев (кроме текущего) предсказания хранятся в БД
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "12"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+# Пауза между пачками при выгрузке, секунды
+RETENTION_PAUSE = float(os.getenv("RETENTION_PAUSE", "0.1"))
+RETENTION_LOCK_TIMEOUT = os.getenv("RETENTION_LOCK_TIMEOUT", "5s")
+
+
+def get_connection():
+    """Соединение с БД сервиса."""
+    return psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+
+
+def expired_partitions(cursor, keep_months: int) -> List[Tuple[str, date]]:
+    """
+    Секции, все строки которых старше keep_months полных месяцев.
+
+    Returns:
+        list: Пары (имя секции, первый день месяца)
+    """
+    cutoff = add_months(month_start(datetime.utcnow()), -keep_months)
+    return [(name, month) for name, month in list_partitions(cursor, PREDICTIONS_TABLE) if month < cutoff]
+
+
+def archive_partition(conn, name: str, path: str, batch_size: int, pause: float) -> int:
+    """
+    Выгружает секцию в gzip JSONL.
+
+    Args:
+        conn: Соединение psycopg2
+        name: Имя секции
+        path: Путь к файлу архива
+        batch_size: Строк в одной пачке
+        pause: Пауза между пачками, секунды
+
+    Returns:
+        int: Число выгруженных строк
+
+    Raises:
+        RuntimeError: Если число выгруженных строк не совпало с числом строк секции
+    """
+    temp_path = path + ".tmp"
+    rows = 0
+    with conn.cursor(name=f"retention_{name}") as cursor, gzip.open(temp_path, "wb") as archive:
+        cursor.itersize = batch_size
+        cursor.execute(f"SELECT * FROM {name} ORDER BY created_at, id")
+        columns = None
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if columns is None:
+                columns = [column[0] for column in cursor.description]
+            archive.write(b"".join(codec.dumps(dict(zip(columns, row)), safe=True) + b"\n" for row in batch))
+            rows += len(batch)
+            if pause > 0:
+                time.sleep(pause)
+    conn.commit()
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {name}")
+        expected = cursor.fetchone()[0]
+    conn.commit()
+    if rows != expected:
+        os.remove(temp_path)
+        raise RuntimeError(f"В секции {name} {expected} строк, выгружено {rows}")
+
+    os.replace(temp_path, path)
+    return rows
+
+
+def detach_partition(conn, name: str, keep_detached: bool, lock_timeout: str) -> None:
+    """
+    Отсоединяет секцию от таблицы predictions и удаляет ее.
+
+    Args:
+        conn: Соединение psycopg2
+        name: Имя секции
+        keep_detached: Оставить отсоединенную секцию отдельной таблицей
+        lock_timeout: Максимальное ожидание блокировки таблицы, например "5s"
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", (lock_timeout,))
+            cursor.execute(f"ALTER TABLE {PREDICTIONS_TABLE} DETACH PARTITION {name}")
+            if not keep_detached:
+                cursor.execute(f"DROP TABLE {name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run(args) -> bool:
+    """
+    Выполняет задание хранения.
+
+    Returns:
+        bool: True, если все секции обработаны без ошибок
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            if args.dry_run:
+                candidates = expired_partitions(cursor, args.keep_months)
+            else:
+                created = ensure_partitions(cursor, PREDICTIONS_TABLE, months_ahead=PARTITION_MONTHS_AHEAD)
+                conn.commit()
+                if created:
+                    logger.info(f"Создано секций на будущие месяцы: {created}")
+                candidates = expired_partitions(cursor, args.keep_months)
+        conn.commit()
+
+        if not candidates:
+            logger.info(f"Секций старше {args.keep_months} месяцев нет")
+            return True
+
+        if args.dry_run:
+            with conn.cursor() as cursor:
+                for name, month in candidates[:args.max_partitions]:
+                    # Оценка по статистике, чтобы не читать всю секцию
+                    cursor.execute(
+                        "SELECT reltuples::bigint, pg_size_pretty(pg_total_relation_size(oid)) "
+                        "FROM pg_class WHERE oid = to_regclass(%s)",
+                        (name,)
+                    )
+                    rows, size = cursor.fetchone()
+                    logger.info(f"[dry-run] {name} ({month:%Y-%m}): ~{rows} строк, {size} - будет архивирована")
+            conn.commit()
+            return True
+
+        os.makedirs(args.archive_dir, exist_ok=True)
+        ok = True
+        for name, month in candidates[:args.max_partitions]:
+            path = os.path.join(args.archive_dir, f"{name}.jsonl.gz")
+            try:
+                started = time.monotonic()
+                rows = archive_partition(conn, name, path, args.batch_size, args.pause)
+                logger.info(f"Секция {name} выгружена в {path}: {rows} строк за {time.monotonic() - started:.1f} с")
+                detach_partition(conn, name, args.keep_detached, args.lock_timeout)
+                logger.info(f"Секция {name} отсоединена" + (" и оставлена таблицей" if args.keep_detached else " и удалена"))
+            except Exception as e:
+                conn.rollback()
+                ok = False
+                logger.error(f"Ошибка при архивировании секции {name}: {e}")
+        return ok
+    finally:
+        conn.close()
+
+
+def parse_args(argv=None):
+    """Аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Архивирование старых секций predictions")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать план")
+    parser.add_argument("--keep-months", type=int, default=RETENTION_MONTHS, help="Сколько месяцев хранить в БД")
+    parser.add_argument("--archive-dir", default=RETENTION_ARCHIVE_DIR, help="Каталог архивов")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE, help="Строк в пачке выгрузки")
+    parser.add_argument("--pause", type=float, default=RETENTION_PAUSE, help="Пауза между пачками, секунды")
+    parser.add_argument("--max-partitions", type=int, default=1, help="Максимум секций за запуск")
+    parser.add_argument("--lock-timeout", default=RETENTION_LOCK_TIMEOUT, help="Ожидание блокировки при отсоединении")
+    parser.add_argument("--keep-detached", action="store_true", help="Не удалять отсоединенные секции")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    sys.exit(0 if run(parse_args()) else 1)
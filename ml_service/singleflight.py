@@ -0,0 +1,74 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight).
+
+Когда много клиентов одновременно опрашивают одно и то же предсказание,
+баланс или пользователя, каждый запрос отдельно обращается к БД. SingleFlight
+выполняет функцию один раз для ключа: запросы, пришедшие, пока она
+выполняется, ждут и получают тот же результат (или то же исключение).
+Результат не кэшируется: следующий запрос после завершения снова
+обращается к БД, поэтому данные не устаревают дольше, чем длится один запрос.
+
+Синхронные функции работы с БД выполняются в пуле потоков, а не в цикле
+событий. Отмена одного ожидающего запроса (например, клиент закрыл
+соединение) не прерывает общий запрос к БД для остальных.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Группа объединяемых запросов с ключами.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся запросов."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        Выполняет func(*args) в пуле потоков или присоединяется к уже
+        выполняющемуся вызову с тем же ключом.
+
+        Результат общий для всех ожидающих, поэтому вызывающий код не
+        должен его изменять.
+
+        Args:
+            key: Ключ запроса, например ("prediction", prediction_id, user_id)
+            func: Синхронная функция
+            *args: Аргументы функции
+
+        Returns:
+            Результат функции
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(key, func, *args))
+            # Забираем исключение, даже если все ожидающие запросы отменены
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._calls[key] = future
+            self.executed += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(future)
+
+    async def _run(self, key: Hashable, func: Callable, *args) -> Any:
+        try:
+            return await asyncio.to_thread(func, *args)
+        finally:
+            # Запросы, пришедшие после завершения, выполняются заново
+            self._calls.pop(key, None)
+
+
+# Общая группа для чтений предсказаний, балансов и пользователей в API.
+# Ключи начинаются с имени сущности, чтобы не пересекаться.
+lookups = SingleFlight()
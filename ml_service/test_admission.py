@@ -0,0 +1,145 @@
+"""
+Тестирование контроля допуска без RabbitMQ (очереди хранит заглушка соединения).
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    QueueSample,
+    ADMISSION_NO_WORKERS_RETRY_AFTER,
+    encode_backlog_report
+)
+
+
+class FakeClock:
+    """Часы, которые идут только по команде теста."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBroker:
+    """
+    Очереди брокера: имя -> (сообщений, потребителей).
+
+    Отсутствующая очередь отклоняет пассивное объявление, как RabbitMQ.
+    """
+
+    def __init__(self, queues, backlog=None):
+        self.queues = queues
+        self.backlog = backlog
+        self.connections = 0
+        self.available = True
+
+    def connect(self):
+        if not self.available:
+            raise ConnectionError("брокер недоступен")
+        self.connections += 1
+        broker = self
+
+        class Channel:
+            def queue_declare(self, queue, passive):
+                if queue not in broker.queues:
+                    raise KeyError(queue)
+                messages, consumers = broker.queues[queue]
+                return SimpleNamespace(method=SimpleNamespace(message_count=messages, consumer_count=consumers))
+
+            def basic_get(self, queue, auto_ack):
+                if broker.backlog is None:
+                    return None, None, None
+                return SimpleNamespace(delivery_tag=1), None, encode_backlog_report(broker.backlog)
+
+            def basic_nack(self, delivery_tag, requeue):
+                pass
+
+            def close(self):
+                pass
+
+        return SimpleNamespace(channel=Channel, close=lambda: None)
+
+
+def make_controller(broker, clock=None, queues=("tasks", "interactive")):
+    return AdmissionController(
+        broker.connect,
+        queues=list(queues),
+        worker_queue="interactive",
+        backlog_queue="backlog",
+        max_wait=60,
+        sample_interval=5,
+        avg_task_seconds=2.0,
+        enabled=True,
+        clock=clock or FakeClock()
+    )
+
+
+def test_estimate_wait():
+    """Ожидание растет с глубиной очереди и падает с числом воркеров."""
+    controller = make_controller(FakeBroker({}))
+    assert controller.estimate_wait(QueueSample(depth=30, consumers=3, sampled_at=0)) == 20.0
+    assert controller.estimate_wait(QueueSample(depth=0, consumers=0, sampled_at=0)) == 0.0
+    assert controller.estimate_wait(QueueSample(depth=1, consumers=0, sampled_at=0)) is None
+
+
+def test_depth_sums_queues_and_dispatcher_backlog():
+    """Глубина включает рабочие очереди и подочереди диспетчера, отсутствующие очереди пропускаются."""
+    broker = FakeBroker({"tasks": (10, 0), "interactive": (2, 4)}, backlog=8)
+    controller = make_controller(broker, queues=["tasks", "interactive", "missing"])
+    sample = controller.sample()
+    assert sample.depth == 20
+    assert sample.consumers == 4
+
+
+def test_short_queue_is_admitted():
+    """Задача принимается с оценкой времени завершения."""
+    controller = make_controller(FakeBroker({"tasks": (10, 0), "interactive": (0, 2)}))
+    assert controller.admit() is not None
+
+
+def test_long_queue_is_rejected_with_retry_after():
+    """При ожидании больше допустимого задача отклоняется, Retry-After - превышение."""
+    controller = make_controller(FakeBroker({"tasks": (80, 0), "interactive": (0, 2)}))
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit()
+    assert error.value.estimated_wait == 80.0
+    assert error.value.retry_after == 20
+
+
+def test_no_workers_is_rejected():
+    """Без воркеров задача с непустой очередью отклоняется."""
+    controller = make_controller(FakeBroker({"tasks": (1, 0), "interactive": (0, 0)}))
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit()
+    assert error.value.retry_after == ADMISSION_NO_WORKERS_RETRY_AFTER
+
+
+def test_sample_is_reused_within_interval():
+    """Брокер опрашивается не чаще раза в интервал."""
+    clock = FakeClock()
+    broker = FakeBroker({"tasks": (0, 0), "interactive": (0, 1)})
+    controller = make_controller(broker, clock=clock)
+    controller.admit()
+    clock.now = 4
+    controller.admit()
+    assert broker.connections == 1
+    clock.now = 5
+    controller.admit()
+    assert broker.connections == 2
+
+
+def test_unavailable_broker_admits_without_estimate():
+    """Если состояние очередей неизвестно, задача принимается без оценки."""
+    broker = FakeBroker({})
+    broker.available = False
+    controller = make_controller(broker)
+    assert controller.admit() is None
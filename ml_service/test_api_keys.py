@@ -0,0 +1,143 @@
+"""
+Тестирование API ключей без БД (таблицу api_keys заменяет заглушка соединения).
+"""
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import HTTPException
+
+from ml_service.api_keys import (
+    API_KEY_PREFIX,
+    API_KEY_SCOPES,
+    SCOPE_PREDICTIONS_READ,
+    SCOPE_PREDICTIONS_WRITE,
+    ApiKeyLimitExceeded,
+    ApiKeyStore,
+    generate_api_key,
+    hash_api_key,
+    is_api_key,
+    parse_scopes
+)
+from services.app.app.services.auth_service import require_scope
+
+API_KEY = "mlk_test-key"
+
+
+class FakeConnection:
+    """DB-API соединение, возвращающее заданные строки и считающее запросы."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def __call__(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        self.queries.append(params)
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def key_row(scopes="predictions:read predictions:write", key_tier=None, user_tier="default"):
+    return [(1, scopes, key_tier, 42, "alice", "alice@example.com", True, user_tier)]
+
+
+def test_hash_depends_on_secret():
+    """Хеш ключа - HMAC с секретом сервера: без секрета его не воспроизвести."""
+    assert hash_api_key(API_KEY, "secret") == hash_api_key(API_KEY, "secret")
+    assert hash_api_key(API_KEY, "secret") != hash_api_key(API_KEY, "other")
+    assert hash_api_key(API_KEY, "secret") != hash_api_key("mlk_other-key", "secret")
+    assert len(hash_api_key(API_KEY, "secret")) == 64
+
+
+def test_generated_key_is_recognized():
+    """Созданный ключ отличается от JWT по префиксу."""
+    api_key = generate_api_key()
+    assert api_key.startswith(API_KEY_PREFIX)
+    assert is_api_key(api_key)
+    assert not is_api_key("eyJhbGciOiJIUzI1NiJ9.e30.sig")
+    assert not is_api_key(None)
+
+
+def test_parse_scopes():
+    """Без разрешений ключ получает все, неизвестные и пустые наборы отклоняются."""
+    assert parse_scopes(None) == API_KEY_SCOPES
+    assert parse_scopes([" predictions:read "]) == {SCOPE_PREDICTIONS_READ}
+    with pytest.raises(ValueError):
+        parse_scopes(["admin"])
+    with pytest.raises(ValueError):
+        parse_scopes(["", " "])
+
+
+def test_lookup_is_cached():
+    """Повторная проверка ключа не обращается к БД и не хранит сам ключ."""
+    connection = FakeConnection(key_row())
+    store = ApiKeyStore(connection)
+    principal = store.lookup(API_KEY)
+    assert principal.user_id == 42
+    assert principal.scopes == API_KEY_SCOPES
+    assert store.lookup(API_KEY) is principal
+    assert store.cached(API_KEY) is principal
+    assert connection.queries == [{"key_hash": hash_api_key(API_KEY)}]
+
+
+def test_unknown_key_is_negatively_cached():
+    """Неизвестный ключ кэшируется, перебор ключей не нагружает БД."""
+    connection = FakeConnection([])
+    store = ApiKeyStore(connection)
+    assert store.cached(API_KEY) is None
+    assert store.lookup(API_KEY) is None
+    assert store.cached(API_KEY) is False
+    assert store.lookup(API_KEY) is None
+    assert len(connection.queries) == 1
+
+
+def test_key_tier_overrides_user_tier():
+    """Тариф ключа заменяет тариф пользователя, без него действует тариф пользователя."""
+    assert ApiKeyStore(FakeConnection(key_row(key_tier="premium"))).lookup(API_KEY).tier == "premium"
+    assert ApiKeyStore(FakeConnection(key_row())).lookup(API_KEY).tier == "default"
+
+
+def test_create_respects_key_limit():
+    """При исчерпании лимита ключей создание отклоняется."""
+    with pytest.raises(ApiKeyLimitExceeded):
+        ApiKeyStore(FakeConnection([])).create(42, "ci")
+
+
+def check_scope(scope, scopes):
+    user = SimpleNamespace(scopes=scopes)
+    return asyncio.run(require_scope(scope)(current_user=user))
+
+
+def test_jwt_user_has_all_scopes():
+    """Пользователь с JWT проходит проверку любого разрешения."""
+    assert check_scope(SCOPE_PREDICTIONS_WRITE, None).scopes is None
+
+
+def test_key_without_scope_is_forbidden():
+    """Ключ только на чтение не может создавать предсказания."""
+    assert check_scope(SCOPE_PREDICTIONS_READ, [SCOPE_PREDICTIONS_READ])
+    with pytest.raises(HTTPException) as error:
+        check_scope(SCOPE_PREDICTIONS_WRITE, [SCOPE_PREDICTIONS_READ])
+    assert error.value.status_code == 403
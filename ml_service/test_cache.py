@@ -0,0 +1,73 @@
+"""
+Тестирование кэша в памяти процесса (время задает заглушка).
+"""
+import sys
+import os
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.cache import TTLCache, authenticated_users, invalidate_user
+
+
+class FakeClock:
+    """Часы, которые идут только по команде теста."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_value_expires_after_ttl():
+    """Запись доступна до истечения времени жизни."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("alice", 1)
+    clock.now = 29.9
+    assert cache.get("alice") == 1
+    clock.now = 30
+    assert cache.get("alice") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl():
+    """Запись может иметь собственное время жизни (отрицательный кэш)."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("unknown", False, ttl=10)
+    assert cache.get("unknown") is False
+    clock.now = 10
+    assert cache.get("unknown", "miss") == "miss"
+
+
+def test_least_recently_used_is_evicted():
+    """При переполнении вытесняется давно неиспользуемая запись."""
+    cache = TTLCache(maxsize=2, ttl=60, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_set_refreshes_ttl():
+    """Повторная запись продлевает время жизни."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("alice", 1)
+    clock.now = 20
+    cache.set("alice", 2)
+    clock.now = 40
+    assert cache.get("alice") == 2
+
+
+def test_invalidate_user():
+    """Изменение пользователя сбрасывает его запись в кэше аутентификации."""
+    authenticated_users.set("alice", object())
+    invalidate_user("alice")
+    invalidate_user(None)
+    assert authenticated_users.get("alice") is None
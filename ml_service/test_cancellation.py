@@ -0,0 +1,105 @@
+"""
+Тестирование списка отмененных задач без БД (отмены хранит заглушка сессии).
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ml_worker.worker.services import cancellation_service
+from services.ml_worker.worker.services.cancellation_service import CancelledTasks
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeDatabase:
+    """Отмененные предсказания и параметры запросов к ним."""
+
+    def __init__(self):
+        self.cancelled = {}
+        self.queries = []
+
+    def session(self):
+        database = self
+
+        class FakeSession:
+            def execute(self, statement, params):
+                database.queries.append(params["since"])
+                return FakeResult([
+                    (prediction_id, at) for prediction_id, at in database.cancelled.items()
+                    if at >= params["since"]
+                ])
+
+            def close(self):
+                pass
+
+        return FakeSession()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(cancellation_service, "SessionLocal", database.session)
+    return database
+
+
+def test_known_cancellation_is_found(database):
+    """Отмененная задача распознается без запроса на каждую проверку."""
+    database.cancelled["p1"] = datetime.now() - timedelta(seconds=5)
+    tasks = CancelledTasks(refresh_interval=3600, retention=3600, overlap=30)
+    assert tasks.is_cancelled("p1")
+    assert not tasks.is_cancelled("p2")
+    assert len(database.queries) == 1
+
+
+def test_refresh_rereads_overlap_window(database):
+    """Отмена, закоммиченная позже с более ранней меткой, попадает в окно перекрытия."""
+    now = datetime.now()
+    database.cancelled["p1"] = now - timedelta(seconds=5)
+    tasks = CancelledTasks(refresh_interval=0, retention=3600, overlap=30)
+    tasks.refresh()
+
+    # Транзакция отмены p2 началась раньше p1, но закоммичена после загрузки
+    database.cancelled["p2"] = now - timedelta(seconds=10)
+    assert tasks.is_cancelled("p2")
+    assert database.queries[-1] == database.cancelled["p1"] - timedelta(seconds=30)
+
+
+def test_first_refresh_covers_retention(database):
+    """Первое обновление загружает отмены за все время хранения."""
+    tasks = CancelledTasks(refresh_interval=0, retention=600, overlap=30)
+    before = datetime.now()
+    tasks.refresh()
+    assert before - timedelta(seconds=600) <= database.queries[0] <= datetime.now() - timedelta(seconds=600)
+
+
+def test_old_cancellations_are_forgotten(database):
+    """Отмены старше срока хранения удаляются из памяти."""
+    database.cancelled["old"] = datetime.now() - timedelta(seconds=700)
+    tasks = CancelledTasks(refresh_interval=0, retention=600, overlap=30)
+    tasks._since = datetime.now() - timedelta(seconds=800)
+    tasks.refresh()
+    assert not tasks.is_cancelled("old")
+
+
+def test_refresh_error_keeps_known_cancellations(database, monkeypatch):
+    """Ошибка БД не сбрасывает уже загруженные отмены."""
+    database.cancelled["p1"] = datetime.now()
+    tasks = CancelledTasks(refresh_interval=0, retention=3600, overlap=30)
+    assert tasks.is_cancelled("p1")
+
+    def unavailable():
+        raise ConnectionError("нет соединения")
+
+    monkeypatch.setattr(cancellation_service, "SessionLocal", unavailable)
+    assert tasks.is_cancelled("p1")
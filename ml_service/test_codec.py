@@ -0,0 +1,65 @@
+"""
+Тестирование общего JSON кодека.
+"""
+import sys
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service import codec
+
+
+def test_round_trip():
+    """Данные сообщения восстанавливаются без изменений, текст не экранируется."""
+    message = {"prediction_id": "p1", "data": {"text": "Привет", "values": [1, 2.5, None, True]}}
+    body = codec.dumps(message)
+    assert isinstance(body, bytes)
+    assert "Привет".encode("utf-8") in body
+    assert codec.loads(body) == message
+
+
+@pytest.mark.parametrize("data", [b'{"a": 1}', bytearray(b'{"a": 1}'), memoryview(b'{"a": 1}'), '{"a": 1}'])
+def test_loads_accepts_bytes_and_str(data):
+    """Тело разбирается из bytes, bytearray, memoryview и str."""
+    assert codec.loads(data) == {"a": 1}
+
+
+def test_extra_types_are_serialized():
+    """Decimal, даты и множества преобразуются в JSON-типы."""
+    body = codec.dumps({
+        "cost": Decimal("1.50"),
+        "created_at": datetime(2024, 5, 1, 12, 0, 0),
+        "day": date(2024, 5, 1),
+        "tags": ("a",)
+    })
+    assert codec.loads(body) == {
+        "cost": 1.5,
+        "created_at": "2024-05-01T12:00:00",
+        "day": "2024-05-01",
+        "tags": ["a"]
+    }
+
+
+def test_unsupported_type_raises():
+    """Неподдерживаемый тип - ошибка, а в безопасном режиме - строка."""
+    with pytest.raises(TypeError):
+        codec.dumps({"value": object()})
+    assert codec.loads(codec.dumps({"value": complex(1, 2)}, safe=True)) == {"value": "(1+2j)"}
+
+
+def test_decode_error_is_value_error():
+    """Ошибка разбора в любом варианте кодека - подкласс ValueError."""
+    with pytest.raises(ValueError):
+        codec.loads(b"{not json")
+
+
+def test_backends_are_compatible():
+    """JSON стандартной библиотеки читает вывод выбранного кодека и наоборот."""
+    message = {"prediction_id": "p1", "confidence": 0.91, "label": "positive"}
+    assert codec._loads_json(codec.dumps(message)) == message
+    assert codec.loads(codec._dumps_json(message, codec.to_serializable)) == message
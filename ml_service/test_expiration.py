@@ -0,0 +1,77 @@
+"""
+Тестирование обработки просроченных задач без БД (возврат средств - заглушка).
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ml_worker.worker.services import expiration_service
+from services.ml_worker.worker.services.expiration_service import ExpiredTaskBatch, is_expired
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def test_task_without_deadline_never_expires():
+    """Задача без срока выполняется всегда."""
+    assert not is_expired({"prediction_id": "1"}, NOW)
+    assert not is_expired({"prediction_id": "1", "deadline": None}, NOW)
+
+
+def test_past_deadline_expires():
+    """Задача с прошедшим или наступившим сроком истекла."""
+    assert is_expired({"deadline": (NOW - timedelta(seconds=1)).isoformat()}, NOW)
+    assert is_expired({"deadline": NOW.isoformat()}, NOW)
+
+
+def test_future_deadline_does_not_expire():
+    """Задача со сроком в будущем выполняется."""
+    assert not is_expired({"deadline": (NOW + timedelta(minutes=5)).isoformat()}, NOW)
+
+
+def test_malformed_deadline_does_not_expire():
+    """Некорректный срок не отменяет задачу."""
+    assert not is_expired({"deadline": "завтра"}, NOW)
+    assert not is_expired({"deadline": 1714564800}, NOW)
+
+
+@pytest.fixture
+def expired_batches(monkeypatch):
+    """Подменяет пакетный возврат и сохраняет переданные в него ID."""
+    batches = []
+
+    class FakeSession:
+        def close(self):
+            pass
+
+    def expire_predictions(db, prediction_ids=None, limit=None):
+        batches.append(list(prediction_ids))
+        return len(prediction_ids)
+
+    monkeypatch.setattr(expiration_service, "SessionLocal", FakeSession)
+    monkeypatch.setattr(expiration_service, "expire_predictions", expire_predictions)
+    return batches
+
+
+def test_batch_flushes_when_full(expired_batches):
+    """Заполненный пакет отправляется одним запросом."""
+    batch = ExpiredTaskBatch(batch_size=2, flush_interval=60, sweep_interval=3600)
+    batch.add("1")
+    assert expired_batches == []
+    batch.add("2")
+    batch.add("3")
+    assert expired_batches == [["1", "2"]]
+
+
+def test_batch_flushes_by_timer(expired_batches):
+    """Неполный пакет отправляется по истечении интервала."""
+    batch = ExpiredTaskBatch(batch_size=100, flush_interval=0, sweep_interval=3600)
+    batch.add("1")
+    batch.tick()
+    assert expired_batches == [["1"]]
+    batch.flush()
+    assert expired_batches == [["1"]]
@@ -0,0 +1,119 @@
+"""
+Тестирование справедливой выдачи задач без RabbitMQ (время задает заглушка).
+"""
+import sys
+import os
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ml_worker.worker.services.fair_scheduler import FairScheduler
+
+
+class FakeClock:
+    """Часы, которые идут только по команде теста."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(scheduler, count):
+    """Выдает до count задач и возвращает пользователей в порядке выдачи."""
+    order = []
+    for _ in range(count):
+        user = scheduler.next_user()
+        if user is None:
+            break
+        scheduler.dispatched(user)
+        scheduler.completed(user)
+        order.append(user)
+    return order
+
+
+def test_users_alternate_regardless_of_backlog():
+    """Пользователь с длинной очередью не вытесняет остальных."""
+    scheduler = FairScheduler(quantum=1)
+    scheduler.enqueue("heavy", 10)
+    scheduler.enqueue("light", 2)
+    assert drain(scheduler, 5) == ["heavy", "light", "heavy", "light", "heavy"]
+    assert scheduler.backlog("light") == 0
+    assert scheduler.active_users == 1
+
+
+def test_quantum_gives_several_tasks_per_turn():
+    """За один ход пользователь получает quantum задач подряд."""
+    scheduler = FairScheduler(quantum=2)
+    scheduler.enqueue("a", 4)
+    scheduler.enqueue("b", 4)
+    assert drain(scheduler, 6) == ["a", "a", "b", "b", "a", "a"]
+
+
+def test_user_inflight_limit_skips_user():
+    """Пользователь на лимите задач в работе пропускает свой ход."""
+    scheduler = FairScheduler(user_inflight_limit=1)
+    scheduler.enqueue("a", 3)
+    scheduler.enqueue("b", 3)
+    scheduler.dispatched(scheduler.next_user())
+    assert scheduler.next_user() == "b"
+    scheduler.dispatched("b")
+    assert scheduler.next_user() is None
+
+
+def test_window_limits_total_inflight():
+    """Суммарное число задач в работе не превышает окно."""
+    scheduler = FairScheduler(user_inflight_limit=5, window=2)
+    scheduler.enqueue("a", 5)
+    scheduler.dispatched(scheduler.next_user())
+    scheduler.dispatched(scheduler.next_user())
+    assert scheduler.inflight_total == 2
+    assert scheduler.next_user() is None
+
+
+def test_completion_releases_only_its_lease():
+    """Уведомление снимает свою выдачу, повтор уведомления игнорируется."""
+    scheduler = FairScheduler(user_inflight_limit=5)
+    scheduler.enqueue("a", 2)
+    first = scheduler.dispatched("a")
+    second = scheduler.dispatched("a")
+    assert first != second
+    assert scheduler.completed("a", second)
+    assert not scheduler.completed("a", second)
+    assert scheduler.inflight("a") == 1
+
+
+def test_expired_lease_does_not_release_new_task():
+    """Опоздавшее уведомление по снятой выдаче не освобождает чужое место."""
+    clock = FakeClock()
+    scheduler = FairScheduler(user_inflight_limit=5, inflight_timeout=10, clock=clock)
+    scheduler.enqueue("a", 2)
+    stale = scheduler.dispatched("a")
+    clock.now = 11
+    assert scheduler.expire_inflight() == 1
+    fresh = scheduler.dispatched("a")
+    assert not scheduler.completed("a", stale)
+    assert scheduler.inflight("a") == 1
+    assert scheduler.completed("a", fresh)
+    assert scheduler.inflight_total == 0
+
+
+def test_completion_without_lease_releases_oldest():
+    """Уведомление без идентификатора снимает самую старую выдачу."""
+    scheduler = FairScheduler(user_inflight_limit=5)
+    scheduler.enqueue("a", 2)
+    scheduler.dispatched("a")
+    newest = scheduler.dispatched("a")
+    assert scheduler.completed("a")
+    assert scheduler.completed("a", newest)
+
+
+def test_drained_user_leaves_rotation():
+    """Пустая по данным брокера подочередь исключает пользователя из раунда."""
+    scheduler = FairScheduler()
+    scheduler.enqueue("a", 3)
+    scheduler.enqueue("b", 1)
+    scheduler.drained("a")
+    assert scheduler.backlog_total == 1
+    assert scheduler.next_user() == "b"
@@ -0,0 +1,97 @@
+"""
+Тестирование захвата задач воркером без БД и RabbitMQ (захват, модель и
+публикация результата - заглушки).
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.codec import dumps
+from services.ml_worker.worker.services import message_processor
+from services.ml_worker.worker.services.prediction_service import PredictionNotFound
+
+WORKER_ID = "worker-1"
+TASK = {"prediction_id": "p1", "user_id": "u1", "data": {"text": "hello"}}
+
+
+class FakeChannel:
+    """Канал, запоминающий подтверждения сообщений."""
+
+    def __init__(self):
+        self.acked = []
+        self.nacked = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacked.append(delivery_tag)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """Подменяет зависимости обработчика и записывает их вызовы."""
+    calls = SimpleNamespace(status=None, predicted=[], released=[], published=[], retried=[])
+
+    def handle_failure(ch, method, properties, body, error):
+        calls.retried.append(error)
+
+    monkeypatch.setattr(message_processor, "is_expired", lambda data: False)
+    monkeypatch.setattr(message_processor, "cancelled_tasks", SimpleNamespace(is_cancelled=lambda pid: False))
+    monkeypatch.setattr(message_processor, "claim_prediction", lambda db, pid, wid: calls.status)
+    monkeypatch.setattr(message_processor, "release_prediction", lambda db, pid, wid: calls.released.append(pid))
+    monkeypatch.setattr(message_processor, "make_prediction", lambda data: calls.predicted.append(data) or SimpleNamespace(to_dict=dict))
+    monkeypatch.setattr(message_processor, "update_prediction_result", lambda db, pid, result, wid: object())
+    monkeypatch.setattr(message_processor, "publish_result", lambda pid, result, uid: calls.published.append(pid))
+    monkeypatch.setattr(message_processor, "retry_policy", SimpleNamespace(handle_failure=handle_failure))
+    return calls
+
+
+def handle(status, worker):
+    worker.status = status
+    channel = FakeChannel()
+    method = SimpleNamespace(delivery_tag=7, routing_key="ml_tasks")
+    message_processor._handle_message(channel, method, None, dumps(TASK), WORKER_ID, db=None)
+    return channel
+
+
+def test_claimed_task_is_processed(worker):
+    """Захваченная задача выполняется, результат публикуется."""
+    channel = handle(None, worker)
+    assert worker.predicted == [TASK["data"]]
+    assert worker.published == ["p1"]
+    assert channel.acked == [7]
+
+
+@pytest.mark.parametrize("status", ["completed", "processing", "cancelled", "expired"])
+def test_duplicate_is_acked_without_inference(worker, status):
+    """Повторная доставка задачи, которую нельзя захватить, не запускает модель."""
+    channel = handle(status, worker)
+    assert worker.predicted == []
+    assert worker.retried == []
+    assert channel.acked == [7]
+
+
+def test_missing_prediction_is_retried(worker):
+    """Задача без строки в БД уходит на повтор с задержкой, а не теряется."""
+    channel = handle("missing", worker)
+    assert worker.predicted == []
+    assert worker.released == []
+    assert isinstance(worker.retried[0], PredictionNotFound)
+    assert channel.acked == [7]
+
+
+def test_failed_inference_releases_claim(worker, monkeypatch):
+    """Ошибка модели возвращает захваченное предсказание в ожидание."""
+    def broken_model(data):
+        raise RuntimeError("модель недоступна")
+
+    monkeypatch.setattr(message_processor, "make_prediction", broken_model)
+    handle(None, worker)
+    assert worker.released == ["p1"]
+    assert len(worker.retried) == 1
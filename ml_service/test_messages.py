@@ -0,0 +1,112 @@
+"""
+Тестирование формата сообщений очередей: обе схемы и сжатие.
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+import msgpack
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service import codec
+from ml_service.messages import (
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_MSGPACK,
+    KIND_RESULT,
+    KIND_TASK,
+    SCHEMA_VERSION_COMPACT,
+    SCHEMA_VERSION_HEADER,
+    SCHEMA_VERSION_JSON,
+    decode_message,
+    encode_message
+)
+
+TASK = {
+    "prediction_id": "p1",
+    "user_id": "u1",
+    "data": {"text": "Отличный сервис"},
+    "source": "bot",
+    "timestamp": "2024-05-01T12:00:00",
+    "deadline": "2024-05-01T12:05:00"
+}
+RESULT = {
+    "prediction_id": "p1",
+    "result": {"label": "positive", "confidence": 0.93, "input_text": "Отличный сервис"},
+    "timestamp": "2024-05-01T12:00:02"
+}
+
+
+def round_trip(message, kind=KIND_TASK, message_format="json", compression="none"):
+    body, properties = encode_message(message, kind, message_format, compression)
+    return decode_message(body, SimpleNamespace(**properties)), properties
+
+
+def test_json_round_trip():
+    """Исходная схема передает сообщение как есть."""
+    decoded, properties = round_trip(TASK)
+    assert decoded == TASK
+    assert properties["content_type"] == CONTENT_TYPE_JSON
+    assert properties["headers"] == {SCHEMA_VERSION_HEADER: SCHEMA_VERSION_JSON}
+
+
+def test_compact_task_round_trip():
+    """Компактная схема восстанавливает задачу, включая дополнительные поля."""
+    task = dict(TASK, attempt=2)
+    decoded, properties = round_trip(task, message_format="msgpack")
+    assert decoded == task
+    assert properties["content_type"] == CONTENT_TYPE_MSGPACK
+    assert properties["headers"] == {SCHEMA_VERSION_HEADER: SCHEMA_VERSION_COMPACT}
+
+
+def test_compact_task_omits_missing_fields():
+    """Отсутствующие поля не появляются после декодирования."""
+    task = {key: value for key, value in TASK.items() if key != "deadline"}
+    decoded, _ = round_trip(task, message_format="msgpack")
+    assert decoded == task
+
+
+def test_compact_result_drops_input_echo():
+    """Результат в компактной схеме не повторяет входной текст."""
+    decoded, _ = round_trip(RESULT, KIND_RESULT, message_format="msgpack")
+    assert decoded["result"] == {"label": "positive", "confidence": 0.93}
+    assert RESULT["result"]["input_text"] == "Отличный сервис"
+
+
+@pytest.mark.parametrize("message_format", ["json", "msgpack"])
+def test_large_body_is_compressed(message_format):
+    """Тело больше порога сжимается, алгоритм указывается в content_encoding."""
+    task = dict(TASK, data={"text": "слово " * 1000})
+    decoded, properties = round_trip(task, message_format=message_format, compression="zlib")
+    assert properties["content_encoding"] == "zlib"
+    assert decoded == task
+
+
+def test_small_body_is_not_compressed():
+    """Короткие сообщения не сжимаются."""
+    _, properties = round_trip(TASK, compression="zlib")
+    assert properties["content_encoding"] is None
+
+
+def test_legacy_message_without_properties():
+    """Сообщение без свойств читается как JSON исходной схемы."""
+    assert decode_message(codec.dumps(TASK)) == TASK
+
+
+def test_newer_schema_is_rejected():
+    """Сообщение более новой схемы не разбирается молча."""
+    body = msgpack.packb([SCHEMA_VERSION_COMPACT + 1, 1, "p1"])
+    with pytest.raises(ValueError):
+        decode_message(body, SimpleNamespace(content_type=CONTENT_TYPE_MSGPACK, content_encoding=None))
+
+
+@pytest.mark.parametrize("properties", [
+    SimpleNamespace(content_type="text/plain", content_encoding=None),
+    SimpleNamespace(content_type=CONTENT_TYPE_JSON, content_encoding="br"),
+])
+def test_unsupported_format_is_rejected(properties):
+    """Неизвестный формат или сжатие - ошибка ValueError."""
+    with pytest.raises(ValueError):
+        decode_message(codec.dumps(TASK), properties)
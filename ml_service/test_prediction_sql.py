@@ -0,0 +1,55 @@
+"""
+Тестирование общих запросов предсказаний: формат параметров psycopg2 и
+ключи JSON истории, которые не проверяет response_model.
+"""
+import sys
+import os
+import re
+
+# Добавление корневой директории проекта и директории приложения в sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'services', 'app'))
+
+from app.schemas import predictions as app_schemas
+from services.app.app.models import prediction as api_models
+from ml_service.prediction_sql import (
+    CANCEL_AND_REFUND_SQL, FAIL_UNPUBLISHED_SQL, RESERVE_IDEMPOTENCY_KEY_SQL, pyformat,
+    user_predictions_json_sql
+)
+
+
+def test_named_params_are_converted():
+    """Параметры :name становятся %(name)s."""
+    assert pyformat("WHERE id = :prediction_id AND user_id = :user_id") == \
+        "WHERE id = %(prediction_id)s AND user_id = %(user_id)s"
+
+
+def test_casts_and_percent_signs_are_kept():
+    """Приведения типов не считаются параметрами, знак процента экранируется."""
+    assert pyformat("SELECT '[]'::json, :skip::int WHERE name LIKE 'a%'") == \
+        "SELECT '[]'::json, %(skip)s::int WHERE name LIKE 'a%%'"
+
+
+def test_shared_sql_params():
+    """Общие запросы получают те же параметры в обоих форматах."""
+    sql = pyformat(CANCEL_AND_REFUND_SQL)
+    assert ":prediction_id" not in sql
+    assert "%(prediction_id)s" in sql and "%(user_id)s" in sql
+    assert "%(prediction_id)s" in pyformat(FAIL_UNPUBLISHED_SQL)
+    assert "make_interval(secs => %(ttl)s)" in pyformat(RESERVE_IDEMPOTENCY_KEY_SQL)
+
+
+def history_keys(sql):
+    """Ключи объекта предсказания в JSON истории."""
+    return set(re.findall(r"^ {8}'(\w+)',", sql, re.MULTILINE))
+
+
+def test_history_keys_match_api_schema():
+    """Ключи истории REST API совпадают с полями PredictionResponse."""
+    assert history_keys(user_predictions_json_sql("timestamp")) == set(api_models.PredictionResponse.__fields__)
+
+
+def test_history_keys_match_app_schema():
+    """Ключи истории API app совпадают с полями его PredictionResponse."""
+    assert history_keys(user_predictions_json_sql("created_at")) == set(app_schemas.PredictionResponse.__fields__)
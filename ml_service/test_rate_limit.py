@@ -0,0 +1,141 @@
+"""
+Тестирование ограничения частоты запросов без БД (корзины в памяти, время
+задает заглушка).
+"""
+import sys
+import os
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.rate_limit import (
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitExceeded,
+    parse_tiers
+)
+
+# 10 запросов за 10 секунд: емкость 10, один токен в секунду
+TIERS = parse_tiers("default:10/10,premium:100/10")
+
+
+class FakeClock:
+    """Часы, которые идут только по команде теста."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingBackend(MemoryRateLimitBackend):
+    """Хранилище в памяти, считающее обращения."""
+
+    def __init__(self, clock):
+        super().__init__(clock)
+        self.calls = 0
+
+    def acquire(self, key, tier, tokens):
+        self.calls += 1
+        return super().acquire(key, tier, tokens)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_limiter(clock, backend=None):
+    backend = backend or MemoryRateLimitBackend(clock)
+    return RateLimiter(backend, tiers=TIERS, lease_ttl=1.0, lease_fraction=0.2, enabled=True, clock=clock)
+
+
+def exhaust(limiter, key, tier=None):
+    """Отправляет запросы до первого отказа и возвращает число принятых."""
+    accepted = 0
+    while True:
+        try:
+            limiter.check(key, tier)
+        except RateLimitExceeded as e:
+            return accepted, e
+        accepted += 1
+
+
+def test_parse_tiers():
+    """Тариф задает емкость и скорость пополнения."""
+    tier = parse_tiers(" default:20/60 , ")["default"]
+    assert tier.capacity == 20
+    assert tier.refill_per_second == pytest.approx(1 / 3)
+
+
+def test_capacity_limits_burst(clock):
+    """Без пополнения принимается не больше емкости корзины."""
+    accepted, error = exhaust(make_limiter(clock), "user:1")
+    assert accepted == 10
+    assert error.retry_after == 1
+
+
+def test_bucket_refills_over_time(clock):
+    """Токены возвращаются со скоростью тарифа."""
+    limiter = make_limiter(clock)
+    exhaust(limiter, "user:1")
+    clock.now = 3.0
+    accepted, _ = exhaust(limiter, "user:1")
+    assert accepted == 3
+
+
+def test_keys_and_tiers_are_independent(clock):
+    """У каждого ключа своя корзина, емкость задает тариф."""
+    limiter = make_limiter(clock)
+    exhaust(limiter, "user:1")
+    limiter.check("user:2")
+    accepted, _ = exhaust(limiter, "user:3", "premium")
+    assert accepted == 100
+
+
+def test_unknown_tier_falls_back_to_default(clock):
+    """Неизвестный тариф получает лимиты тарифа по умолчанию."""
+    accepted, _ = exhaust(make_limiter(clock), "user:1", "gold")
+    assert accepted == 10
+
+
+def test_local_lease_saves_backend_calls(clock):
+    """Пачка токенов расходуется локально, пока не истек ее срок."""
+    backend = CountingBackend(clock)
+    limiter = make_limiter(clock, backend)
+    limiter.check("user:1")
+    limiter.check("user:1")
+    assert backend.calls == 1
+    limiter.check("user:1")
+    assert backend.calls == 2
+
+
+def test_expired_lease_goes_to_backend(clock):
+    """После срока жизни пачки запрос снова обращается к хранилищу."""
+    backend = CountingBackend(clock)
+    limiter = make_limiter(clock, backend)
+    limiter.check("user:1")
+    clock.now = 1.0
+    limiter.check("user:1")
+    assert backend.calls == 2
+
+
+def test_unavailable_backend_allows_request(clock):
+    """Недоступность хранилища не блокирует запросы."""
+    class BrokenBackend:
+        def acquire(self, key, tier, tokens):
+            raise ConnectionError("нет соединения")
+
+    limiter = make_limiter(clock, BrokenBackend())
+    for _ in range(20):
+        limiter.check("user:1")
+
+
+def test_disabled_limiter_accepts_everything(clock):
+    """Выключенный ограничитель не проверяет запросы."""
+    limiter = RateLimiter(MemoryRateLimitBackend(clock), tiers=TIERS, enabled=False, clock=clock)
+    for _ in range(20):
+        limiter.check("user:1")
@@ -0,0 +1,72 @@
+"""
+Тестирование отбора и восстановления зависших задач без БД и RabbitMQ.
+"""
+import sys
+import os
+from datetime import datetime
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ml_worker.worker.services.reaper_service import (
+    LEASE_EXPIRED_CONDITION,
+    PENDING_STALE_CONDITION,
+    TASK_SOURCE_BOT,
+    TASK_SOURCE_REAPER,
+    ML_INTERACTIVE_QUEUE,
+    ML_TASK_QUEUE,
+    build_task_message,
+    stuck_condition,
+    task_queue
+)
+
+CREATED_AT = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def test_busy_broker_requeues_only_expired_leases():
+    """Пока в брокере есть задачи, ожидающие предсказания не трогаются."""
+    condition = stuck_condition(include_pending=False)
+    assert LEASE_EXPIRED_CONDITION in condition
+    assert PENDING_STALE_CONDITION not in condition
+
+
+def test_idle_broker_requeues_stale_pending():
+    """При пустых очередях долго ожидающие задачи считаются потерянными."""
+    condition = stuck_condition(include_pending=True)
+    assert LEASE_EXPIRED_CONDITION in condition
+    assert PENDING_STALE_CONDITION in condition
+
+
+def test_expired_deadline_is_never_requeued():
+    """Задачи с истекшим сроком остаются для пометки expired."""
+    for include_pending in (False, True):
+        assert stuck_condition(include_pending).endswith("AND (deadline IS NULL OR deadline > NOW())")
+
+
+def test_task_returns_to_source_lane():
+    """Задачи бота возвращаются в интерактивную полосу, остальные - в общую очередь."""
+    assert task_queue(TASK_SOURCE_BOT) == ML_INTERACTIVE_QUEUE
+    assert task_queue("api") == ML_TASK_QUEUE
+    assert task_queue(None) == ML_TASK_QUEUE
+
+
+def test_message_is_rebuilt_from_row():
+    """Сообщение восстанавливается по строке, входные данные в JSON разбираются."""
+    deadline = datetime(2024, 5, 1, 12, 5, 0)
+    row = ("p1", "u1", '{"text": "hello"}', CREATED_AT, deadline, 2, TASK_SOURCE_BOT)
+    assert build_task_message(row) == {
+        "prediction_id": "p1",
+        "user_id": "u1",
+        "data": {"text": "hello"},
+        "timestamp": CREATED_AT.isoformat(),
+        "source": TASK_SOURCE_REAPER,
+        "deadline": deadline.isoformat()
+    }
+
+
+def test_message_without_deadline():
+    """Задача без срока восстанавливается без поля deadline."""
+    row = ("p1", "u1", {"text": "hello"}, CREATED_AT, None, 1, "api")
+    message = build_task_message(row)
+    assert message["data"] == {"text": "hello"}
+    assert "deadline" not in message
@@ -0,0 +1,65 @@
+"""
+Тестирование выбора реплики для чтения без БД (отставание измеряет заглушка).
+"""
+import sys
+import os
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.replicas import Replica, ReplicaRouter
+
+PRIMARY = "primary"
+
+
+def make_router(lags):
+    """
+    Роутер с репликами, отставание которых берется из словаря lags.
+
+    Значение-исключение имитирует ошибку измерения (реплика недоступна
+    или не получает WAL).
+    """
+    def probe(engine):
+        lag = lags[engine]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    replicas = [Replica(name, name) for name in lags]
+    return ReplicaRouter(replicas, max_lag=5, check_interval=0, probe=probe)
+
+
+def test_fresh_replica_is_used():
+    """Реплика с допустимым отставанием обслуживает чтение."""
+    router = make_router({"replica-1": 0.5})
+    assert router.read_engine(PRIMARY) == "replica-1"
+    assert router.replica_reads == 1
+
+
+def test_lagging_replica_falls_back_to_primary():
+    """При отставании больше max_lag чтение идет на основной сервер."""
+    router = make_router({"replica-1": 30})
+    assert router.read_engine(PRIMARY) == PRIMARY
+    assert router.primary_reads == 1
+
+
+def test_probe_error_falls_back_to_primary():
+    """Ошибка измерения отставания исключает реплику."""
+    router = make_router({"replica-1": RuntimeError("прием WAL от основного сервера не работает")})
+    assert router.read_engine(PRIMARY) == PRIMARY
+
+
+def test_unavailable_replica_is_skipped():
+    """Недоступная реплика пропускается, чтение идет на следующую."""
+    router = make_router({"replica-1": ConnectionError("нет соединения"), "replica-2": 1})
+    assert router.read_engine(PRIMARY) == "replica-2"
+    assert router.read_engine(PRIMARY) == "replica-2"
+
+
+def test_replica_returns_after_catching_up():
+    """Реплика снова используется, когда отставание сократилось."""
+    lags = {"replica-1": 30}
+    router = make_router(lags)
+    assert router.read_engine(PRIMARY) == PRIMARY
+    lags["replica-1"] = 1
+    assert router.read_engine(PRIMARY) == "replica-1"
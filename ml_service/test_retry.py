@@ -0,0 +1,98 @@
+"""
+Тестирование политики повторных попыток без RabbitMQ и БД (канал и перевод
+в статус dead - заглушки).
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.codec import dumps
+from services.ml_worker.worker.services.retry_service import (
+    RetryPolicy,
+    ML_DISPATCH_QUEUE,
+    ML_TASK_QUEUE,
+    RETRY_COUNT_HEADER,
+    FAILURE_REASON_HEADER,
+    retry_queue_name
+)
+
+BODY = dumps({"prediction_id": "p1", "user_id": "u1", "data": {}})
+
+
+class FakeChannel:
+    """Канал, запоминающий опубликованные сообщения."""
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, dict(properties.headers), properties.expiration))
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    """Политика с задержками 1, 2, 4 с; погребенные задачи сохраняются в buried."""
+    policy = RetryPolicy(delays=[1, 2, 4], dead_queue="dead")
+    policy.buried = []
+    monkeypatch.setattr(policy, "_bury", lambda body, properties=None: policy.buried.append(body))
+    return policy
+
+
+def fail(policy, error, queue="ml_tasks", retry_count=None):
+    channel = FakeChannel()
+    headers = {} if retry_count is None else {RETRY_COUNT_HEADER: retry_count}
+    properties = SimpleNamespace(headers=headers, expiration="60000")
+    outcome = policy.handle_failure(channel, SimpleNamespace(routing_key=queue), properties, BODY, error)
+    return outcome, channel.published[0]
+
+
+def test_first_failure_waits_shortest_delay(policy):
+    """Первая ошибка отправляет задачу в очередь ожидания с наименьшей задержкой."""
+    outcome, (routing_key, headers, expiration) = fail(policy, ConnectionError())
+    assert outcome == "retry"
+    assert routing_key == retry_queue_name("ml_tasks", 1)
+    assert headers[RETRY_COUNT_HEADER] == 1
+    assert headers[FAILURE_REASON_HEADER] == "ConnectionError"
+    assert expiration is None
+    assert policy.buried == []
+
+
+def test_delay_grows_with_attempts(policy):
+    """Каждая следующая попытка ждет дольше."""
+    _, (routing_key, headers, _) = fail(policy, ConnectionError(), retry_count=2)
+    assert routing_key == retry_queue_name("ml_tasks", 4)
+    assert headers[RETRY_COUNT_HEADER] == 3
+
+
+def test_exhausted_attempts_go_to_dead_queue(policy):
+    """После исчерпания попыток задача хоронится с возвратом средств."""
+    outcome, (routing_key, _, _) = fail(policy, ConnectionError(), retry_count=3)
+    assert outcome == "dead"
+    assert routing_key == "dead"
+    assert policy.buried == [BODY]
+
+
+@pytest.mark.parametrize("error", [ValueError(), KeyError("data"), TypeError()])
+def test_message_errors_are_not_retried(policy, error):
+    """Ошибка в самом сообщении сразу отправляет его в очередь недоставленных."""
+    outcome, (routing_key, _, _) = fail(policy, error)
+    assert outcome == "dead"
+    assert routing_key == "dead"
+
+
+def test_dispatched_task_returns_through_dispatcher(policy):
+    """Повтор задачи из очереди диспетчера возвращается во входную очередь."""
+    _, (routing_key, _, _) = fail(policy, ConnectionError(), queue=ML_DISPATCH_QUEUE)
+    assert routing_key == retry_queue_name(ML_TASK_QUEUE, 1)
+
+
+def test_failures_are_counted_by_reason(policy):
+    """Счетчики ошибок ведутся по причине и исходу."""
+    fail(policy, ConnectionError())
+    fail(policy, ValueError())
+    assert policy.failures == {("ConnectionError", "retry"): 1, ("ValueError", "dead"): 1}
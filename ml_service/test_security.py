@@ -0,0 +1,83 @@
+"""
+Тестирование аутентификации по JWT в app.core.security без БД
+(пользователя возвращает заглушка get_user_by_username).
+"""
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+# Добавление корневой директории проекта и директории приложения в sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'services', 'app'))
+
+from fastapi import HTTPException
+
+from app.core import security
+from ml_service.cache import authenticated_users
+
+
+def entity_user(**fields):
+    """Пользователь модели Entity User: строковый ID и нет колонки tier."""
+    user = {"id": "6f1c2a5e-0000-4000-8000-000000000001", "username": "alice",
+            "email": "alice@example.com", "is_active": True}
+    user.update(fields)
+    return SimpleNamespace(**user)
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Подменяет загрузку пользователя и считает обращения к ней."""
+    calls = []
+    users = {"alice": entity_user()}
+
+    def get_user_by_username(db, username):
+        calls.append(username)
+        return users.get(username)
+
+    monkeypatch.setattr(security, "get_user_by_username", get_user_by_username)
+    authenticated_users.clear()
+    yield SimpleNamespace(calls=calls, users=users)
+    authenticated_users.clear()
+
+
+def authenticate(username):
+    token = security.create_access_token({"sub": username})
+    return asyncio.run(security.get_current_user(token=token, db=None))
+
+
+def test_uncached_user_without_tier(lookups):
+    """Пользователь без колонки tier аутентифицируется с тарифом по умолчанию."""
+    user = authenticate("alice")
+    assert user.username == "alice"
+    assert user.id == "6f1c2a5e-0000-4000-8000-000000000001"
+    assert user.tier is None
+    assert lookups.calls == ["alice"]
+
+
+def test_cached_snapshot_is_reused(lookups):
+    """Повторный запрос берет снимок из кэша, а не из БД."""
+    first = authenticate("alice")
+    second = authenticate("alice")
+    assert second == first
+    assert lookups.calls == ["alice"]
+
+
+def test_unknown_user_is_rejected(lookups):
+    """Неизвестный пользователь получает 401 и не попадает в кэш."""
+    with pytest.raises(HTTPException) as error:
+        authenticate("bob")
+    assert error.value.status_code == 401
+    assert authenticated_users.get("bob") is None
+
+
+def test_inactive_user_is_not_cached(lookups):
+    """Неактивный пользователь отклоняется при каждом запросе."""
+    lookups.users["carol"] = entity_user(username="carol", is_active=False)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            authenticate("carol")
+    assert lookups.calls == ["carol", "carol"]
@@ -0,0 +1,104 @@
+"""
+Тестирование объединения одновременных запросов (запрос к БД - заглушка).
+"""
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+
+# Добавление корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ml_service.singleflight import SingleFlight
+
+
+class SlowQuery:
+    """Запрос, который завершается по команде теста и считает вызовы."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return (self.result, args)
+
+
+async def gather_concurrent(group, query, key, count):
+    """Запускает count одинаковых запросов, пока первый еще выполняется."""
+    tasks = [asyncio.ensure_future(group.do(key, query, 42)) for _ in range(count)]
+    await asyncio.sleep(0.05)
+    query.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_requests_share_one_call():
+    """Одновременные запросы с одним ключом выполняют функцию один раз."""
+    group = SingleFlight()
+    query = SlowQuery(result="balance")
+    results = asyncio.run(gather_concurrent(group, query, ("balance", 42), 5))
+    assert results == [("balance", (42,))] * 5
+    assert query.calls == 1
+    assert (group.executed, group.shared, group.in_flight) == (1, 4, 0)
+
+
+def test_error_is_shared():
+    """Ошибка общего запроса получают все ожидающие."""
+    group = SingleFlight()
+    query = SlowQuery(error=ConnectionError("нет соединения"))
+    results = asyncio.run(gather_concurrent(group, query, ("balance", 42), 3))
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert query.calls == 1
+
+
+def test_different_keys_run_separately():
+    """Запросы с разными ключами не объединяются."""
+    group = SingleFlight()
+    query = SlowQuery(result="user")
+    query.release.set()
+
+    async def run():
+        return await asyncio.gather(group.do(("user", 1), query), group.do(("user", 2), query))
+
+    asyncio.run(run())
+    assert query.calls == 2
+
+
+def test_next_request_runs_again():
+    """Результат не кэшируется: запрос после завершения выполняется заново."""
+    group = SingleFlight()
+    query = SlowQuery(result="prediction")
+    query.release.set()
+
+    async def run():
+        await group.do(("prediction", 1), query)
+        await group.do(("prediction", 1), query)
+
+    asyncio.run(run())
+    assert query.calls == 2
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    """Отмена одного ожидающего не прерывает общий запрос для остальных."""
+    group = SingleFlight()
+    query = SlowQuery(result="prediction")
+
+    async def run():
+        first = asyncio.ensure_future(group.do("key", query))
+        second = asyncio.ensure_future(group.do("key", query))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        query.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == ("prediction", ())
+    assert query.calls == 1
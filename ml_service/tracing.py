@@ -0,0 +1,426 @@
+"""
+Сквозная трассировка запроса: API -> RabbitMQ -> воркер -> результат.
+
+Трасса предсказания состоит из спанов HTTP обработчика, списания средств,
+публикации задачи, ожидания в очереди, обработки воркером (модель, запись
+результата в БД, публикация результата). Контекст трассы передается между
+сервисами в заголовке AMQP traceparent (формат W3C Trace Context), время
+публикации - в заголовке PUBLISHED_AT_HEADER, по нему воркер строит спан
+ожидания в очереди.
+
+Решение о записи трассы принимается один раз в ее корне с вероятностью
+TRACE_SAMPLE_RATE и передается дальше во флаге traceparent, поэтому трасса
+записывается либо целиком, либо не записывается. Для незаписываемых трасс
+спаны не создаются, передается только контекст.
+
+Записанные спаны отправляются фоновым потоком пачками в формате OTLP/JSON:
+
+- TRACE_EXPORTER=file - строками в TRACE_FILE (формат файлового экспортера
+  OpenTelemetry Collector, читается приемником otlpjsonfile);
+- TRACE_EXPORTER=otlp - POST в TRACE_OTLP_ENDPOINT (OTLP/HTTP, например
+  http://otel-collector:4318/v1/traces).
+
+Без TRACE_EXPORTER трассировка выключена и заголовки не добавляются. Если
+экспорт не успевает, спаны сверх TRACE_QUEUE_SIZE отбрасываются, а не
+замедляют обработку запросов.
+"""
+import os
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import functools
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from ml_service import codec
+
+logger = logging.getLogger(__name__)
+
+# Куда отправлять спаны: file, otlp или пусто (трассировка выключена)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()
+# Доля записываемых трасс (0..1)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "512"))
+# Как часто отправлять неполную пачку, секунды
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+
+TRACEPARENT_HEADER = "traceparent"
+PUBLISHED_AT_HEADER = "x-published-at"
+
+# Виды спанов OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+KIND_PRODUCER = 4
+KIND_CONSUMER = 5
+
+STATUS_ERROR = 2
+
+
+class SpanContext:
+    """
+    Идентификаторы трассы и спана и флаг записи трассы.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def format_traceparent(context: SpanContext) -> str:
+    """Значение заголовка traceparent."""
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def parse_traceparent(value) -> Optional[SpanContext]:
+    """
+    Разбирает заголовок traceparent.
+
+    Returns:
+        SpanContext или None, если заголовок отсутствует или некорректен
+    """
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "replace")
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    """
+    Записываемый спан.
+    """
+
+    __slots__ = ("context", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, context: SpanContext, parent_id: Optional[str], name: str, kind: int, start_ns: int):
+        self.context = context
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns = start_ns
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def record_exception(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+
+class _NoopSpan:
+    """Спан незаписываемой трассы: атрибуты не сохраняются."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional[SpanContext]] = ContextVar("trace_context", default=None)
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+def otlp_payload(service_name: str, spans: List[Span]) -> Dict[str, Any]:
+    """
+    Пачка спанов в формате OTLP/JSON (ExportTraceServiceRequest).
+    """
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        if span.error:
+            item["status"] = {"code": STATUS_ERROR, "message": span.error}
+        encoded.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "ml_service.tracing"}, "spans": encoded}]
+        }]
+    }
+
+
+class FileSink:
+    """Дописывает пачки OTLP/JSON строками в файл."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, payload: bytes) -> None:
+        with open(self.path, "ab") as file:
+            file.write(payload + b"\n")
+
+
+class OtlpHttpSink:
+    """Отправляет пачки OTLP/JSON в коллектор по HTTP."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def send(self, payload: bytes) -> None:
+        request = urllib.request.Request(
+            self.endpoint, data=payload, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchExporter:
+    """
+    Копит завершенные спаны и отправляет их пачками в фоновом потоке.
+    """
+
+    def __init__(self, sink, service_name: str, batch_size: int = TRACE_BATCH_SIZE,
+                 flush_interval: float = TRACE_FLUSH_INTERVAL, queue_size: int = TRACE_QUEUE_SIZE):
+        self.sink = sink
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.exported = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """Ставит спан в очередь отправки; при переполнении спан отбрасывается."""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _take(self, timeout: Optional[float]) -> List[Span]:
+        batch = []
+        deadline = time.monotonic() + timeout if timeout else None
+        while len(batch) < self.batch_size:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: List[Span]) -> None:
+        try:
+            self.sink.send(codec.dumps(otlp_payload(self.service_name, batch)))
+            self.exported += len(batch)
+        except Exception as e:
+            logger.warning(f"Не удалось отправить {len(batch)} спанов: {e}")
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take(self.flush_interval)
+            if batch:
+                with self._lock:
+                    self._send(batch)
+
+    def flush(self) -> None:
+        """Отправляет накопленные спаны (вызывается при завершении процесса)."""
+        with self._lock:
+            while True:
+                batch = self._take(None)
+                if not batch:
+                    break
+                self._send(batch)
+
+
+class Tracer:
+    """
+    Создает спаны и передает контекст трассы через заголовки сообщений.
+    """
+
+    def __init__(self):
+        self.exporter: Optional[BatchExporter] = None
+        self.sample_rate = TRACE_SAMPLE_RATE
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current(self) -> Optional[SpanContext]:
+        """Контекст текущего спана."""
+        return _current.get()
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, parent: Optional[SpanContext] = None, **attributes):
+        """
+        Спан вокруг блока кода; вложенные спаны и публикуемые сообщения
+        получают его контекст.
+
+        Args:
+            name: Имя спана
+            kind: Вид спана (KIND_*)
+            parent: Родительский контекст; по умолчанию текущий спан
+            **attributes: Атрибуты спана
+
+        Yields:
+            Span (или NOOP_SPAN для незаписываемой трассы)
+        """
+        if self.exporter is None:
+            yield NOOP_SPAN
+            return
+
+        parent = parent or _current.get()
+        if parent is None:
+            context = SpanContext(_new_id(16), _new_id(8), random.random() < self.sample_rate)
+        elif parent.sampled:
+            context = SpanContext(parent.trace_id, _new_id(8), True)
+        else:
+            # Незаписываемая трасса: новый спан не нужен, передается контекст родителя
+            context = parent
+
+        token = _current.set(context)
+        if not context.sampled:
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current.reset(token)
+            return
+
+        span = Span(context, parent.span_id if parent else None, name, kind, time.time_ns())
+        span.attributes.update(attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current.reset(token)
+            self.exporter.export(span)
+
+    def traced(self, name: str, kind: int = KIND_INTERNAL):
+        """Декоратор: выполняет функцию в спане name."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, start_ns: int, end_ns: int, parent: Optional[SpanContext],
+               kind: int = KIND_INTERNAL, **attributes) -> None:
+        """
+        Записывает уже завершившийся интервал как спан (например, ожидание в очереди).
+        """
+        if self.exporter is None or parent is None or not parent.sampled:
+            return
+        span = Span(SpanContext(parent.trace_id, _new_id(8), True), parent.span_id, name, kind, start_ns)
+        span.end_ns = max(end_ns, start_ns)
+        span.attributes.update(attributes)
+        self.exporter.export(span)
+
+    def inject(self, headers: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Добавляет контекст текущего спана и время публикации в заголовки сообщения.
+
+        Returns:
+            dict: Те же заголовки
+        """
+        context = _current.get()
+        if self.exporter is not None and context is not None:
+            headers[TRACEPARENT_HEADER] = format_traceparent(context)
+            if context.sampled:
+                headers[PUBLISHED_AT_HEADER] = time.time_ns()
+        return headers
+
+    def extract(self, headers: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+        """Контекст трассы из заголовков сообщения или HTTP запроса."""
+        if self.exporter is None or not headers:
+            return None
+        return parse_traceparent(headers.get(TRACEPARENT_HEADER))
+
+
+tracer = Tracer()
+
+
+def setup_tracing(service_name: str) -> Tracer:
+    """
+    Включает отправку спанов процесса согласно TRACE_EXPORTER.
+
+    Args:
+        service_name: Имя сервиса в трассах (TRACE_SERVICE_NAME имеет приоритет)
+
+    Returns:
+        Tracer: Общий трассировщик процесса
+    """
+    if tracer.exporter is not None or not TRACE_EXPORTER:
+        return tracer
+
+    if TRACE_EXPORTER == "file":
+        sink = FileSink(TRACE_FILE)
+    elif TRACE_EXPORTER == "otlp":
+        sink = OtlpHttpSink(TRACE_OTLP_ENDPOINT)
+    else:
+        logger.error(f"Неизвестный TRACE_EXPORTER={TRACE_EXPORTER}, трассировка выключена")
+        return tracer
+
+    tracer.exporter = BatchExporter(sink, TRACE_SERVICE_NAME or service_name)
+    atexit.register(tracer.exporter.flush)
+    logger.info(f"Трассировка включена: {TRACE_EXPORTER}, доля трасс {tracer.sample_rate}")
+    return tracer
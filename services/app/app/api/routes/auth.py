@@ -11,7 +11,7 @@ from app.core.security import create_access_token
 from app.db.session import get_db
 from app.schemas.users import Token, User, UserCreate
 from app.services.users import authenticate_user, create_user, get_user_by_username
-from ml_service.models import Balance
+from ml_service.password_hashing import PasswordHashOverloaded, hash_password_async
 
 router = APIRouter(tags=["auth"])
 
@@ -23,7 +23,14 @@ async def login_for_access_token(
     """
     Получение токена доступа.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,17 +58,21 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Пользователь с таким именем уже существует"
         )
     
-    # Создаем пользователя
-    user = create_user(
-        db, 
-        username=user_data.username, 
-        password=user_data.password,
-        email=user_data.email
-    )
-    
-    # Создаем баланс для пользователя
-    balance = Balance(user_id=user.id, amount=10.0)  # Начальный баланс 10.0
-    db.add(balance)
+    # Хешируем пароль в пуле хеширования, не блокируя цикл событий
+    try:
+        password_hash = await hash_password_async(user_data.password)
+    except PasswordHashOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # Создаем пользователя вместе с балансом
+    user = create_user(db, user_data, password_hash=password_hash)
+
+    # Начальный баланс
+    user.balance.amount = 10
     db.commit()
     
     return user 
\ No newline at end of file
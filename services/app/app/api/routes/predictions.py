@@ -1,6 +1,7 @@
 """
 Маршруты для работы с предсказаниями ML моделей.
 """
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict, Any
@@ -10,9 +11,13 @@ from app.core.config import settings
 from app.db.session import get_db
 from app.schemas.users import User
 from app.schemas.predictions import PredictionRequest, PredictionResponse, PredictionHistory
-from app.services.predictions import create_prediction, get_prediction_by_id, get_user_predictions
+from app.services.predictions import create_prediction, get_prediction_by_id, get_user_predictions_json
+from app.core.responses import RawJSONResponse
 from app.services.balances import check_and_decrease_balance
-from app.services.rabbitmq import publish_message
+from app.services.rabbitmq import publish_message, admission_controller, TASK_SOURCE_API
+from app.services.rate_limit import rate_limiter
+from ml_service.admission import AdmissionRejected
+from ml_service.rate_limit import RateLimitExceeded
 
 router = APIRouter(prefix="/predictions", tags=["predictions"])
 
@@ -25,6 +30,18 @@ async def make_prediction(
     """
     Создать новое предсказание.
     """
+    # Не принимаем задачу сверх лимита пользователя или если очередь
+    # не успеет ее обработать за разумное время
+    try:
+        await asyncio.to_thread(rate_limiter.check, f"user:{current_user.id}", getattr(current_user, "tier", None))
+        estimated_completion = await asyncio.to_thread(admission_controller.admit)
+    except (RateLimitExceeded, AdmissionRejected) as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     # Проверяем баланс и списываем средства
     cost = settings.PREDICTION_COST
     if not check_and_decrease_balance(db, current_user.id, cost):
@@ -40,7 +57,8 @@ async def make_prediction(
     message = {
         "prediction_id": prediction.id,
         "user_id": current_user.id,
-        "data": request.data
+        "data": request.data,
+        "source": TASK_SOURCE_API
     }
     if not publish_message(message):
         # В случае ошибки возвращаем статус об ошибке
@@ -59,7 +77,8 @@ async def make_prediction(
         result=prediction.result,
         created_at=prediction.created_at,
         completed_at=prediction.completed_at,
-        cost=prediction.cost
+        cost=prediction.cost,
+        estimated_completion=estimated_completion
     )
 
 @router.get("/{prediction_id}", response_model=PredictionResponse)
@@ -94,7 +113,7 @@ async def get_prediction(
         cost=prediction.cost
     )
 
-@router.get("/", response_model=PredictionHistory)
+@router.get("/", response_model=PredictionHistory, response_class=RawJSONResponse)
 async def get_predictions(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -103,18 +122,7 @@ async def get_predictions(
 ):
     """
     Получить историю предсказаний пользователя.
-    """
-    predictions = get_user_predictions(db, current_user.id, skip, limit)
     
-    return PredictionHistory(
-        predictions=[
-            PredictionResponse(
-                prediction_id=p.id,
-                status=p.status,
-                result=p.result,
-                created_at=p.created_at,
-                completed_at=p.completed_at,
-                cost=p.cost
-            ) for p in predictions
-        ]
-    ) 
\ No newline at end of file
+    Страница собирается в JSON в PostgreSQL и отдается без повторной сериализации.
+    """
+    return RawJSONResponse(get_user_predictions_json(db, current_user.id, skip, limit))
@@ -0,0 +1,19 @@
+"""
+Классы ответов FastAPI.
+"""
+from fastapi.responses import Response
+
+
+class RawJSONResponse(Response):
+    """
+    Ответ с заранее сериализованным JSON.
+
+    Тело передается как есть, без валидации response_model и повторной
+    сериализации: вызывающий код отвечает за соответствие схеме ответа.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return content.encode("utf-8")
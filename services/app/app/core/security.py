@@ -11,7 +11,8 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.db.session import get_db
 from app.services.users import get_user_by_username
-from ml_service.models import User
+from app.schemas.users import CurrentUser
+from ml_service.cache import authenticated_users
 
 # Настройки OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -48,7 +49,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         db: Сессия базы данных
         
     Returns:
-        Объект пользователя
+        CurrentUser: Снимок пользователя, не привязанный к сессии БД
         
     Raises:
         HTTPException: Если токен невалидный или пользователь не найден
@@ -68,6 +69,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except jwt.PyJWTError:
         raise credentials_exception
     
+    # Пользователь кэшируется по subject токена, чтобы не обращаться к БД на каждый запрос
+    cached_user = authenticated_users.get(username)
+    if cached_user is not None:
+        return cached_user
+    
     user = get_user_by_username(db, username=username)
     
     if user is None:
@@ -80,4 +86,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user 
\ No newline at end of file
+    # В кэше хранится снимок полей, а не ORM объект: он не зависит от сессии запроса.
+    # У модели Entity User нет колонки tier, такой пользователь получает тариф по умолчанию
+    current_user = CurrentUser(
+        id=user.id, username=user.username, email=user.email, is_active=user.is_active,
+        tier=getattr(user, "tier", None)
+    )
+    authenticated_users.set(username, current_user)
+    return current_user 
\ No newline at end of file
@@ -10,6 +10,8 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.db.session import SessionLocal, engine
 from ml_service.models import Base, User, Balance
+from ml_service.partitions import setup_predictions_partitioning
+from ml_service.dashboard import setup_dashboard
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +94,18 @@ def create_tables():
     try:
         # Создаем все таблицы
         Base.metadata.create_all(bind=engine)
+        
+        # ORM создает обычную таблицу predictions, переводим ее на помесячные секции;
+        # таблица сводки и триггер событий создаются SQL
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            setup_predictions_partitioning(cursor)
+            setup_dashboard(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        
         logger.info("Таблицы успешно созданы")
         return True
     except Exception as e:
@@ -3,11 +3,12 @@
 """
 import logging
 import sys
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from services.app.app.services import init_db, wait_for_rabbitmq
-from services.app.app.routers import user_router, prediction_router, transaction_router
+from services.app.app.routers import user_router, prediction_router, transaction_router, api_key_router
+from ml_service.tracing import tracer, setup_tracing, KIND_SERVER
 
 # Настройка логирования
 logging.basicConfig(
@@ -32,10 +33,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Корневой спан запроса; клиент может передать свой контекст в заголовке traceparent."""
+    if not tracer.enabled:
+        return await call_next(request)
+    
+    with tracer.span(f"{request.method} {request.url.path}", KIND_SERVER, parent=tracer.extract(request.headers)) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            # Шаблон маршрута вместо пути с ID, чтобы спаны группировались
+            span.update_name(f"{request.method} {route.path}")
+        span.set_attribute("http.status_code", response.status_code)
+        return response
+
 # Регистрация маршрутов
 app.include_router(user_router, prefix="/api")
 app.include_router(prediction_router, prefix="/api/predictions")
 app.include_router(transaction_router, prefix="/api")
+app.include_router(api_key_router, prefix="/api")
 
 
 @app.get("/")
@@ -58,6 +75,7 @@ async def startup_event():
     - Проверка подключения к RabbitMQ
     """
     logger.info("Запуск ML Service API")
+    setup_tracing("ml-app")
     
     # Инициализация базы данных
     if not init_db():
@@ -2,7 +2,7 @@
 Модели Pydantic для API.
 """
 from services.app.app.models.user import (
-    Token, TokenData, User, UserInDB, UserCreate
+    Token, TokenData, User, UserInDB, UserCreate, ApiKeyCreate, ApiKeyInfo, ApiKeyCreated
 )
 from services.app.app.models.prediction import (
     PredictionRequest, PredictionResponse, PredictionHistory
@@ -12,7 +12,7 @@ from services.app.app.models.transaction import (
 )
 
 __all__ = [
-    "Token", "TokenData", "User", "UserInDB", "UserCreate",
+    "Token", "TokenData", "User", "UserInDB", "UserCreate", "ApiKeyCreate", "ApiKeyInfo", "ApiKeyCreated",
     "PredictionRequest", "PredictionResponse", "PredictionHistory",
     "BalanceTopUpRequest", "BalanceTopUpResponse", "BalanceResponse"
 ]
@@ -3,7 +3,7 @@
 """
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 class PredictionRequest(BaseModel):
     """
@@ -21,9 +21,36 @@ class PredictionResponse(BaseModel):
     timestamp: datetime
     cost: float
     completed_at: Optional[datetime] = None
+    estimated_completion: Optional[datetime] = None
 
 class PredictionHistory(BaseModel):
     """
     История предсказаний.
     """
-    predictions: List[PredictionResponse] 
\ No newline at end of file
+    predictions: List[PredictionResponse]
+
+class LabelStats(BaseModel):
+    """
+    Итоги по одной метке результата.
+    """
+    count: int
+    share: float
+    avg_confidence: float
+
+class DailyLabelCount(BaseModel):
+    """
+    Число предсказаний с меткой за день.
+    """
+    day: date
+    label: str
+    count: int
+
+class PredictionStats(BaseModel):
+    """
+    Распределение меток результатов пользователя за период.
+    """
+    since: date
+    days: int
+    total: int
+    labels: Dict[str, LabelStats]
+    daily: List[DailyLabelCount]
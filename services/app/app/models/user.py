@@ -2,9 +2,11 @@
 Модели пользователя для FastAPI.
 """
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
+from services.app.app.models.prediction import PredictionResponse
+
 class Token(BaseModel):
     """
     Модель токена авторизации.
@@ -26,6 +28,10 @@ class User(BaseModel):
     username: str
     email: Optional[str] = None
     is_active: bool = True
+    tier: str = "default"  # Тариф ограничения частоты запросов
+    api_key_id: Optional[int] = None  # ID API ключа, если запрос аутентифицирован ключом
+    scopes: Optional[List[str]] = None  # Разрешения API ключа, None - все разрешения
+    api_key_tier: Optional[str] = None  # Собственный тариф API ключа, если задан
 
 class UserInDB(User):
     """
@@ -39,4 +45,40 @@ class UserCreate(BaseModel):
     """
     username: str
     email: Optional[str] = None
-    password: str 
\ No newline at end of file
+    password: str 
+
+class ApiKeyCreate(BaseModel):
+    """
+    Модель для создания API ключа.
+    """
+    name: str
+    scopes: Optional[List[str]] = None
+
+class ApiKeyInfo(BaseModel):
+    """
+    Модель API ключа без самого ключа.
+    """
+    id: int
+    name: str
+    key_prefix: str
+    scopes: List[str]
+    tier: Optional[str] = None
+    created_at: datetime
+    last_used_at: Optional[datetime] = None
+
+class ApiKeyCreated(ApiKeyInfo):
+    """
+    Созданный API ключ. Ключ возвращается только в этом ответе.
+    """
+    key: str
+
+class UserDashboard(BaseModel):
+    """
+    Сводка пользователя: баланс, счетчики и последние предсказания.
+    """
+    user_id: int
+    balance: float
+    completed_predictions: int
+    active_predictions: int
+    recent_predictions: List[PredictionResponse]
+    updated_at: datetime
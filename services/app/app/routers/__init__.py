@@ -4,5 +4,6 @@
 from services.app.app.routers.user_router import router as user_router
 from services.app.app.routers.prediction_router import router as prediction_router
 from services.app.app.routers.transaction_router import router as transaction_router
+from services.app.app.routers.api_key_router import router as api_key_router
 
-__all__ = ["user_router", "prediction_router", "transaction_router"] 
\ No newline at end of file
+__all__ = ["user_router", "prediction_router", "transaction_router", "api_key_router"] 
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""
+Маршруты для управления API ключами.
+"""
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from services.app.app.models.user import User, ApiKeyCreate, ApiKeyInfo, ApiKeyCreated
+from services.app.app.services.auth_service import get_token_user
+from services.app.app.services.api_key_service import api_key_store
+from ml_service.api_keys import ApiKeyLimitExceeded
+
+# Настройка роутера
+router = APIRouter(tags=["api-keys"])
+
+@router.post("/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(request: ApiKeyCreate, current_user: User = Depends(get_token_user)):
+    """
+    Создание API ключа.
+    
+    Ключ возвращается только в ответе на этот запрос и далее передается
+    в заголовке X-API-Key или Authorization: Bearer.
+    """
+    try:
+        return api_key_store.create(current_user.id, request.name, request.scopes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ApiKeyLimitExceeded as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/api-keys", response_model=List[ApiKeyInfo])
+async def list_api_keys(current_user: User = Depends(get_token_user)):
+    """
+    Список активных API ключей пользователя.
+    """
+    return api_key_store.list(current_user.id)
+
+@router.delete("/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_api_key(key_id: int, current_user: User = Depends(get_token_user)):
+    """
+    Отзыв API ключа.
+    """
+    if not api_key_store.revoke(current_user.id, key_id):
+        raise HTTPException(status_code=404, detail="API ключ не найден")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
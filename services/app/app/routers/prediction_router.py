@@ -1,11 +1,34 @@
 """
 Маршруты для предсказаний.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
 from services.app.app.models.user import User
-from services.app.app.models.prediction import PredictionRequest, PredictionResponse, PredictionHistory
-from services.app.app.services.auth_service import get_current_user
-from services.app.app.services.prediction_service import create_prediction, get_prediction, get_user_predictions
+from services.app.app.models.prediction import PredictionRequest, PredictionResponse, PredictionHistory, PredictionStats
+from services.app.app.services.auth_service import require_scope
+from services.app.app.services.rabbitmq_service import admission_controller
+from services.app.app.services.rate_limit_service import rate_limiter, rate_limit_key_for
+from ml_service.api_keys import SCOPE_PREDICTIONS_READ, SCOPE_PREDICTIONS_WRITE
+from ml_service.admission import AdmissionRejected
+from ml_service.rate_limit import RateLimitExceeded
+from ml_service.singleflight import lookups
+from ml_service.prediction_stats import STATS_DEFAULT_DAYS
+from services.app.app.core.responses import RawJSONResponse
+from services.app.app.services.export_service import EXPORT_FORMATS, export_predictions, accepts_gzip
+from services.app.app.services.prediction_service import (
+    create_prediction,
+    find_replayed_prediction,
+    get_prediction_response,
+    cached_prediction_response,
+    etag_matches,
+    get_user_predictions_json,
+    get_user_prediction_stats,
+    cancel_prediction,
+    PredictionStateError
+)
 
 # Настройка роутера
 router = APIRouter(tags=["predictions"])
@@ -13,14 +36,91 @@ router = APIRouter(tags=["predictions"])
 @router.post("/predict", response_model=PredictionResponse)
 async def make_prediction(
     request: PredictionRequest,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_WRITE))
 ):
     """
     Создание нового предсказания.
+    
+    Повтор запроса с тем же заголовком Idempotency-Key возвращает исходное
+    предсказание без повторного списания средств. При превышении лимита
+    запросов или перегрузке очереди возвращает 429 с заголовком Retry-After.
     """
     try:
-        prediction = create_prediction(current_user.id, request.data)
+        # Повтор запроса получает исходное предсказание до проверки лимитов.
+        # Запросы к БД блокируют, поэтому выполняются в пуле потоков
+        replayed = await asyncio.to_thread(find_replayed_prediction, current_user.id, idempotency_key)
+        if replayed is not None:
+            replayed.pop("replayed", None)
+            response.headers["Idempotent-Replayed"] = "true"
+            return replayed
+        
+        # Пополнение пачки токенов и обновление снимка очередей обращаются к БД
+        # и брокеру, поэтому выполняются в пуле потоков
+        await asyncio.to_thread(rate_limiter.check, rate_limit_key_for(current_user), current_user.tier)
+        # Не принимаем задачу, если очередь не успеет ее обработать за разумное время
+        estimated_completion = await asyncio.to_thread(admission_controller.admit)
+        prediction = await asyncio.to_thread(create_prediction, current_user.id, request.data, idempotency_key)
+        if prediction.pop("replayed", False):
+            response.headers["Idempotent-Replayed"] = "true"
+        else:
+            prediction["estimated_completion"] = estimated_completion
         return prediction
+    except (RateLimitExceeded, AdmissionRejected) as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PredictionStateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/export")
+async def export_prediction_history(
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    since: Optional[datetime] = Query(None, description="Начало периода (включительно)"),
+    until: Optional[datetime] = Query(None, description="Конец периода (не включительно)"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_READ))
+):
+    """
+    Потоковая выгрузка всей истории предсказаний пользователя.
+    
+    Строки отдаются по мере чтения из БД, при Accept-Encoding: gzip поток сжимается.
+    """
+    gzip = accepts_gzip(accept_encoding)
+    try:
+        chunks = export_predictions(current_user.id, format, since, until, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"Content-Disposition": f'attachment; filename="predictions.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[format], headers=headers)
+
+@router.get("/stats", response_model=PredictionStats)
+async def get_prediction_stats(
+    days: int = Query(STATS_DEFAULT_DAYS, description="Период в днях, включая сегодняшний"),
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_READ))
+):
+    """
+    Распределение меток результатов пользователя за последние дни.
+    
+    Строится по дневным счетчикам, которые воркер обновляет при завершении предсказания.
+    """
+    try:
+        return await lookups.do(
+            ("prediction_stats", current_user.id, days),
+            get_user_prediction_stats,
+            current_user.id,
+            days
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -29,30 +129,71 @@ async def make_prediction(
 @router.get("/{prediction_id}", response_model=PredictionResponse)
 async def get_prediction_by_id(
     prediction_id: str,
-    current_user: User = Depends(get_current_user)
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_READ))
 ):
     """
     Получение информации о предсказании по ID.
+    
+    Ответ содержит ETag. Если он совпадает с заголовком If-None-Match,
+    возвращается 304 без тела. Ответы по завершенным предсказаниям
+    отдаются из кэша без обращения к БД, одновременные запросы одного
+    предсказания выполняют один запрос к БД.
+    """
+    try:
+        body, etag = cached_prediction_response(prediction_id, current_user.id) or await lookups.do(
+            ("prediction", prediction_id, current_user.id),
+            get_prediction_response,
+            prediction_id,
+            current_user.id
+        )
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{prediction_id}", response_model=PredictionResponse)
+async def cancel_prediction_by_id(
+    prediction_id: str,
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_WRITE))
+):
+    """
+    Отмена ожидающего предсказания с возвратом средств.
     """
     try:
-        prediction = get_prediction(prediction_id, current_user.id)
+        prediction = cancel_prediction(prediction_id, current_user.id)
         return prediction
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except PredictionStateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("", response_model=PredictionHistory)
+@router.get("", response_model=PredictionHistory, response_class=RawJSONResponse)
 async def get_user_prediction_history(
     skip: int = 0,
     limit: int = 10,
-    current_user: User = Depends(get_current_user)
+    label: Optional[str] = Query(None, max_length=64, description="Метка результата"),
+    current_user: User = Depends(require_scope(SCOPE_PREDICTIONS_READ))
 ):
     """
     Получение истории предсказаний пользователя.
+    
+    Страница собирается в JSON в PostgreSQL и отдается без повторной сериализации.
     """
     try:
-        predictions = get_user_predictions(current_user.id, skip, limit)
-        return {"predictions": predictions}
+        return RawJSONResponse(await lookups.do(
+            ("prediction_history", current_user.id, skip, limit, label),
+            get_user_predictions_json,
+            current_user.id,
+            skip,
+            limit,
+            label
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,23 +1,28 @@
 """
 Маршруты для работы с транзакциями и балансом пользователя.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi.responses import StreamingResponse
 from services.app.app.models.user import User
 from services.app.app.models.transaction import BalanceTopUpRequest, BalanceTopUpResponse, BalanceResponse
-from services.app.app.services.auth_service import get_current_user
+from services.app.app.services.auth_service import get_token_user
 from services.app.app.services.transaction_service import get_balance, top_up_balance, get_user_transactions
+from services.app.app.services.export_service import EXPORT_FORMATS, export_transactions, accepts_gzip
+from ml_service.singleflight import lookups
 from datetime import datetime
 
 # Настройка роутера
 router = APIRouter(tags=["transactions"])
 
 @router.get("/balance")
-async def get_user_balance(current_user: User = Depends(get_current_user)):
+async def get_user_balance(current_user: User = Depends(get_token_user)):
     """
     Получение баланса пользователя.
     """
     try:
-        balance = get_balance(current_user.id)
+        # Одновременные запросы баланса пользователя выполняют один запрос к БД
+        balance = await lookups.do(("balance", current_user.id), get_balance, current_user.id)
         return {
             "user_id": current_user.id,
             "balance": balance,
@@ -29,7 +34,7 @@ async def get_user_balance(current_user: User = Depends(get_current_user)):
 @router.post("/balance/topup", response_model=BalanceTopUpResponse)
 async def top_up_user_balance(
     request: BalanceTopUpRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_token_user)
 ):
     """
     Пополнение баланса пользователя.
@@ -53,7 +58,7 @@ async def top_up_user_balance(
 async def get_transactions_history(
     skip: int = 0,
     limit: int = 10,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_token_user)
 ):
     """
     Получение истории транзакций пользователя.
@@ -62,4 +67,28 @@ async def get_transactions_history(
         transactions = get_user_transactions(current_user.id, skip, limit)
         return {"transactions": transactions}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/transactions/export")
+async def export_transactions_history(
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    since: Optional[datetime] = Query(None, description="Начало периода (включительно)"),
+    until: Optional[datetime] = Query(None, description="Конец периода (не включительно)"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    current_user: User = Depends(get_token_user)
+):
+    """
+    Потоковая выгрузка всей истории транзакций пользователя.
+    
+    Строки отдаются по мере чтения из БД, при Accept-Encoding: gzip поток сжимается.
+    """
+    gzip = accepts_gzip(accept_encoding)
+    try:
+        chunks = export_transactions(current_user.id, format, since, until, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[format], headers=headers)
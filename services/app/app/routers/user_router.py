@@ -4,8 +4,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from services.app.app.models.user import User, UserCreate, Token
-from services.app.app.services.auth_service import get_current_user, create_access_token
+from services.app.app.models.user import User, UserCreate, Token, UserDashboard
+from services.app.app.services.auth_service import get_current_user, get_token_user, create_access_token
+from services.app.app.services.dashboard_service import get_user_dashboard
+from services.app.app.core.responses import RawJSONResponse
+from ml_service.singleflight import lookups
 from services.app.app.services.user_service import create_user
 from services.app.app.services.auth_service import authenticate_user
 from datetime import timedelta
@@ -47,4 +50,20 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     """
     Получение информации о текущем пользователе.
     """
-    return current_user 
\ No newline at end of file
+    return current_user
+
+@router.get("/users/me/dashboard", response_model=UserDashboard, response_class=RawJSONResponse)
+async def read_user_dashboard(current_user: User = Depends(get_token_user)):
+    """
+    Сводка текущего пользователя: баланс, счетчики и последние предсказания.
+    
+    Читается одной строкой модели user_dashboard, которую обновляет проектор.
+    """
+    try:
+        return RawJSONResponse(await lookups.do(
+            ("dashboard", current_user.id),
+            get_user_dashboard,
+            current_user.id
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
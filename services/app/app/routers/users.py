@@ -9,6 +9,7 @@ from app.schemas.users import User, UserCreate, Token
 from app.services.db import get_db
 from app.services.auth import authenticate_user, create_access_token, get_current_user
 from app.services.users import create_user, get_user_by_username
+from ml_service.password_hashing import PasswordHashOverloaded, hash_password_async
 
 router = APIRouter(tags=["users"])
 
@@ -18,7 +19,14 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     """
     Получение токена доступа.
     """
-    user = await authenticate_user(form_data.username, form_data.password, db)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password, db)
+    except PasswordHashOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,7 +44,16 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     Регистрация нового пользователя.
     """
     try:
-        db_user = create_user(db, user)
+        password_hash = await hash_password_async(user.password)
+    except PasswordHashOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    try:
+        db_user = create_user(db, user, password_hash=password_hash)
         return db_user
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
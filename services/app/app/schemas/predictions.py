@@ -19,6 +19,7 @@ class PredictionResponse(BaseModel):
     created_at: datetime
     completed_at: Optional[datetime] = None
     cost: float
+    estimated_completion: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -1,7 +1,7 @@
 """
 Pydantic схемы для пользователей.
 """
-from typing import Optional
+from typing import Optional, Union
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -37,6 +37,13 @@ class User(UserBase):
         orm_mode = True
 
 
+class CurrentUser(User):
+    """Снимок аутентифицированного пользователя (кэшируется между запросами)."""
+    # ID модели Entity User - строка UUID
+    id: Union[int, str]
+    tier: Optional[str] = None
+
+
 class UserInDB(User):
     """Схема пользователя в базе данных."""
     password: str
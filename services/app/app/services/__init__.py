@@ -2,7 +2,7 @@
 Сервисные функции для работы с данными.
 """
 from services.app.app.services.db_service import (
-    get_db_connection, get_db, wait_for_db, create_database, init_db
+    get_db_connection, get_replica_connection, get_db, wait_for_db, create_database, init_db
 )
 from services.app.app.services.auth_service import (
     get_current_user, create_access_token, verify_password, authenticate_user
@@ -21,7 +21,7 @@ from services.app.app.services.rabbitmq_service import (
 )
 
 __all__ = [
-    "get_db_connection", "get_db", "wait_for_db", "create_database", "init_db",
+    "get_db_connection", "get_replica_connection", "get_db", "wait_for_db", "create_database", "init_db",
     "get_current_user", "create_access_token", "verify_password", "authenticate_user",
     "create_user", "get_user_by_username", "get_user_by_id",
     "create_prediction", "get_prediction", "get_user_predictions", "create_prediction_orm",
@@ -0,0 +1,8 @@
+"""
+API ключи пользователей для межсерверных клиентов.
+"""
+from ml_service.api_keys import ApiKeyStore
+from services.app.app.services.db_service import get_db_connection
+
+# Ключи хранятся в PostgreSQL, найденные ключи кэшируются в памяти процесса
+api_key_store = ApiKeyStore(get_db_connection)
@@ -12,6 +12,7 @@ import jwt
 from app.config.settings import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_DELTA
 from app.services.db import get_db
 from ml_service.models.users.user import User
+from app.services.users import verify_user_password
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -100,6 +101,6 @@ async def authenticate_user(username: str, password: str, db: Session):
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return None
-    if not user.verify_password(password):
+    if not await verify_user_password(db, user, password):
         return None
     return user 
\ No newline at end of file
@@ -6,11 +6,15 @@ import logging
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, HTTPException, Security, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 
 from services.app.app.services.db_service import get_db_connection
 from services.app.app.models.user import TokenData, User, UserInDB
+from services.app.app.services.api_key_service import api_key_store
+from ml_service.cache import authenticated_users
+from ml_service.singleflight import lookups
+from ml_service.api_keys import ApiKeyPrincipal, is_api_key, hash_api_key
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -20,8 +24,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "secret_key_for_jwt")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Настройка OAuth2
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Настройка OAuth2. Учетные данные проверяет get_current_user, поэтому схемы
+# не отклоняют запрос сами: достаточно JWT или API ключа
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+# API ключ передается в заголовке X-API-Key или вместо JWT в Authorization: Bearer
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -43,12 +50,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _load_user(username: str) -> Optional[UserInDB]:
     """
-    Получает текущего пользователя из токена.
+    Загружает пользователя из БД по имени.
     
     Args:
-        token: JWT токен
+        username: Имя пользователя
+        
+    Returns:
+        UserInDB или None, если пользователь не найден
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, username, email, password, is_active, tier FROM users WHERE username = %s",
+            (username,)
+        )
+        user_row = cursor.fetchone()
+        
+        if user_row is None:
+            return None
+        
+        return UserInDB(
+            id=user_row[0],
+            username=user_row[1],
+            email=user_row[2],
+            is_active=user_row[4],
+            hashed_password=user_row[3],
+            tier=user_row[5]
+        )
+    finally:
+        if conn:
+            conn.close()
+
+def _api_key_user(principal: ApiKeyPrincipal) -> User:
+    """Пользователь запроса, аутентифицированного API ключом."""
+    return User(
+        id=principal.user_id,
+        username=principal.username,
+        email=principal.email,
+        is_active=principal.is_active,
+        tier=principal.tier,
+        api_key_id=principal.key_id,
+        scopes=sorted(principal.scopes),
+        api_key_tier=principal.key_tier
+    )
+
+async def get_current_user(
+    token: Optional[str] = Depends(oauth2_scheme),
+    api_key: Optional[str] = Security(api_key_header)
+):
+    """
+    Получает текущего пользователя из JWT токена или API ключа.
+    
+    Args:
+        token: JWT токен или API ключ из заголовка Authorization
+        api_key: API ключ из заголовка X-API-Key
         
     Returns:
         User: Объект пользователя
@@ -61,6 +120,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Неверные учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    
+    if api_key is None and is_api_key(token):
+        api_key = token
+    if api_key is not None:
+        principal = api_key_store.cached(api_key)
+        try:
+            if principal is None:
+                # Промах кэша ключей обновляет last_used_at в БД: запрос выполняется в пуле
+                # потоков, одновременные запросы с одним ключом объединяются
+                principal = await lookups.do(("api_key", hash_api_key(api_key)), api_key_store.lookup, api_key)
+        except Exception as e:
+            logger.error(f"Ошибка при проверке API ключа: {e}")
+            raise credentials_exception
+        if not principal:
+            raise credentials_exception
+        if not principal.is_active:
+            raise HTTPException(status_code=400, detail="Пользователь неактивен")
+        return _api_key_user(principal)
+    
+    if token is None:
+        raise credentials_exception
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -70,35 +151,67 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except jwt.PyJWTError:
         raise credentials_exception
     
-    conn = None
+    # Пользователь кэшируется по subject токена, чтобы не обращаться к БД на каждый запрос
+    cached_user = authenticated_users.get(token_data.username)
+    if cached_user is not None:
+        return cached_user
+    
+    # Одновременные промахи кэша по одному пользователю выполняют один запрос к БД
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, password, is_active FROM users WHERE username = %s", (token_data.username,))
-        user_row = cursor.fetchone()
-        
-        if user_row is None:
-            raise credentials_exception
-        
-        user_dict = {
-            "id": user_row[0],
-            "username": user_row[1],
-            "email": user_row[2],
-            "is_active": user_row[4],
-            "hashed_password": user_row[3]
-        }
-        user = UserInDB(**user_dict)
+        user = await lookups.do(("user", token_data.username), _load_user, token_data.username)
     except Exception as e:
         logger.error(f"Ошибка при получении пользователя: {e}")
         raise credentials_exception
-    finally:
-        if conn:
-            conn.close()
+    
+    if user is None:
+        raise credentials_exception
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Пользователь неактивен")
     
-    return User(id=user.id, username=user.username, email=user.email, is_active=user.is_active)
+    current_user = User(id=user.id, username=user.username, email=user.email, is_active=user.is_active, tier=user.tier)
+    authenticated_users.set(token_data.username, current_user)
+    return current_user
+
+def require_scope(scope: str):
+    """
+    Создает зависимость, пропускающую только пользователей с разрешением.
+    
+    Запросы с JWT имеют все разрешения, запросы с API ключом - только
+    разрешения ключа.
+    
+    Args:
+        scope: Требуемое разрешение
+        
+    Returns:
+        function: Зависимость FastAPI, возвращающая пользователя
+    """
+    async def _dependency(current_user: User = Depends(get_current_user)):
+        if current_user.scopes is not None and scope not in current_user.scopes:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"У API ключа нет разрешения {scope}"
+            )
+        return current_user
+    
+    return _dependency
+
+async def get_token_user(current_user: User = Depends(get_current_user)):
+    """
+    Пользователь, аутентифицированный JWT токеном.
+    
+    Управление API ключами недоступно по самим API ключам, чтобы утекший
+    ключ нельзя было использовать для выпуска новых.
+    
+    Raises:
+        HTTPException: Если запрос аутентифицирован API ключом
+    """
+    if current_user.api_key_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Операция доступна только с токеном доступа"
+        )
+    return current_user
 
 def verify_password(plain_password, hashed_password):
     """
@@ -149,7 +262,7 @@ def authenticate_user(username: str, password: str):
         if not verify_password(password, user.hashed_password):
             return False
         
-        return User(id=user.id, username=user.username, email=user.email, is_active=user.is_active)
+        return User(id=user.id, username=user.username, email=user.email, is_active=user.is_active, tier=user.tier)
     except Exception as e:
         logger.error(f"Ошибка при аутентификации пользователя: {e}")
         return False
@@ -0,0 +1,31 @@
+"""
+Сводка пользователя из модели чтения user_dashboard.
+"""
+import logging
+from typing import Optional
+
+from ml_service.dashboard import read_dashboard
+from services.app.app.services.db_service import get_db_connection
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+def get_user_dashboard(user_id) -> Optional[str]:
+    """
+    Получает сводку пользователя одним запросом по первичному ключу.
+    
+    Args:
+        user_id: ID пользователя
+        
+    Returns:
+        str: JSON документ в формате UserDashboard
+    """
+    conn = get_db_connection()
+    try:
+        return read_dashboard(conn, user_id)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Ошибка при получении сводки пользователя: {e}")
+        raise
+    finally:
+        conn.close()
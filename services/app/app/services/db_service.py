@@ -8,7 +8,9 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from sqlalchemy.orm import Session
-from ml_service.db_config import SessionLocal
+from ml_service.db_config import SessionLocal, replica_router
+from ml_service.partitions import setup_predictions_partitioning
+from ml_service.dashboard import setup_dashboard
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -40,6 +42,22 @@ def get_db_connection():
         logger.error(f"Ошибка при соединении с БД: {e}")
         raise
 
+def get_replica_connection():
+    """
+    Создает соединение для чтения, допускающего отставание реплики
+    (история, выгрузки).
+    
+    Берется из пула реплики с допустимым отставанием, а если такой нет -
+    создается соединение с основным сервером.
+    
+    Returns:
+        Соединение psycopg2 (close возвращает соединение реплики в пул)
+    """
+    replica = replica_router.choose()
+    if replica is None:
+        return get_db_connection()
+    return replica.engine.raw_connection()
+
 def get_db():
     """
     Создает сессию SQLAlchemy для работы с БД через ORM.
@@ -131,10 +149,13 @@ def create_database():
             email VARCHAR(255),
             password VARCHAR(255) NOT NULL,
             is_active BOOLEAN DEFAULT TRUE,
+            tier VARCHAR(20) NOT NULL DEFAULT 'default',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
         
+        cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS tier VARCHAR(20) NOT NULL DEFAULT 'default'")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS balances (
             id SERIAL PRIMARY KEY,
@@ -146,17 +167,42 @@ def create_database():
         
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS predictions (
-            id VARCHAR(36) PRIMARY KEY,
+            id VARCHAR(36) NOT NULL,
             user_id INTEGER REFERENCES users(id),
             input_data JSONB NOT NULL,
             result JSONB,
+            label VARCHAR(64),
+            confidence REAL,
+            model_version VARCHAR(50),
+            latency_ms INTEGER,
             status VARCHAR(20) DEFAULT 'pending',
             cost DECIMAL(10, 2) DEFAULT 1.0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP
-        )
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            deadline TIMESTAMP,
+            processed_by VARCHAR(100),
+            lease_expires_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            source VARCHAR(20),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
         """)
         
+        # Колонки, добавленные после создания таблицы
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS deadline TIMESTAMP")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS processed_by VARCHAR(100)")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS source VARCHAR(20)")
+        # Типизированный результат: колонка result хранит только дополнительные поля
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS label VARCHAR(64)")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS confidence REAL")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS model_version VARCHAR(50)")
+        cursor.execute("ALTER TABLE predictions ADD COLUMN IF NOT EXISTS latency_ms INTEGER")
+        # Помесячные секции по created_at (таблица, созданная до секционирования,
+        # переносится один раз), секции на месяцы вперед и индексы
+        setup_predictions_partitioning(cursor)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS transactions (
             id SERIAL PRIMARY KEY,
@@ -164,10 +210,68 @@ def create_database():
             amount DECIMAL(10, 2) NOT NULL,
             type VARCHAR(20) NOT NULL,
             status VARCHAR(20) DEFAULT 'pending',
+            description VARCHAR(255),
+            related_entity_id VARCHAR(36),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
         
+        cursor.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS description VARCHAR(255)")
+        cursor.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS related_entity_id VARCHAR(36)")
+        
+        # Ключи идемпотентности запросов на предсказание
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            key VARCHAR(255) NOT NULL,
+            prediction_id VARCHAR(36) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, key)
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_created_at ON idempotency_keys (created_at)")
+        
+        # Корзины ограничения частоты запросов, общие для всех экземпляров
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key VARCHAR(255) PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        """)
+        
+        # API ключи межсерверных клиентов: хранится только HMAC ключа
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS api_keys (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            name VARCHAR(100) NOT NULL,
+            key_prefix VARCHAR(20) NOT NULL,
+            key_hash VARCHAR(64) NOT NULL UNIQUE,
+            scopes VARCHAR(255) NOT NULL,
+            tier VARCHAR(20),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP,
+            revoked_at TIMESTAMP
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_api_keys_user_id ON api_keys (user_id)")
+        
+        # Дневные счетчики завершенных предсказаний по меткам результата
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_stats_daily (
+            user_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            label VARCHAR(64) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, label)
+        )
+        """)
+        
+        # Сводка пользователя для чтения одной строкой и триггер событий журнала средств
+        setup_dashboard(cursor)
+        
         # Создаем тестового пользователя, если его нет
         cursor.execute("SELECT 1 FROM users WHERE username = 'test'")
         if not cursor.fetchone():
@@ -0,0 +1,213 @@
+"""
+Потоковая выгрузка истории предсказаний и транзакций.
+
+Строки читаются именованным (серверным) курсором PostgreSQL пачками по
+EXPORT_FETCH_SIZE строк, кодируются в NDJSON или CSV и отдаются клиенту
+блоками около EXPORT_CHUNK_SIZE байт, при необходимости сжатыми gzip.
+Память процесса не зависит от размера выгрузки.
+"""
+import os
+import io
+import csv
+import uuid
+import zlib
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from services.app.app.services.db_service import get_replica_connection
+from ml_service import codec
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Количество строк, которое курсор получает от сервера за один раз
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+# Размер блока ответа, байты
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+
+PREDICTION_EXPORT_COLUMNS = [
+    "prediction_id", "status", "input_data", "label", "confidence", "model_version", "latency_ms",
+    "result", "cost", "timestamp", "completed_at"
+]
+PREDICTION_EXPORT_SQL = """
+    SELECT id, status, input_data, label, confidence, model_version, latency_ms,
+           result, cost, created_at, completed_at
+    FROM predictions
+    WHERE user_id = %(user_id)s
+      AND (%(since)s::timestamp IS NULL OR created_at >= %(since)s)
+      AND (%(until)s::timestamp IS NULL OR created_at < %(until)s)
+    ORDER BY created_at, id
+"""
+
+TRANSACTION_EXPORT_COLUMNS = [
+    "id", "amount", "type", "status", "timestamp", "description", "related_entity_id"
+]
+TRANSACTION_EXPORT_SQL = """
+    SELECT id, amount, type, status, created_at, description, related_entity_id
+    FROM transactions
+    WHERE user_id = %(user_id)s
+      AND (%(since)s::timestamp IS NULL OR created_at >= %(since)s)
+      AND (%(until)s::timestamp IS NULL OR created_at < %(until)s)
+    ORDER BY created_at, id
+"""
+
+
+def stream_rows(sql: str, params: dict) -> Iterator[tuple]:
+    """
+    Читает строки запроса именованным курсором.
+
+    Args:
+        sql: SQL запрос
+        params: Параметры запроса
+
+    Yields:
+        tuple: Строка результата
+    """
+    conn = get_replica_connection()
+    try:
+        # Именованный курсор держит результат на сервере и отдает его пачками
+        cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cursor.itersize = EXPORT_FETCH_SIZE
+        cursor.execute(sql, params)
+        for row in cursor:
+            yield row
+        cursor.close()
+    finally:
+        # Выгрузка только читает данные, транзакцию просто завершаем
+        conn.rollback()
+        conn.close()
+
+
+def encode_ndjson(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Кодирует строки в NDJSON: один JSON объект на строку."""
+    for row in rows:
+        yield codec.dumps(dict(zip(columns, row))) + b"\n"
+
+
+def encode_csv(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Кодирует строки в CSV с заголовком, JSON поля записываются строкой JSON."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([
+            codec.dumps(value).decode("utf-8") if isinstance(value, (dict, list))
+            else value.isoformat() if isinstance(value, datetime)
+            else value
+            for value in row
+        ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def chunked(lines: Iterable[bytes], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Объединяет строки в блоки около chunk_size байт."""
+    parts: List[bytes] = []
+    size = 0
+    for data in lines:
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Сжимает поток блоков в формат gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _export(
+    sql: str,
+    columns: Sequence[str],
+    user_id,
+    export_format: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    gzip: bool
+) -> Iterator[bytes]:
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}. Доступны: {', '.join(EXPORT_FORMATS)}")
+    if since and until and since >= until:
+        raise ValueError("Начало периода должно быть раньше его конца")
+
+    rows = stream_rows(sql, {"user_id": user_id, "since": since, "until": until})
+    encode = encode_ndjson if export_format == "ndjson" else encode_csv
+    chunks = chunked(encode(columns, rows))
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def export_predictions(
+    user_id,
+    export_format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False
+) -> Iterator[bytes]:
+    """
+    Выгружает предсказания пользователя.
+
+    Args:
+        user_id: ID пользователя
+        export_format: ndjson или csv
+        since: Начало периода по времени создания (включительно)
+        until: Конец периода (не включительно)
+        gzip: Сжимать ли поток
+
+    Returns:
+        Итератор блоков ответа. Запрос к БД выполняется при первой итерации.
+
+    Raises:
+        ValueError: Неизвестный формат или некорректный период
+    """
+    return _export(PREDICTION_EXPORT_SQL, PREDICTION_EXPORT_COLUMNS, user_id, export_format, since, until, gzip)
+
+
+def export_transactions(
+    user_id,
+    export_format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False
+) -> Iterator[bytes]:
+    """
+    Выгружает транзакции пользователя.
+
+    Args:
+        user_id: ID пользователя
+        export_format: ndjson или csv
+        since: Начало периода по времени создания (включительно)
+        until: Конец периода (не включительно)
+        gzip: Сжимать ли поток
+
+    Returns:
+        Итератор блоков ответа. Запрос к БД выполняется при первой итерации.
+
+    Raises:
+        ValueError: Неизвестный формат или некорректный период
+    """
+    return _export(TRANSACTION_EXPORT_SQL, TRANSACTION_EXPORT_COLUMNS, user_id, export_format, since, until, gzip)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Поддерживает ли клиент gzip по заголовку Accept-Encoding."""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
@@ -5,13 +5,25 @@ import os
 import uuid
 import logging
 import json
-from datetime import datetime
+import hashlib
+from typing import Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from ml_service.db_config import SessionLocal
-from services.app.app.services.rabbitmq_service import publish_message, ML_TASK_QUEUE
+from ml_service.db_config import SessionLocal, ReadSessionLocal, engine
+from services.app.app.services.rabbitmq_service import publish_message, ML_TASK_QUEUE, TASK_SOURCE_API
 from services.app.app.services.transaction_service import deduct_from_balance, deduct_from_balance_orm
 from ml_service.models.prediction import Prediction
+from ml_service.models.idempotency_key import IdempotencyKey
+from ml_service.cache import completed_predictions, invalidate_prediction
+from ml_service.results import prediction_result_view
+from ml_service.tracing import tracer
+from ml_service.prediction_stats import USER_STATS_SQL, STATS_DEFAULT_DAYS, STATS_MAX_DAYS, stats_since, summarize
+from ml_service.prediction_sql import (
+    CANCEL_AND_REFUND_SQL, FAIL_UNPUBLISHED_SQL, RESERVE_IDEMPOTENCY_KEY_SQL, user_predictions_json_sql
+)
+from services.app.app.models.prediction import PredictionResponse
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -19,6 +31,32 @@ logger = logging.getLogger(__name__)
 # Стоимость предсказания
 PREDICTION_COST = float(os.getenv("PREDICTION_COST", "1.0"))
 
+# Срок выполнения задачи: после него задача не выполняется, а средства возвращаются
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", "3600"))
+
+# Страница истории в JSON: время создания в схеме PredictionResponse - поле timestamp
+USER_PREDICTIONS_JSON_SQL = user_predictions_json_sql("timestamp")
+
+
+# Срок хранения ключа идемпотентности: повтор запроса с тем же ключом
+# в течение этого времени возвращает исходное предсказание
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Ключ фиксируется в одной транзакции с предсказанием, поэтому ключ без
+# предсказания не считается повтором
+FIND_IDEMPOTENT_PREDICTION_SQL = """
+SELECT k.prediction_id, p.status, p.created_at, p.cost
+FROM idempotency_keys k
+JOIN predictions p ON p.id = k.prediction_id
+WHERE k.user_id = :user_id AND k.key = :key
+AND k.created_at >= NOW() - make_interval(secs => :ttl)
+"""
+
+
+class PredictionStateError(Exception):
+    """Предсказание находится в состоянии, не допускающем операцию."""
+
 def get_db():
     """
     Создает сессию базы данных.
@@ -32,13 +70,14 @@ def get_db():
     finally:
         db.close()
 
-def create_prediction(user_id, input_data):
+def create_prediction(user_id, input_data, idempotency_key=None):
     """
     Создает новое предсказание.
     
     Args:
         user_id: ID пользователя
         input_data: Входные данные для предсказания
+        idempotency_key: Ключ идемпотентности запроса
         
     Returns:
         dict: Информация о созданном предсказании
@@ -46,7 +85,7 @@ def create_prediction(user_id, input_data):
     db = SessionLocal()
     try:
         # Вызываем ORM версию функции
-        prediction_info = create_prediction_orm(db, user_id, input_data)
+        prediction_info = create_prediction_orm(db, user_id, input_data, idempotency_key)
         return prediction_info
     except Exception as e:
         logger.error(f"Ошибка при создании предсказания: {e}")
@@ -54,10 +93,61 @@ def create_prediction(user_id, input_data):
     finally:
         db.close()
 
+def _prediction_info(db: Session, prediction_id, user_id) -> Optional[dict]:
+    """
+    Читает предсказание пользователя через ORM.
+    
+    Returns:
+        dict или None: Информация о предсказании, None если его нет
+    """
+    prediction = db.query(Prediction).filter(
+        Prediction.id == prediction_id,
+        Prediction.user_id == user_id
+    ).first()
+    
+    if not prediction:
+        return None
+    
+    return {
+        "prediction_id": prediction.id,
+        "status": prediction.status,
+        "result": prediction_result_view(prediction),
+        "timestamp": prediction.created_at,
+        "completed_at": prediction.completed_at,
+        "cost": float(prediction.cost)
+    }
+
+def find_replayed_prediction(user_id, idempotency_key):
+    """
+    Ищет предсказание, уже созданное запросом с тем же ключом идемпотентности.
+    
+    Проверяется до лимита запросов и контроля допуска, чтобы повтор
+    запроса получил исходное предсказание, а не 429.
+    
+    Args:
+        user_id: ID пользователя
+        idempotency_key: Ключ идемпотентности запроса
+        
+    Returns:
+        dict или None: Информация об исходном предсказании
+    """
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None
+    db = SessionLocal()
+    try:
+        return find_idempotent_prediction(db, user_id, idempotency_key)
+    finally:
+        db.close()
+
 def get_prediction(prediction_id, user_id):
     """
     Получает информацию о предсказании.
     
+    Завершенное предсказание не меняется, поэтому сначала оно читается с
+    реплики. Если на реплике его еще нет или оно не завершено (реплика
+    могла не получить последние изменения), чтение повторяется на
+    основном сервере.
+    
     Args:
         prediction_id: ID предсказания
         user_id: ID пользователя
@@ -65,26 +155,23 @@ def get_prediction(prediction_id, user_id):
     Returns:
         dict: Информация о предсказании
     """
-    db = SessionLocal()
     try:
-        # Получаем информацию о предсказании через ORM
-        prediction = db.query(Prediction).filter(
-            Prediction.id == prediction_id,
-            Prediction.user_id == user_id
-        ).first()
+        db = ReadSessionLocal()
+        try:
+            on_replica = db.get_bind() is not engine
+            result = _prediction_info(db, prediction_id, user_id)
+        finally:
+            db.close()
         
-        if not prediction:
-            raise ValueError("Предсказание не найдено или у вас нет доступа к нему")
+        if on_replica and (result is None or result["status"] != "completed"):
+            db = SessionLocal()
+            try:
+                result = _prediction_info(db, prediction_id, user_id)
+            finally:
+                db.close()
         
-        # Формируем ответ
-        result = {
-            "prediction_id": prediction.id,
-            "status": prediction.status,
-            "result": prediction.result,
-            "timestamp": prediction.created_at,
-            "completed_at": prediction.completed_at,
-            "cost": float(prediction.cost)
-        }
+        if result is None:
+            raise ValueError("Предсказание не найдено или у вас нет доступа к нему")
         
         return result
     
@@ -95,7 +182,95 @@ def get_prediction(prediction_id, user_id):
     except Exception as e:
         logger.error(f"Ошибка при получении предсказания: {e}")
         raise
+
+def cached_prediction_response(prediction_id, user_id) -> Optional[Tuple[bytes, str]]:
+    """
+    Возвращает кэшированный ответ по завершенному предсказанию пользователя.
+    
+    Returns:
+        tuple или None: (JSON тело ответа, ETag), если ответ есть в кэше
+    """
+    cached = completed_predictions.get(prediction_id)
+    if cached is not None and cached[0] == user_id:
+        return cached[1], cached[2]
+    return None
+
+def get_prediction_response(prediction_id, user_id) -> Tuple[bytes, str]:
+    """
+    Получает сериализованный ответ по предсказанию и его ETag.
     
+    Завершенные предсказания не меняются, поэтому их ответы берутся из
+    кэша процесса без обращения к БД.
+    
+    Args:
+        prediction_id: ID предсказания
+        user_id: ID пользователя
+        
+    Returns:
+        tuple: (JSON тело ответа, сильный ETag)
+        
+    Raises:
+        ValueError: Предсказание не найдено
+    """
+    cached = cached_prediction_response(prediction_id, user_id)
+    if cached is not None:
+        return cached
+    
+    prediction = get_prediction(prediction_id, user_id)
+    body = PredictionResponse(**prediction).model_dump_json().encode('utf-8')
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    if prediction["status"] == "completed":
+        completed_predictions.set(prediction_id, (user_id, body, etag))
+    return body, etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (слабое сравнение, как требует RFC 9110).
+    
+    Args:
+        if_none_match: Значение заголовка If-None-Match
+        etag: Текущий ETag ресурса
+        
+    Returns:
+        bool: True если клиент уже имеет актуальную версию
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def get_user_predictions_json(user_id, skip=0, limit=10, label=None) -> str:
+    """
+    Получает страницу истории предсказаний пользователя в виде готового JSON.
+    
+    JSON строит PostgreSQL (json_agg), поэтому ответ не проходит через
+    ORM объекты и модели Pydantic.
+    
+    Args:
+        user_id: ID пользователя
+        skip: Количество записей для пропуска
+        limit: Количество записей для возврата
+        label: Вернуть только предсказания с этой меткой результата
+        
+    Returns:
+        str: JSON документ в формате PredictionHistory
+    """
+    db = ReadSessionLocal()
+    try:
+        return db.execute(
+            text(USER_PREDICTIONS_JSON_SQL),
+            {"user_id": user_id, "skip": skip, "limit": limit, "label": label}
+        ).scalar()
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка предсказаний: {e}")
+        raise
     finally:
         db.close()
 
@@ -111,7 +286,7 @@ def get_user_predictions(user_id, skip=0, limit=10):
     Returns:
         list: Список предсказаний
     """
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         # Получаем список предсказаний через ORM
         predictions = db.query(Prediction).filter(
@@ -126,7 +301,7 @@ def get_user_predictions(user_id, skip=0, limit=10):
             results.append({
                 "prediction_id": pred.id,
                 "status": pred.status,
-                "result": pred.result,
+                "result": prediction_result_view(pred),
                 "timestamp": pred.created_at,
                 "completed_at": pred.completed_at,
                 "cost": float(pred.cost)
@@ -141,31 +316,170 @@ def get_user_predictions(user_id, skip=0, limit=10):
     finally:
         db.close()
 
-def create_prediction_orm(db: Session, user_id: str, input_data: dict):
+def get_user_prediction_stats(user_id, days=STATS_DEFAULT_DAYS):
+    """
+    Получает распределение меток результатов пользователя за последние дни.
+    
+    Читаются дневные счетчики prediction_stats_daily, поэтому время ответа
+    зависит от длины периода, а не от числа предсказаний.
+    
+    Args:
+        user_id: ID пользователя
+        days: Длина периода в днях, включая сегодняшний
+        
+    Returns:
+        dict: Статистика в формате PredictionStats
+        
+    Raises:
+        ValueError: Некорректная длина периода
+    """
+    if days < 1 or days > STATS_MAX_DAYS:
+        raise ValueError(f"Период должен быть от 1 до {STATS_MAX_DAYS} дней")
+    
+    since = stats_since(days)
+    db = ReadSessionLocal()
+    try:
+        rows = db.execute(text(USER_STATS_SQL), {"user_id": user_id, "since": since}).all()
+        return summarize(rows, since, days)
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики предсказаний: {e}")
+        raise
+    finally:
+        db.close()
+
+def cancel_prediction(prediction_id, user_id):
+    """
+    Отменяет ожидающее предсказание и возвращает его стоимость на баланс.
+    
+    Args:
+        prediction_id: ID предсказания
+        user_id: ID пользователя
+        
+    Returns:
+        dict: Информация об отмененном предсказании
+        
+    Raises:
+        ValueError: Предсказание не найдено
+        PredictionStateError: Предсказание уже обрабатывается или завершено
+    """
+    db = SessionLocal()
+    try:
+        cancelled = db.execute(
+            text(CANCEL_AND_REFUND_SQL),
+            {"prediction_id": prediction_id, "user_id": user_id}
+        ).scalar()
+        db.commit()
+        
+        if cancelled is None:
+            prediction = db.query(Prediction).filter(
+                Prediction.id == prediction_id,
+                Prediction.user_id == user_id
+            ).first()
+            if not prediction:
+                raise ValueError("Предсказание не найдено или у вас нет доступа к нему")
+            raise PredictionStateError(
+                f"Предсказание в статусе {prediction.status} не может быть отменено"
+            )
+        
+        invalidate_prediction(prediction_id)
+        logger.info(f"Предсказание {prediction_id} отменено пользователем {user_id}")
+    
+    except (ValueError, PredictionStateError) as e:
+        logger.warning(str(e))
+        raise
+    
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при отмене предсказания: {e}")
+        raise
+    
+    finally:
+        db.close()
+    
+    return get_prediction(prediction_id, user_id)
+
+def find_idempotent_prediction(db: Session, user_id: str, idempotency_key: str):
+    """
+    Ищет предсказание, созданное ранее с тем же ключом идемпотентности.
+    
+    Args:
+        db: Сессия базы данных
+        user_id: ID пользователя
+        idempotency_key: Ключ идемпотентности
+        
+    Returns:
+        dict или None: Информация об исходном предсказании
+    """
+    row = db.execute(
+        text(FIND_IDEMPOTENT_PREDICTION_SQL),
+        {"user_id": user_id, "key": idempotency_key, "ttl": IDEMPOTENCY_KEY_TTL}
+    ).first()
+    if not row:
+        return None
+    
+    prediction_id, status, created_at, cost = row
+    return {
+        "prediction_id": prediction_id,
+        "status": status,
+        "timestamp": created_at,
+        "cost": float(cost) if cost is not None else PREDICTION_COST,
+        "replayed": True
+    }
+
+def create_prediction_orm(db: Session, user_id: str, input_data: dict, idempotency_key: str = None):
     """
     Создает новое предсказание с использованием ORM.
     
+    Повторный запрос с тем же ключом идемпотентности возвращает исходное
+    предсказание без списания средств и отправки задачи в очередь.
+    
     Args:
         db: Сессия базы данных
         user_id: ID пользователя
         input_data: Входные данные для предсказания
+        idempotency_key: Ключ идемпотентности запроса
         
     Returns:
         dict: Информация о созданном предсказании
     """
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValueError(f"Ключ идемпотентности должен содержать от 1 до {IDEMPOTENCY_KEY_MAX_LENGTH} символов")
+    
     try:
         # Генерируем уникальный ID для предсказания
         prediction_id = str(uuid.uuid4())
         now = datetime.now()
+        deadline = now + timedelta(seconds=TASK_TTL_SECONDS)
+        
+        if idempotency_key is not None:
+            existing = find_idempotent_prediction(db, user_id, idempotency_key)
+            if existing:
+                logger.info(f"Повтор запроса с ключом идемпотентности, предсказание {existing['prediction_id']}")
+                return existing
+            
+            # Ключ, списание средств и предсказание фиксируются одной транзакцией
+            reserved = db.execute(
+                text(RESERVE_IDEMPOTENCY_KEY_SQL),
+                {"user_id": user_id, "key": idempotency_key, "prediction_id": prediction_id, "ttl": IDEMPOTENCY_KEY_TTL}
+            ).first()
+            if not reserved:
+                # Ключ занял параллельный запрос
+                db.rollback()
+                existing = find_idempotent_prediction(db, user_id, idempotency_key)
+                if existing:
+                    return existing
+                raise PredictionStateError("Запрос с этим ключом идемпотентности уже обрабатывается")
         
         # Списываем средства с баланса пользователя с использованием ORM
-        transaction_info = deduct_from_balance_orm(
-            db,
-            user_id, 
-            PREDICTION_COST, 
-            f"Оплата предсказания #{prediction_id}", 
-            prediction_id
-        )
+        with tracer.span("deduct_from_balance"):
+            transaction_info = deduct_from_balance_orm(
+                db,
+                user_id, 
+                PREDICTION_COST, 
+                f"Оплата предсказания #{prediction_id}", 
+                prediction_id,
+                commit=False
+            )
         
         # Создаем новый объект Prediction
         prediction = Prediction(
@@ -174,24 +488,38 @@ def create_prediction_orm(db: Session, user_id: str, input_data: dict):
             input_data=input_data,
             status="pending",
             cost=PREDICTION_COST,
-            created_at=now
+            created_at=now,
+            deadline=deadline,
+            source=TASK_SOURCE_API
         )
         
-        # Добавляем и сохраняем в БД
-        db.add(prediction)
-        db.commit()
+        # Добавляем и сохраняем в БД вместе с ключом и списанием: при ошибке
+        # откатывается все, и повтор запроса не найдет ключ без предсказания
+        with tracer.span("insert_prediction"):
+            db.add(prediction)
+            db.commit()
         
         # Отправляем задачу в очередь
         message = {
             "prediction_id": prediction_id,
             "user_id": user_id,
             "data": input_data,
-            "timestamp": now.isoformat()
+            "timestamp": now.isoformat(),
+            "deadline": deadline.isoformat(),
+            "source": TASK_SOURCE_API
         }
         
-        if not publish_message(message, ML_TASK_QUEUE):
-            # В случае ошибки отправки задачи отменяем транзакцию
-            db.rollback()
+        if not publish_message(message, ML_TASK_QUEUE, expiration=TASK_TTL_SECONDS):
+            # Списание и предсказание уже зафиксированы: переводим предсказание
+            # в статус failed с возвратом средств и только затем освобождаем ключ,
+            # чтобы повтор запроса создал задачу заново без двойного списания
+            db.execute(text(FAIL_UNPUBLISHED_SQL), {"prediction_id": prediction_id})
+            if idempotency_key is not None:
+                db.query(IdempotencyKey).filter(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == idempotency_key
+                ).delete()
+            db.commit()
             logger.error(f"Не удалось отправить задачу в очередь для предсказания {prediction_id}")
             raise Exception("Ошибка при отправке задачи в очередь обработки")
         
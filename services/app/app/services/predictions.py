@@ -6,16 +6,22 @@ import json
 import uuid
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.config.settings import PREDICTION_COST
 from app.services.rabbitmq import publish_message, ML_TASK_QUEUE
 from app.services.transactions import deduct_from_balance
 from ml_service.models.transactions.prediction import Prediction
+from ml_service.results import PredictionResult, prediction_result_view
+from ml_service.prediction_sql import user_predictions_json_sql
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Страница истории в JSON: время создания в схеме PredictionResponse - поле created_at
+USER_PREDICTIONS_JSON_SQL = user_predictions_json_sql("created_at")
+
 
 def create_prediction(db: Session, user_id: int, data: Dict[str, Any], cost: float = 1.0) -> Prediction:
     """
@@ -78,6 +84,28 @@ def get_user_predictions(db: Session, user_id: int, skip: int = 0, limit: int =
     ).offset(skip).limit(limit).all()
 
 
+def get_user_predictions_json(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> str:
+    """
+    Получает страницу истории предсказаний пользователя в виде готового JSON.
+    
+    JSON строит PostgreSQL (json_agg), поэтому ответ не проходит через
+    ORM объекты и модели Pydantic.
+    
+    Args:
+        db: Сессия базы данных
+        user_id: ID пользователя
+        skip: Смещение для пагинации
+        limit: Ограничение количества результатов
+        
+    Returns:
+        JSON документ в формате PredictionHistory
+    """
+    return db.execute(
+        text(USER_PREDICTIONS_JSON_SQL),
+        {"user_id": user_id, "skip": skip, "limit": limit, "label": None}
+    ).scalar()
+
+
 def update_prediction_result(
     db: Session, 
     prediction_id: str, 
@@ -90,17 +118,21 @@ def update_prediction_result(
     Args:
         db: Сессия базы данных
         prediction_id: ID предсказания
-        result: Результат предсказания
+        result: Результат предсказания (PredictionResult.to_dict)
         worker_id: ID воркера, выполнившего предсказание
         
     Returns:
         Обновленный объект предсказания или None
+        
+    Raises:
+        ValueError: Если в результате нет метки или уверенности
     """
     prediction = get_prediction_by_id(db, prediction_id)
     if not prediction:
         return None
         
-    prediction.result = result
+    for column, value in PredictionResult.from_dict(result).columns().items():
+        setattr(prediction, column, value)
     prediction.status = "completed"
     prediction.completed_at = datetime.utcnow()
     prediction.processed_by = worker_id
@@ -139,7 +171,7 @@ def get_prediction(db: Session, prediction_id: str, user_id: str):
     return {
         "prediction_id": prediction.id,
         "status": prediction.status,
-        "result": prediction.result,
+        "result": prediction_result_view(prediction),
         "timestamp": prediction.created_at,
         "completed_at": prediction.completed_at,
         "cost": float(prediction.cost)
@@ -172,7 +204,7 @@ def get_user_predictions_list(db: Session, user_id: str, skip: int = 0, limit: i
         predictions_list.append({
             "prediction_id": prediction.id,
             "status": prediction.status,
-            "result": prediction.result,
+            "result": prediction_result_view(prediction),
             "timestamp": prediction.created_at,
             "completed_at": prediction.completed_at,
             "cost": float(prediction.cost)
@@ -2,14 +2,18 @@
 Сервисные функции для работы с RabbitMQ.
 """
 import logging
-import json
 import time
 import pika
 from typing import Dict, Any
 from app.core.config import settings
+from ml_service.admission import AdmissionController
+from ml_service.messages import encode_message, KIND_TASK
 
 logger = logging.getLogger(__name__)
 
+# Источник задач, созданных через API
+TASK_SOURCE_API = "api"
+
 
 def get_rabbitmq_connection():
     """
@@ -78,13 +82,17 @@ def publish_message(message: Dict[str, Any], queue_name: str = None) -> bool:
         # Объявляем очередь
         channel.queue_declare(queue=queue_name, durable=True)
         
+        # Формат и сжатие тела задаются MESSAGE_FORMAT и MESSAGE_COMPRESSION
+        body, message_properties = encode_message(message, KIND_TASK)
+        
         # Публикуем сообщение
         channel.basic_publish(
             exchange="",
             routing_key=queue_name,
-            body=json.dumps(message),
+            body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # сообщение будет сохранено на диск
+                **message_properties
             )
         )
         
@@ -96,4 +104,7 @@ def publish_message(message: Dict[str, Any], queue_name: str = None) -> bool:
     
     except Exception as e:
         logger.error(f"Ошибка при публикации сообщения в RabbitMQ: {e}")
-        return False 
\ No newline at end of file
+        return False 
+
+# Контроль допуска задач по глубине очереди
+admission_controller = AdmissionController(get_rabbitmq_connection)
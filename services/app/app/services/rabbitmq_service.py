@@ -2,11 +2,14 @@
 Сервис для работы с RabbitMQ.
 """
 import os
-import json
 import logging
 import time
 import pika
 
+from ml_service.admission import AdmissionController
+from ml_service.messages import encode_message, KIND_TASK
+from ml_service.tracing import tracer, KIND_PRODUCER
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -18,6 +21,11 @@ RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
 ML_TASK_QUEUE = "ml_tasks"
 ML_RESULT_QUEUE = "ml_results"
+# Полоса интерактивных задач (Telegram бот); задачи API идут в ML_TASK_QUEUE
+ML_INTERACTIVE_QUEUE = os.getenv("ML_INTERACTIVE_QUEUE", "ml_tasks_interactive")
+
+# Источник задачи для разделения полос обработки
+TASK_SOURCE_API = "api"
 
 def get_rabbitmq_connection():
     """
@@ -62,13 +70,15 @@ def wait_for_rabbitmq():
     logger.error("Не удалось подключиться к RabbitMQ после нескольких попыток")
     return False
 
-def publish_message(message, queue_name=ML_TASK_QUEUE):
+@tracer.traced("publish_message", KIND_PRODUCER)
+def publish_message(message, queue_name=ML_TASK_QUEUE, expiration=None):
     """
     Публикует сообщение в очередь RabbitMQ.
     
     Args:
         message: Сообщение для публикации
         queue_name: Имя очереди
+        expiration: Время жизни сообщения в очереди, секунды
         
     Returns:
         bool: True если публикация успешна, False в случае ошибки
@@ -81,14 +91,20 @@ def publish_message(message, queue_name=ML_TASK_QUEUE):
         # Объявляем очередь
         channel.queue_declare(queue=queue_name, durable=True)
         
+        # Формат и сжатие тела задаются MESSAGE_FORMAT и MESSAGE_COMPRESSION
+        body, message_properties = encode_message(message, KIND_TASK)
+        # Контекст трассы передается воркеру в заголовках сообщения
+        tracer.inject(message_properties["headers"])
+        
         # Публикуем сообщение
         channel.basic_publish(
             exchange='',
             routing_key=queue_name,
-            body=json.dumps(message).encode('utf-8'),
+            body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # делаем сообщение постоянным
-                content_type='application/json'
+                expiration=str(int(expiration * 1000)) if expiration else None,
+                **message_properties
             )
         )
         
@@ -98,4 +114,6 @@ def publish_message(message, queue_name=ML_TASK_QUEUE):
         return True
     except Exception as e:
         logger.error(f"Ошибка при публикации сообщения: {e}")
-        return False 
\ No newline at end of file
+        return False 
+# Контроль допуска задач по глубине очереди: общий для всех запросов процесса
+admission_controller = AdmissionController(get_rabbitmq_connection)
@@ -0,0 +1,8 @@
+"""
+Ограничение частоты запросов пользователей.
+"""
+from ml_service.rate_limit import create_rate_limiter
+from app.db.session import engine
+
+# Корзины хранятся в PostgreSQL, поэтому лимиты общие для всех экземпляров API
+rate_limiter = create_rate_limiter(engine.raw_connection)
@@ -0,0 +1,28 @@
+"""
+Ограничение частоты запросов пользователей API.
+"""
+from ml_service.rate_limit import create_rate_limiter
+from services.app.app.services.db_service import get_db_connection
+
+# Корзины хранятся в PostgreSQL, поэтому лимиты общие для всех экземпляров API
+rate_limiter = create_rate_limiter(get_db_connection)
+
+
+def user_rate_limit_key(user_id) -> str:
+    """Ключ корзины пользователя API."""
+    return f"user:{user_id}"
+
+
+def rate_limit_key_for(user) -> str:
+    """
+    Ключ корзины для запроса пользователя.
+
+    API ключ с собственным тарифом получает отдельную корзину, остальные
+    запросы (с JWT или ключом без тарифа) расходуют корзину пользователя.
+
+    Args:
+        user: Пользователь запроса (services.app.app.models.user.User)
+    """
+    if user.api_key_id is not None and user.api_key_tier:
+        return f"apikey:{user.api_key_id}"
+    return user_rate_limit_key(user.id)
@@ -325,7 +325,7 @@ def top_up_balance_orm(db: Session, user_id: int, amount: float, description="П
         raise
 
 def deduct_from_balance_orm(db: Session, user_id: int, amount: float, 
-                           description="Списание средств", related_entity_id=None):
+                           description="Списание средств", related_entity_id=None, commit=True):
     """
     Списывает средства с баланса пользователя с использованием ORM.
     
@@ -335,6 +335,9 @@ def deduct_from_balance_orm(db: Session, user_id: int, amount: float,
         amount: Сумма списания
         description: Описание транзакции
         related_entity_id: ID связанной сущности (например, предсказания)
+        commit: Фиксировать ли транзакцию; при False списание только
+            отправляется в БД и фиксируется вызывающим кодом вместе с
+            остальными изменениями
         
     Returns:
         tuple: (previous_balance, current_balance, transaction_id)
@@ -373,8 +376,11 @@ def deduct_from_balance_orm(db: Session, user_id: int, amount: float,
             related_entity_id=related_entity_id
         )
         db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        if commit:
+            db.commit()
+            db.refresh(transaction)
+        else:
+            db.flush()
         
         return prev_balance, current_balance, transaction.id
     
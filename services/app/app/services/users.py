@@ -9,19 +9,26 @@ from typing import Optional
 
 from ml_service.models.users.user import User
 from ml_service.models.transactions.balance import Balance
+from ml_service.password_hashing import (
+    PasswordHashOverloaded,
+    check_password_async,
+    hash_password_async,
+    needs_rehash
+)
 from app.schemas.users import UserCreate
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
-def create_user(db: Session, user_data: UserCreate):
+def create_user(db: Session, user_data: UserCreate, password_hash: Optional[str] = None):
     """
     Создает нового пользователя.
     
     Args:
         db: Сессия базы данных
         user_data: Данные для создания пользователя
+        password_hash: Заранее вычисленный хеш пароля (из асинхронного обработчика)
         
     Returns:
         User: Созданный пользователь
@@ -42,8 +49,8 @@ def create_user(db: Session, user_data: UserCreate):
             else:
                 raise ValueError("Пользователь с таким email уже существует")
         
-        # Хешируем пароль
-        hashed_password = User.hash_password(user_data.password)
+        # Хешируем пароль, если хеш не вычислен заранее в пуле хеширования
+        hashed_password = password_hash or User.hash_password(user_data.password)
         
         # Создаем нового пользователя
         user = User(
@@ -120,7 +127,42 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).offset(skip).limit(limit).all()
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def verify_user_password(db: Session, user: User, password: str) -> bool:
+    """
+    Проверяет пароль пользователя в пуле хеширования.
+
+    Если стоимость сохраненного хеша отличается от BCRYPT_ROUNDS, после
+    успешной проверки хеш пересчитывается и сохраняется.
+
+    Args:
+        db: Сессия базы данных
+        user: Пользователь
+        password: Пароль пользователя
+
+    Returns:
+        True если пароль верный, иначе False
+
+    Raises:
+        PasswordHashOverloaded: Если пул хеширования переполнен
+    """
+    if not await check_password_async(password, user.password_hash):
+        return False
+
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = await hash_password_async(password)
+            db.commit()
+            logger.info(f"Хеш пароля пользователя {user.username} пересчитан с новой стоимостью")
+        except PasswordHashOverloaded:
+            # Пересчет не обязателен, повторим при следующем входе
+            pass
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Не удалось пересчитать хеш пароля пользователя {user.username}: {e}")
+    return True
+
+
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """
     Аутентифицирует пользователя.
     
@@ -131,11 +173,13 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
         
     Returns:
         Объект пользователя или None
+
+    Raises:
+        PasswordHashOverloaded: Если пул хеширования переполнен
     """
     user = get_user_by_username(db, username)
     if not user:
         return None
-    # В реальном приложении нужно проверять хеш пароля
-    if user.password != password:
+    if not await verify_user_password(db, user, password):
         return None
-    return user 
\ No newline at end of file
+    return user
@@ -18,7 +18,8 @@ from services.bot.handlers import (
     process_prediction_text,
     cmd_prediction_status, 
     cmd_prediction_history,
-    cmd_balance
+    cmd_balance,
+    cmd_summary
 )
 
 # Настройка логирования
@@ -44,6 +45,7 @@ dp.register_message_handler(send_welcome, commands=['start', 'help'])
 dp.register_message_handler(cmd_predict, commands=['predict'])
 dp.register_message_handler(cancel_prediction, commands=['cancel'], state='*')
 dp.register_message_handler(cmd_balance, commands=['balance'])
+dp.register_message_handler(cmd_summary, commands=['summary'])
 dp.register_message_handler(cmd_prediction_status, commands=['status'])
 dp.register_message_handler(cmd_prediction_history, commands=['history'])
 
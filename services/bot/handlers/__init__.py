@@ -17,7 +17,8 @@ from services.bot.handlers.predict_handlers import (
 )
 
 from services.bot.handlers.balance_handlers import (
-    cmd_balance
+    cmd_balance,
+    cmd_summary
 )
 
 __all__ = [
@@ -34,5 +35,6 @@ __all__ = [
     "cmd_prediction_history",
     
     # Обработчики баланса
-    "cmd_balance"
+    "cmd_balance",
+    "cmd_summary"
 ] 
\ No newline at end of file
@@ -3,7 +3,7 @@
 """
 import logging
 from aiogram import types
-from services.bot.services import get_user_balance
+from services.bot.services import get_user_balance, get_user_summary
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -28,4 +28,37 @@ async def cmd_balance(message: types.Message):
         
     except Exception as e:
         logger.error(f"Ошибка при получении баланса: {e}")
-        await message.reply("Произошла ошибка при получении информации о балансе.") 
\ No newline at end of file
+        await message.reply("Произошла ошибка при получении информации о балансе.")
+
+async def cmd_summary(message: types.Message):
+    """
+    Обрабатывает команду /summary.
+    Показывает баланс, счетчики и последние предсказания одним запросом к сводке.
+    """
+    user_id = message.from_user.id
+    
+    try:
+        summary = await get_user_summary(user_id)
+        if not summary:
+            await message.reply("Сводка пока недоступна, попробуйте позже.")
+            return
+        
+        message_text = (
+            f"Баланс: {summary['balance']:.2f} кредитов\n"
+            f"Завершено предсказаний: {summary['completed_predictions']}\n"
+            f"В обработке: {summary['active_predictions']}\n"
+        )
+        
+        recent = summary["recent_predictions"][:5]
+        if recent:
+            message_text += "\nПоследние предсказания:\n"
+            for prediction in recent:
+                label = (prediction.get("result") or {}).get("label")
+                message_text += f"#{prediction['prediction_id']} - {prediction['status']}"
+                message_text += f" ({label})\n" if label else "\n"
+        
+        await message.reply(message_text)
+        
+    except Exception as e:
+        logger.error(f"Ошибка при получении сводки: {e}")
+        await message.reply("Произошла ошибка при получении сводки.")
@@ -24,6 +24,8 @@ async def send_welcome(message: types.Message):
         "/predict - сделать предсказание\n"
         "/balance - проверить баланс\n"
         "/history - история предсказаний\n"
+        "/summary - сводка: баланс и последние предсказания\n"
+        "/cancel <id> - отменить предсказание и вернуть средства\n"
         "/help - показать это сообщение\n\n"
         "Для начала работы используй команду /predict и отправь мне текст для анализа."
     )
@@ -1,6 +1,7 @@
 """
 Обработчики команд предсказания.
 """
+import asyncio
 import logging
 from aiogram import types
 from aiogram.dispatcher import FSMContext
@@ -8,9 +9,13 @@ from aiogram.dispatcher.filters.state import State, StatesGroup
 
 from services.bot.services import (
     create_prediction,
+    message_idempotency_key,
+    cancel_user_prediction,
     get_prediction_status,
-    get_user_predictions
+    get_user_predictions,
+    check_rate_limit
 )
+from ml_service.rate_limit import RateLimitExceeded
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -35,10 +40,32 @@ async def cmd_predict(message: types.Message):
 
 async def cancel_prediction(message: types.Message, state: FSMContext):
     """
-    Отменяет текущее предсказание.
+    Обрабатывает команду /cancel.
+    Без аргументов отменяет ввод текста, с ID - отменяет поставленное
+    в очередь предсказание и возвращает его стоимость.
     """
     await state.finish()
-    await message.reply("Предсказание отменено.")
+    
+    args = message.get_args().split()
+    if not args:
+        await message.reply("Предсказание отменено.")
+        return
+    
+    prediction_id = args[0]
+    
+    try:
+        refunded = await cancel_user_prediction(message.from_user.id, prediction_id)
+        await message.reply(
+            f"Предсказание #{prediction_id} отменено.\n"
+            f"На баланс возвращено {refunded} кредитов."
+        )
+        
+    except ValueError as e:
+        await message.reply(f"Ошибка: {str(e)}")
+        
+    except Exception as e:
+        logger.error(f"Ошибка при отмене предсказания: {e}")
+        await message.reply("Произошла ошибка при отмене предсказания.")
 
 
 async def process_prediction_text(message: types.Message, state: FSMContext):
@@ -48,11 +75,23 @@ async def process_prediction_text(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     text = message.text
     
+    try:
+        # Пополнение пачки токенов обращается к БД, не блокируем цикл событий
+        await asyncio.to_thread(check_rate_limit, user_id)
+    except RateLimitExceeded as e:
+        await message.reply(f"Слишком много запросов. Попробуйте через {e.retry_after} с.")
+        await state.finish()
+        return
+    
     await message.reply("Обрабатываю ваш запрос... ⏳")
     
     try:
         # Создаем предсказание
-        prediction_id = await create_prediction(user_id, text)
+        prediction_id = await create_prediction(
+            user_id,
+            text,
+            idempotency_key=message_idempotency_key(message.chat.id, message.message_id)
+        )
         
         # Сохраняем ID предсказания в состоянии
         await state.update_data(prediction_id=prediction_id)
@@ -98,12 +137,14 @@ async def cmd_prediction_status(message: types.Message):
         prediction = await get_prediction_status(prediction_id)
         
         # Формируем ответ в зависимости от статуса
-        if prediction["status"] == "pending":
+        if prediction["status"] in ("pending", "processing"):
             status_text = "⏳ В обработке"
         elif prediction["status"] == "completed":
             status_text = "✅ Завершено"
         elif prediction["status"] == "failed":
             status_text = "❌ Ошибка"
+        elif prediction["status"] == "cancelled":
+            status_text = "🚫 Отменено"
         else:
             status_text = f"Статус: {prediction['status']}"
         
@@ -151,12 +192,14 @@ async def cmd_prediction_history(message: types.Message):
         
         for i, prediction in enumerate(predictions, 1):
             # Определяем статус
-            if prediction["status"] == "pending":
+            if prediction["status"] in ("pending", "processing"):
                 status_text = "⏳ В обработке"
             elif prediction["status"] == "completed":
                 status_text = "✅ Завершено"
             elif prediction["status"] == "failed":
                 status_text = "❌ Ошибка"
+            elif prediction["status"] == "cancelled":
+                status_text = "🚫 Отменено"
             else:
                 status_text = f"Статус: {prediction['status']}"
             
@@ -6,7 +6,8 @@ from services.bot.services.db_service import (
     get_db_connection,
     wait_for_db,
     register_user,
-    get_user_balance
+    get_user_balance,
+    get_user_summary
 )
 
 from services.bot.services.rabbitmq_service import (
@@ -14,11 +15,18 @@ from services.bot.services.rabbitmq_service import (
     wait_for_rabbitmq, 
     publish_message,
     ML_TASK_QUEUE,
-    ML_RESULT_QUEUE
+    ML_RESULT_QUEUE,
+    ML_INTERACTIVE_QUEUE
+)
+
+from services.bot.services.rate_limit_service import (
+    check_rate_limit
 )
 
 from services.bot.services.prediction_service import (
     create_prediction,
+    message_idempotency_key,
+    cancel_user_prediction,
     get_prediction_status,
     get_user_predictions
 )
@@ -29,6 +37,7 @@ __all__ = [
     "wait_for_db",
     "register_user",
     "get_user_balance",
+    "get_user_summary",
     
     # Сервис RabbitMQ
     "get_rabbitmq_connection",
@@ -36,9 +45,15 @@ __all__ = [
     "publish_message",
     "ML_TASK_QUEUE",
     "ML_RESULT_QUEUE",
+    "ML_INTERACTIVE_QUEUE",
+    
+    # Ограничение частоты запросов
+    "check_rate_limit",
     
     # Сервис предсказаний
     "create_prediction",
+    "message_idempotency_key",
+    "cancel_user_prediction",
     "get_prediction_status",
     "get_user_predictions"
 ] 
\ No newline at end of file
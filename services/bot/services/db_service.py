@@ -7,6 +7,9 @@ import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from ml_service import codec
+from ml_service.dashboard import read_dashboard
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -140,4 +143,31 @@ async def get_user_balance(user_id):
     
     finally:
         if conn:
-            conn.close() 
\ No newline at end of file
+            conn.close()
+
+async def get_user_summary(user_id):
+    """
+    Получает сводку пользователя из модели чтения user_dashboard.
+    
+    Args:
+        user_id: ID пользователя в базе данных
+        
+    Returns:
+        dict: Баланс, число завершенных и выполняющихся предсказаний
+        и последние предсказания (recent_predictions)
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        summary = read_dashboard(conn, user_id)
+        return codec.loads(summary) if summary else None
+    
+    except Exception as e:
+        logger.error(f"Ошибка при получении сводки пользователя: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    
+    finally:
+        if conn:
+            conn.close()
@@ -3,27 +3,55 @@
 """
 import os
 import uuid
-import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 
 from services.bot.services.db_service import get_db_connection
-from services.bot.services.rabbitmq_service import publish_message, ML_TASK_QUEUE
+from services.bot.services.rabbitmq_service import publish_message, ML_INTERACTIVE_QUEUE, TASK_SOURCE_BOT
+from ml_service import codec
+from ml_service.results import result_json_sql
+from ml_service.prediction_sql import (
+    CANCEL_AND_REFUND_SQL, FAIL_UNPUBLISHED_SQL, RESERVE_IDEMPOTENCY_KEY_SQL, pyformat
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Результат предсказания собирается из колонок в JSON текст
+RESULT_SQL = f"({result_json_sql()})::text"
+
 # Стоимость предсказания
 PREDICTION_COST = float(os.getenv("PREDICTION_COST", "1.0"))
 
-async def create_prediction(user_id, text):
+# Срок выполнения задачи: пользователь бота не ждет результат дольше нескольких минут
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", "600"))
+
+# Общие с сервисом API запросы отмены, возврата за неотправленную задачу
+# и резервирования ключа идемпотентности в формате параметров psycopg2
+CANCEL_AND_REFUND_SQL = pyformat(CANCEL_AND_REFUND_SQL)
+FAIL_UNPUBLISHED_SQL = pyformat(FAIL_UNPUBLISHED_SQL)
+RESERVE_IDEMPOTENCY_KEY_SQL = pyformat(RESERVE_IDEMPOTENCY_KEY_SQL)
+
+# Срок хранения ключа идемпотентности, секунды
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+def message_idempotency_key(chat_id, message_id):
+    """
+    Формирует ключ идемпотентности по сообщению Telegram.
+    
+    Повторная доставка того же обновления не создает второе предсказание.
+    """
+    return f"tg:{chat_id}:{message_id}"
+
+async def create_prediction(user_id, text, idempotency_key=None):
     """
     Создает новое предсказание.
     
     Args:
         user_id: ID пользователя
         text: Текст для предсказания
+        idempotency_key: Ключ идемпотентности запроса
         
     Returns:
         str: ID созданного предсказания
@@ -33,19 +61,37 @@ async def create_prediction(user_id, text):
         # Генерируем уникальный ID
         prediction_id = str(uuid.uuid4())
         now = datetime.now()
+        deadline = now + timedelta(seconds=TASK_TTL_SECONDS)
         
         # Подготавливаем сообщение для отправки в RabbitMQ
         message = {
             "prediction_id": prediction_id,
             "user_id": user_id,
             "data": {"text": text},
-            "timestamp": now.isoformat()
+            "timestamp": now.isoformat(),
+            "deadline": deadline.isoformat(),
+            "source": TASK_SOURCE_BOT
         }
         
         # Получаем соединение с БД
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        if idempotency_key is not None:
+            cursor.execute(
+                RESERVE_IDEMPOTENCY_KEY_SQL,
+                {"user_id": user_id, "key": idempotency_key, "prediction_id": prediction_id, "ttl": IDEMPOTENCY_KEY_TTL}
+            )
+            if not cursor.fetchone():
+                # Запрос уже обработан: возвращаем исходное предсказание
+                conn.rollback()
+                cursor.execute(
+                    "SELECT prediction_id FROM idempotency_keys WHERE user_id = %s AND key = %s",
+                    (user_id, idempotency_key)
+                )
+                logger.info(f"Повтор запроса с ключом идемпотентности {idempotency_key}")
+                return cursor.fetchone()[0]
+        
         # Списываем средства с баланса
         # 1. Проверяем баланс
         cursor.execute("SELECT amount FROM balances WHERE user_id = %s", (user_id,))
@@ -75,21 +121,33 @@ async def create_prediction(user_id, text):
         cursor.execute(
             """
             INSERT INTO predictions 
-            (id, user_id, input_data, status, cost, created_at) 
-            VALUES (%s, %s, %s, %s, %s, %s)
+            (id, user_id, input_data, status, cost, created_at, deadline, source) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (prediction_id, user_id, json.dumps({"text": text}), "pending", PREDICTION_COST, now)
+            (
+                prediction_id, user_id, codec.dumps({"text": text}).decode('utf-8'), "pending",
+                PREDICTION_COST, now, deadline, TASK_SOURCE_BOT
+            )
         )
         
+        # Фиксируем списание и предсказание до публикации: воркер может
+        # получить задачу сразу и должен найти предсказание в БД
+        conn.commit()
+        
         # Отправляем сообщение в очередь
-        if not publish_message(message, ML_TASK_QUEUE):
-            conn.rollback()
+        if not publish_message(message, ML_INTERACTIVE_QUEUE, expiration=TASK_TTL_SECONDS):
             logger.error(f"Не удалось отправить сообщение в очередь для предсказания {prediction_id}")
+            # Задача не отправлена: возвращаем средства и освобождаем ключ,
+            # чтобы повтор запроса создал задачу заново
+            cursor.execute(FAIL_UNPUBLISHED_SQL, {"prediction_id": prediction_id})
+            if idempotency_key is not None:
+                cursor.execute(
+                    "DELETE FROM idempotency_keys WHERE user_id = %s AND key = %s",
+                    (user_id, idempotency_key)
+                )
+            conn.commit()
             raise Exception("Ошибка при отправке задачи")
         
-        # Подтверждаем транзакцию
-        conn.commit()
-        
         return prediction_id
     
     except Exception as e:
@@ -102,6 +160,52 @@ async def create_prediction(user_id, text):
         if conn:
             conn.close()
 
+async def cancel_user_prediction(user_id, prediction_id):
+    """
+    Отменяет ожидающее предсказание пользователя и возвращает средства.
+    
+    Args:
+        user_id: ID пользователя в Telegram
+        prediction_id: ID предсказания
+        
+    Returns:
+        float: Возвращенная сумма
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(CANCEL_AND_REFUND_SQL, {"prediction_id": prediction_id, "user_id": user_id})
+        cancelled = cursor.fetchone()
+        conn.commit()
+        
+        if cancelled:
+            logger.info(f"Предсказание {prediction_id} отменено пользователем {user_id}")
+            return float(cancelled[1])
+        
+        cursor.execute(
+            "SELECT status FROM predictions WHERE id = %s AND user_id = %s",
+            (prediction_id, user_id)
+        )
+        prediction = cursor.fetchone()
+        if not prediction:
+            raise ValueError(f"Предсказание {prediction_id} не найдено")
+        raise ValueError(f"Предсказание в статусе {prediction[0]} не может быть отменено")
+    
+    except ValueError:
+        raise
+    
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"Ошибка при отмене предсказания: {e}")
+        raise
+    
+    finally:
+        if conn:
+            conn.close()
+
 async def get_prediction_status(prediction_id):
     """
     Получает статус предсказания.
@@ -118,8 +222,8 @@ async def get_prediction_status(prediction_id):
         cursor = conn.cursor()
         
         cursor.execute(
-            """
-            SELECT id, status, result, created_at, completed_at, cost 
+            f"""
+            SELECT id, status, {RESULT_SQL}, created_at, completed_at, cost 
             FROM predictions 
             WHERE id = %s
             """,
@@ -134,7 +238,7 @@ async def get_prediction_status(prediction_id):
         result = {
             "prediction_id": prediction[0],
             "status": prediction[1],
-            "result": json.loads(prediction[2]) if prediction[2] else None,
+            "result": codec.loads(prediction[2]) if prediction[2] else None,
             "created_at": prediction[3],
             "completed_at": prediction[4],
             "cost": float(prediction[5])
@@ -167,8 +271,8 @@ async def get_user_predictions(user_id, limit=5):
         cursor = conn.cursor()
         
         cursor.execute(
-            """
-            SELECT id, status, result, created_at, completed_at, cost 
+            f"""
+            SELECT id, status, {RESULT_SQL}, created_at, completed_at, cost 
             FROM predictions 
             WHERE user_id = %s
             ORDER BY created_at DESC
@@ -184,7 +288,7 @@ async def get_user_predictions(user_id, limit=5):
             result.append({
                 "prediction_id": p[0],
                 "status": p[1],
-                "result": json.loads(p[2]) if p[2] else None,
+                "result": codec.loads(p[2]) if p[2] else None,
                 "created_at": p[3],
                 "completed_at": p[4],
                 "cost": float(p[5])
@@ -3,9 +3,9 @@
 """
 import os
 import logging
-import json
 import time
 import pika
+from ml_service.messages import encode_message, KIND_TASK
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -18,6 +18,9 @@ RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
 ML_TASK_QUEUE = "ml_tasks"
 ML_RESULT_QUEUE = "ml_results"
+# Задачи бота идут в интерактивную полосу с гарантированной долей мощности воркеров
+ML_INTERACTIVE_QUEUE = os.getenv("ML_INTERACTIVE_QUEUE", "ml_tasks_interactive")
+TASK_SOURCE_BOT = "bot"
 
 def get_rabbitmq_connection():
     """
@@ -62,13 +65,14 @@ def wait_for_rabbitmq():
     logger.error("Не удалось подключиться к RabbitMQ после нескольких попыток")
     return False
 
-def publish_message(message, queue_name=ML_TASK_QUEUE):
+def publish_message(message, queue_name=ML_TASK_QUEUE, expiration=None):
     """
     Публикует сообщение в очередь RabbitMQ.
     
     Args:
         message: Сообщение для публикации
         queue_name: Имя очереди
+        expiration: Время жизни сообщения в очереди, секунды
         
     Returns:
         bool: True если публикация успешна, False в случае ошибки
@@ -80,14 +84,18 @@ def publish_message(message, queue_name=ML_TASK_QUEUE):
         # Объявляем очередь
         channel.queue_declare(queue=queue_name, durable=True)
         
+        # Формат и сжатие тела задаются MESSAGE_FORMAT и MESSAGE_COMPRESSION
+        body, message_properties = encode_message(message, KIND_TASK)
+        
         # Публикуем сообщение
         channel.basic_publish(
             exchange='',
             routing_key=queue_name,
-            body=json.dumps(message).encode('utf-8'),
+            body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # сообщение будет сохранено на диск
-                content_type='application/json'
+                expiration=str(int(expiration * 1000)) if expiration else None,
+                **message_properties
             )
         )
         
@@ -0,0 +1,24 @@
+"""
+Ограничение частоты запросов пользователей бота.
+"""
+from ml_service.rate_limit import create_rate_limiter
+from services.bot.services.db_service import get_db_connection
+
+# Тариф пользователей бота
+BOT_RATE_LIMIT_TIER = "bot"
+
+# Корзины общие с API и хранятся в PostgreSQL
+rate_limiter = create_rate_limiter(get_db_connection)
+
+
+def check_rate_limit(telegram_id):
+    """
+    Учитывает запрос пользователя бота.
+    
+    Args:
+        telegram_id: ID пользователя в Telegram
+        
+    Raises:
+        RateLimitExceeded: Лимит запросов исчерпан
+    """
+    rate_limiter.check(f"tg:{telegram_id}", BOT_RATE_LIMIT_TIER)
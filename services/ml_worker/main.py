@@ -12,6 +12,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 
 from services.ml_worker.worker.services.worker_service import run_worker, WORKER_ID
 
+# Режим запуска: worker - обработка задач, dispatcher - справедливая диспетчеризация,
+# reaper - возврат зависших задач в очередь, projector - обновление сводки user_dashboard
+WORKER_MODE = os.getenv("WORKER_MODE", "worker")
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +24,30 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
+    if WORKER_MODE == "dispatcher":
+        from services.ml_worker.worker.services.dispatcher_service import run_dispatcher
+        logger.info("Запуск диспетчера справедливой очереди")
+        if not run_dispatcher():
+            logger.error("Ошибка при запуске диспетчера")
+            sys.exit(1)
+        sys.exit(0)
+
+    if WORKER_MODE == "reaper":
+        from services.ml_worker.worker.services.reaper_service import run_reaper
+        logger.info("Запуск reaper зависших задач")
+        if not run_reaper():
+            logger.error("Ошибка при запуске reaper")
+            sys.exit(1)
+        sys.exit(0)
+
+    if WORKER_MODE == "projector":
+        from services.ml_worker.worker.services.projector_service import run_projector
+        logger.info("Запуск проектора сводки пользователей")
+        if not run_projector():
+            logger.error("Ошибка при запуске проектора")
+            sys.exit(1)
+        sys.exit(0)
+
     logger.info(f"Запуск ML Worker с ID: {WORKER_ID}")
     if not run_worker():
         logger.error("Ошибка при запуске ML Worker")
@@ -25,4 +25,86 @@ DB_PASS = os.getenv("DB_PASS", "postgres")
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Генерируем уникальный идентификатор воркера
-WORKER_ID = os.getenv("WORKER_ID", f"worker-{socket.gethostname()}-{random.randint(1000, 9999)}") 
\ No newline at end of file
+WORKER_ID = os.getenv("WORKER_ID", f"worker-{socket.gethostname()}-{random.randint(1000, 9999)}") 
+
+# Настройки справедливой диспетчеризации задач между пользователями
+# Диспетчер забирает задачи из ML_TASK_QUEUE, раскладывает их по
+# пользовательским подочередям и выдает воркерам в ML_DISPATCH_QUEUE
+FAIR_DISPATCH_ENABLED = os.getenv("FAIR_DISPATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+ML_DISPATCH_QUEUE = os.getenv("ML_DISPATCH_QUEUE", "ml_tasks_fair")
+ML_TASK_DONE_QUEUE = os.getenv("ML_TASK_DONE_QUEUE", "ml_tasks_done")
+ML_USER_QUEUE_PREFIX = os.getenv("ML_USER_QUEUE_PREFIX", "ml_tasks.user.")
+# Сколько задач пользователь получает за один раунд deficit round robin
+FAIR_QUANTUM = int(os.getenv("FAIR_QUANTUM", "1"))
+# Максимум задач одного пользователя, одновременно выданных воркерам
+FAIR_USER_INFLIGHT_LIMIT = int(os.getenv("FAIR_USER_INFLIGHT_LIMIT", "2"))
+# Максимум задач, одновременно выданных воркерам (глубина ML_DISPATCH_QUEUE + в работе)
+FAIR_DISPATCH_WINDOW = int(os.getenv("FAIR_DISPATCH_WINDOW", "6"))
+# Через сколько секунд выданная задача без уведомления о завершении считается потерянной
+FAIR_INFLIGHT_TIMEOUT = float(os.getenv("FAIR_INFLIGHT_TIMEOUT", "120"))
+FAIR_INGRESS_PREFETCH = int(os.getenv("FAIR_INGRESS_PREFETCH", "200"))
+# Очередь и период отчетов диспетчера о длине подочередей для контроля допуска API
+ML_BACKLOG_QUEUE = os.getenv("ADMISSION_BACKLOG_QUEUE", "ml_tasks_backlog")
+FAIR_BACKLOG_REPORT_INTERVAL = float(os.getenv("FAIR_BACKLOG_REPORT_INTERVAL", "2"))
+# Заголовок, в котором диспетчер передает воркеру ключ пользователя задачи
+FAIR_USER_HEADER = "x-fair-user"
+# Заголовок с идентификатором выдачи; воркер возвращает его в уведомлении о завершении
+FAIR_LEASE_HEADER = "x-fair-lease"
+
+# Полосы обработки: интерактивные задачи бота и массовые задачи API
+ML_INTERACTIVE_QUEUE = os.getenv("ML_INTERACTIVE_QUEUE", "ml_tasks_interactive")
+# Доля мощности полосы пропорциональна ее весу, пока в обеих полосах есть задачи
+LANE_INTERACTIVE_WEIGHT = int(os.getenv("LANE_INTERACTIVE_WEIGHT", "3"))
+LANE_BULK_WEIGHT = int(os.getenv("LANE_BULK_WEIGHT", "1"))
+# Период отчета о глубине очередей и задержках полос, секунды
+LANE_STATS_INTERVAL = float(os.getenv("LANE_STATS_INTERVAL", "60"))
+LANE_PREFETCH = int(os.getenv("LANE_PREFETCH", "2"))
+
+# Задачи с истекшим сроком (поле deadline) не выполняются, а помечаются
+# статусом expired и возвращаются пользователю пакетами
+EXPIRE_BATCH_SIZE = int(os.getenv("EXPIRE_BATCH_SIZE", "200"))
+EXPIRE_FLUSH_INTERVAL = float(os.getenv("EXPIRE_FLUSH_INTERVAL", "2"))
+# Период поиска в БД просроченных задач, которые брокер удалил по expiration
+EXPIRE_SWEEP_INTERVAL = float(os.getenv("EXPIRE_SWEEP_INTERVAL", "60"))
+
+# Отмененные пользователем задачи: воркер держит их ID в памяти и не выполняет
+CANCEL_REFRESH_INTERVAL = float(os.getenv("CANCEL_REFRESH_INTERVAL", "2"))
+# Сколько секунд помнить отмененную задачу; должно покрывать срок жизни задач в очереди
+CANCEL_RETENTION = float(os.getenv("CANCEL_RETENTION", "7200"))
+# На сколько секунд назад от последней известной отмены перечитывать БД: completed_at
+# ставится до коммита, и отмена, закоммиченная позже, может оказаться раньше метки
+CANCEL_REFRESH_OVERLAP = float(os.getenv("CANCEL_REFRESH_OVERLAP", "30"))
+
+# Захват задачи воркером: пока срок не истек, повторная доставка того же
+# сообщения не запускает инференс повторно
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300"))
+
+# Срок хранения ключей идемпотентности запросов; устаревшие ключи удаляются при периодическом поиске
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# Возврат зависших задач в очередь (WORKER_MODE=reaper)
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "30"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "100"))
+# Через сколько секунд ожидающая задача считается потерянной брокером;
+# повторно отправленная задача не возвращается в очередь раньше этого срока
+REAPER_PENDING_TIMEOUT = int(os.getenv("REAPER_PENDING_TIMEOUT", "900"))
+# После стольких захватов без результата задача переводится в статус dead;
+# значение должно быть больше числа повторных попыток RETRY_MAX_RETRIES
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "4"))
+
+# Повторные попытки после ошибки обработки с экспоненциальной задержкой:
+# RETRY_BASE_DELAY, RETRY_BASE_DELAY * RETRY_BACKOFF_FACTOR, ... секунд.
+# Для каждой задержки создается очередь ожидания с TTL, из которой сообщение
+# через dead letter exchange возвращается в исходную очередь.
+RETRY_MAX_RETRIES = int(os.getenv("RETRY_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = int(os.getenv("RETRY_BASE_DELAY", "5"))
+RETRY_BACKOFF_FACTOR = int(os.getenv("RETRY_BACKOFF_FACTOR", "4"))
+RETRY_DELAYS = [RETRY_BASE_DELAY * RETRY_BACKOFF_FACTOR ** attempt for attempt in range(RETRY_MAX_RETRIES)]
+ML_DEAD_QUEUE = os.getenv("ML_DEAD_QUEUE", "ml_tasks_dead")
+RETRY_COUNT_HEADER = "x-retry-count"
+FAILURE_REASON_HEADER = "x-failure-reason"
+
+# Проектор сводки user_dashboard (WORKER_MODE=projector): события за интервал
+# объединяются, и строка каждого пользователя пересобирается один раз
+PROJECTOR_FLUSH_INTERVAL = float(os.getenv("PROJECTOR_FLUSH_INTERVAL", "0.5"))
+PROJECTOR_PREFETCH = int(os.getenv("PROJECTOR_PREFETCH", "200"))
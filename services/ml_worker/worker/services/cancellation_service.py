@@ -0,0 +1,97 @@
+"""
+Проверка отмены задач перед выполнением.
+
+Пользователь может отменить ожидающее предсказание через API или бота:
+запись получает статус cancelled, а средства возвращаются сразу. Воркер
+держит в памяти ID недавно отмененных задач и дозагружает новые из БД
+не чаще раза в CANCEL_REFRESH_INTERVAL секунд, поэтому проверка перед
+запуском модели не требует запроса к базе на каждую задачу.
+
+Метка completed_at ставится внутри транзакции отмены, и отмена, закоммиченная
+позже, может получить метку раньше уже загруженных. Поэтому каждое обновление
+перечитывает окно в CANCEL_REFRESH_OVERLAP секунд до последней известной
+отмены; повторно загруженные задачи просто перезаписываются в словаре.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import text
+
+from ml_service.db_config import SessionLocal
+from services.ml_worker.worker.config.settings import (
+    CANCEL_REFRESH_INTERVAL, CANCEL_REFRESH_OVERLAP, CANCEL_RETENTION
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CancelledTasks:
+    """
+    Множество отмененных задач с инкрементальным обновлением из БД.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = CANCEL_REFRESH_INTERVAL,
+        retention: float = CANCEL_RETENTION,
+        overlap: float = CANCEL_REFRESH_OVERLAP
+    ):
+        self.refresh_interval = refresh_interval
+        self.retention = timedelta(seconds=retention)
+        self.overlap = timedelta(seconds=overlap)
+        # ID задачи -> время отмены
+        self._cancelled: Dict[str, datetime] = {}
+        self._since: Optional[datetime] = None
+        self._last_refresh = None
+
+    def refresh(self) -> None:
+        """Загружает задачи, отмененные после предыдущего обновления (с перекрытием)."""
+        since = self._since - self.overlap if self._since else datetime.now() - self.retention
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                text(
+                    "SELECT id, completed_at FROM predictions "
+                    "WHERE status = 'cancelled' AND completed_at >= :since"
+                ),
+                {"since": since}
+            ).fetchall()
+        finally:
+            db.close()
+
+        for prediction_id, cancelled_at in rows:
+            self._cancelled[str(prediction_id)] = cancelled_at
+            if self._since is None or cancelled_at > self._since:
+                self._since = cancelled_at
+        if self._since is None:
+            self._since = since
+
+        # Забываем задачи, которые уже не могут оказаться в очереди
+        horizon = datetime.now() - self.retention
+        for prediction_id in [pid for pid, at in self._cancelled.items() if at < horizon]:
+            del self._cancelled[prediction_id]
+
+    def is_cancelled(self, prediction_id: str) -> bool:
+        """
+        Проверяет, отменена ли задача.
+
+        Args:
+            prediction_id: ID предсказания
+
+        Returns:
+            bool: True, если задача отменена пользователем
+        """
+        now = time.monotonic()
+        if self._last_refresh is None or now - self._last_refresh >= self.refresh_interval:
+            self._last_refresh = now
+            try:
+                self.refresh()
+            except Exception as e:
+                # Без свежих данных продолжаем по уже известным отменам
+                logger.error(f"Не удалось обновить список отмененных задач: {e}")
+        return prediction_id in self._cancelled
+
+
+# Общее для воркера множество отмененных задач
+cancelled_tasks = CancelledTasks()
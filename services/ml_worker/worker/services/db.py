@@ -3,7 +3,6 @@
 """
 import logging
 import time
-import json
 from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
@@ -12,6 +11,7 @@ import psycopg2
 from ml_service.models.transactions.transaction import Transaction
 from ml_service.models.base.entity import Entity
 from worker.config.settings import DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME, DATABASE_URL
+from ml_service import codec
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -92,15 +92,16 @@ def update_prediction_result(prediction_id, result):
         try:
             if isinstance(result, str):
                 try:
-                    json.loads(result)  # Проверка валидности
+                    codec.loads(result)  # Проверка валидности
                     result_json = result
-                except json.JSONDecodeError:
-                    result_json = json.dumps({"raw_text": result})
+                except codec.JSONDecodeError:
+                    result_json = codec.dumps({"raw_text": result}).decode('utf-8')
             else:
-                result_json = json.dumps(convert_to_safe_json(result))
+                # Неподдерживаемые типы преобразуются в строки
+                result_json = codec.dumps(result, safe=True).decode('utf-8')
         except Exception as e:
             logger.error(f"Ошибка сериализации результата в JSON: {e}")
-            result_json = json.dumps({"error": "Ошибка формата результата", "details": str(e)})
+            result_json = codec.dumps({"error": "Ошибка формата результата", "details": str(e)}).decode('utf-8')
         
         # Получаем предсказание из базы данных
         from ml_service.models.transactions.prediction import Prediction
@@ -126,24 +127,3 @@ def update_prediction_result(prediction_id, result):
     finally:
         if db:
             db.close()
-
-
-def convert_to_safe_json(obj):
-    """
-    Преобразует объект в безопасный для JSON формат.
-    
-    Args:
-        obj: Объект для преобразования
-        
-    Returns:
-        Объект, безопасный для JSON сериализации
-    """
-    if isinstance(obj, dict):
-        return {k: convert_to_safe_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_safe_json(item) for item in obj]
-    elif isinstance(obj, (str, int, float, bool, type(None))):
-        return obj
-    else:
-        # Преобразуем неподдерживаемые типы в строки
-        return str(obj) 
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""
+Диспетчер справедливой очереди задач.
+
+Забирает задачи из общей очереди ML_TASK_QUEUE, раскладывает их по
+пользовательским подочередям в RabbitMQ и выдает воркерам в
+ML_DISPATCH_QUEUE в порядке deficit round robin. Так массовая загрузка
+одного клиента не отодвигает задачи остальных пользователей в конец очереди.
+"""
+import time
+import uuid
+import logging
+import pika
+from sqlalchemy import text
+
+from ml_service.db_config import SessionLocal
+from services.ml_worker.worker.config.settings import (
+    ML_TASK_QUEUE,
+    ML_DISPATCH_QUEUE,
+    ML_TASK_DONE_QUEUE,
+    ML_USER_QUEUE_PREFIX,
+    FAIR_QUANTUM,
+    FAIR_USER_INFLIGHT_LIMIT,
+    FAIR_DISPATCH_WINDOW,
+    FAIR_INFLIGHT_TIMEOUT,
+    FAIR_INGRESS_PREFETCH,
+    FAIR_USER_HEADER,
+    FAIR_LEASE_HEADER,
+    ML_BACKLOG_QUEUE,
+    FAIR_BACKLOG_REPORT_INTERVAL
+)
+from services.ml_worker.worker.services.fair_scheduler import FairScheduler
+from services.ml_worker.worker.services.rabbitmq_service import get_rabbitmq_connection, wait_for_rabbitmq
+from services.ml_worker.worker.services.worker_service import wait_for_db
+from ml_service.messages import decode_message
+from ml_service.admission import backlog_queue_arguments, encode_backlog_report
+from ml_service.tracing import tracer, setup_tracing, KIND_PRODUCER, PUBLISHED_AT_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+class FairDispatcher:
+    """
+    Перекладывает задачи из общей очереди в очередь воркеров по пользователям.
+    """
+
+    def __init__(self, scheduler: FairScheduler = None):
+        self.scheduler = scheduler or FairScheduler(
+            quantum=FAIR_QUANTUM,
+            user_inflight_limit=FAIR_USER_INFLIGHT_LIMIT,
+            window=FAIR_DISPATCH_WINDOW,
+            inflight_timeout=FAIR_INFLIGHT_TIMEOUT
+        )
+        self.connection = None
+        self.channel = None
+        self._user_queues = set()
+        self._reported_at = 0.0
+
+    @staticmethod
+    def user_queue(user: str) -> str:
+        """Имя подочереди пользователя."""
+        return f"{ML_USER_QUEUE_PREFIX}{user}"
+
+    def _declare_user_queue(self, user: str) -> int:
+        """
+        Объявляет подочередь пользователя.
+
+        Returns:
+            int: Количество сообщений в подочереди
+        """
+        frame = self.channel.queue_declare(queue=self.user_queue(user), durable=True)
+        self._user_queues.add(user)
+        return frame.method.message_count
+
+    def _on_task(self, ch, method, properties, body):
+        """Перекладывает новую задачу в подочередь ее пользователя."""
+        try:
+            user = str(decode_message(body, properties)["user_id"])
+        except Exception as e:
+            # Некорректное сообщение отдаем воркеру как есть, он его отбракует
+            logger.error(f"Не удалось определить пользователя задачи: {e}")
+            ch.basic_publish(exchange='', routing_key=ML_DISPATCH_QUEUE, body=body, properties=properties)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+
+        if user not in self._user_queues:
+            self._declare_user_queue(user)
+
+        ch.basic_publish(
+            exchange='',
+            routing_key=self.user_queue(user),
+            body=body,
+            properties=properties
+        )
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        self.scheduler.enqueue(user)
+
+    def _on_done(self, ch, method, properties, body):
+        """Учитывает завершение задачи воркером."""
+        user = body.decode('utf-8')
+        lease = (properties.headers or {}).get(FAIR_LEASE_HEADER)
+        if not self.scheduler.completed(user, lease):
+            # Выдача уже снята по таймауту: ее место занято другой задачей
+            logger.debug(f"Уведомление о завершении по неизвестной выдаче {lease} пользователя {user}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    def pump(self) -> int:
+        """
+        Выдает воркерам задачи, пока позволяют окно и лимиты пользователей.
+
+        Returns:
+            int: Количество выданных задач
+        """
+        dispatched = 0
+        while True:
+            user = self.scheduler.next_user()
+            if user is None:
+                return dispatched
+
+            method, properties, body = self.channel.basic_get(queue=self.user_queue(user), auto_ack=False)
+            if method is None:
+                self.scheduler.drained(user)
+                # Удаляем пустую подочередь, чтобы не копить очереди неактивных пользователей
+                self.channel.queue_delete(queue=self.user_queue(user), if_empty=True)
+                self._user_queues.discard(user)
+                continue
+
+            lease = uuid.uuid4().hex
+            headers = dict(properties.headers or {})
+            headers[FAIR_USER_HEADER] = user
+            headers[FAIR_LEASE_HEADER] = lease
+
+            # Ожидание в подочереди записывается здесь, а воркер отсчитывает
+            # ожидание в ML_DISPATCH_QUEUE от выдачи
+            parent = tracer.extract(headers)
+            if parent is not None:
+                published_at = headers.get(PUBLISHED_AT_HEADER)
+                if published_at:
+                    tracer.record(f"wait {self.user_queue(user)}", int(published_at), time.time_ns(), parent,
+                                  **{"messaging.source": self.user_queue(user)})
+                with tracer.span("dispatch", KIND_PRODUCER, parent=parent, **{"fair.user": user}):
+                    tracer.inject(headers)
+            properties.headers = headers
+
+            self.channel.basic_publish(
+                exchange='',
+                routing_key=ML_DISPATCH_QUEUE,
+                body=body,
+                properties=properties
+            )
+            self.channel.basic_ack(delivery_tag=method.delivery_tag)
+            self.scheduler.dispatched(user, method.message_count, lease)
+            dispatched += 1
+
+    def report_backlog(self) -> None:
+        """
+        Сообщает контролю допуска API длину подочередей пользователей.
+
+        Задачи в подочередях не видны по глубине ml_tasks, которую диспетчер
+        быстро опустошает; в очереди отчетов хранится только последний отчет.
+        """
+        now = time.monotonic()
+        if now - self._reported_at < FAIR_BACKLOG_REPORT_INTERVAL:
+            return
+        self._reported_at = now
+        self.channel.basic_publish(
+            exchange='',
+            routing_key=ML_BACKLOG_QUEUE,
+            body=encode_backlog_report(self.scheduler.backlog_total),
+            properties=pika.BasicProperties(content_type="application/json")
+        )
+
+    def recover(self) -> None:
+        """
+        Восстанавливает список непустых подочередей после перезапуска.
+
+        Пользователи с подочередями определяются по ожидающим предсказаниям в БД.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.execute(text("SELECT DISTINCT user_id FROM predictions WHERE status = 'pending'")).fetchall()
+        finally:
+            db.close()
+
+        for (user_id,) in rows:
+            user = str(user_id)
+            count = self._declare_user_queue(user)
+            if count:
+                self.scheduler.enqueue(user, count)
+            else:
+                self.channel.queue_delete(queue=self.user_queue(user), if_empty=True)
+                self._user_queues.discard(user)
+
+        logger.info(f"Восстановлено подочередей пользователей: {self.scheduler.active_users}")
+
+    def run(self) -> None:
+        """Запускает цикл диспетчеризации."""
+        self.connection = get_rabbitmq_connection()
+        self.channel = self.connection.channel()
+        # Подтверждения публикаций: сообщение из исходной очереди удаляется только после записи в новую
+        self.channel.confirm_delivery()
+
+        for queue in (ML_TASK_QUEUE, ML_DISPATCH_QUEUE, ML_TASK_DONE_QUEUE):
+            self.channel.queue_declare(queue=queue, durable=True)
+        self.channel.queue_declare(queue=ML_BACKLOG_QUEUE, arguments=backlog_queue_arguments())
+
+        self.channel.basic_qos(prefetch_count=FAIR_INGRESS_PREFETCH)
+        self.channel.basic_consume(queue=ML_TASK_QUEUE, on_message_callback=self._on_task)
+        self.channel.basic_consume(queue=ML_TASK_DONE_QUEUE, on_message_callback=self._on_done)
+
+        self.recover()
+        logger.info(f"Диспетчер запущен: {ML_TASK_QUEUE} -> {ML_DISPATCH_QUEUE}")
+
+        while True:
+            self.connection.process_data_events(time_limit=0.2)
+            self.pump()
+            self.report_backlog()
+
+
+def run_dispatcher():
+    """
+    Запускает диспетчер справедливой очереди.
+
+    Returns:
+        bool: False, если диспетчер завершился с ошибкой
+    """
+    if not wait_for_db():
+        logger.error("Не удалось подключиться к базе данных")
+        return False
+
+    if not wait_for_rabbitmq():
+        logger.error("Не удалось подключиться к RabbitMQ")
+        return False
+
+    setup_tracing("ml-dispatcher")
+    try:
+        FairDispatcher().run()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал прерывания, завершаем работу")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка диспетчера: {e}")
+
+    return False
@@ -0,0 +1,166 @@
+"""
+Обработка задач с истекшим сроком.
+
+Задача, срок которой (поле deadline) истек до начала обработки, не
+выполняется: предсказание помечается статусом expired, а его стоимость
+возвращается на баланс. Возвраты выполняются пакетами одним запросом,
+поэтому очередь после сбоя разбирается со скоростью брокера, а не модели.
+"""
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ml_service.db_config import SessionLocal
+from services.ml_worker.worker.services.refund_service import mark_and_refund
+from services.ml_worker.worker.config.settings import (
+    EXPIRE_BATCH_SIZE, EXPIRE_FLUSH_INTERVAL, EXPIRE_SWEEP_INTERVAL, IDEMPOTENCY_KEY_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+# Размер пакета при поиске просроченных предсказаний в БД
+SWEEP_BATCH_SIZE = 1000
+
+
+def is_expired(data: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """
+    Проверяет, истек ли срок задачи.
+
+    Args:
+        data: Сообщение задачи
+        now: Текущее время
+
+    Returns:
+        bool: True, если в задаче указан deadline и он уже прошел
+    """
+    deadline = data.get("deadline")
+    if not deadline:
+        return False
+    try:
+        return datetime.fromisoformat(deadline) <= (now or datetime.now())
+    except (TypeError, ValueError):
+        logger.warning(f"Некорректный deadline в задаче {data.get('prediction_id')}: {deadline}")
+        return False
+
+
+def expire_predictions(db: Session, prediction_ids: Optional[List[str]] = None, limit: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Помечает предсказания истекшими и возвращает их стоимость.
+
+    Args:
+        db: Сессия базы данных
+        prediction_ids: ID предсказаний; если не указаны, обрабатываются
+            все невыполненные предсказания с прошедшим deadline
+        limit: Максимальный размер пакета
+
+    Returns:
+        int: Количество предсказаний, помеченных истекшими
+    """
+    if prediction_ids is not None:
+        condition = "status = 'pending' AND id = ANY(:ids)"
+        params = {"ids": list(prediction_ids)}
+    else:
+        # Сюда же попадают задачи упавших воркеров, срок захвата которых истек
+        condition = (
+            "(status = 'pending' OR (status = 'processing' AND lease_expires_at < NOW())) "
+            "AND deadline < NOW()"
+        )
+        params = {}
+
+    return mark_and_refund(
+        db, "expired", condition, params,
+        description="Возврат за просроченное предсказание #",
+        limit=limit
+    )
+
+
+def purge_idempotency_keys(db: Session) -> int:
+    """
+    Удаляет ключи идемпотентности с истекшим сроком хранения.
+
+    Args:
+        db: Сессия базы данных
+
+    Returns:
+        int: Количество удаленных ключей
+    """
+    try:
+        purged = db.execute(
+            text("DELETE FROM idempotency_keys WHERE created_at < NOW() - make_interval(secs => :ttl)"),
+            {"ttl": IDEMPOTENCY_KEY_TTL}
+        ).rowcount
+        db.commit()
+        return purged
+    except Exception:
+        db.rollback()
+        raise
+
+
+class ExpiredTaskBatch:
+    """
+    Накопитель просроченных задач для пакетного возврата средств.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = EXPIRE_BATCH_SIZE,
+        flush_interval: float = EXPIRE_FLUSH_INTERVAL,
+        sweep_interval: float = EXPIRE_SWEEP_INTERVAL
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self._ids: List[str] = []
+        self._first_added = None
+        self._last_sweep = time.monotonic()
+
+    def add(self, prediction_id: str) -> None:
+        """Добавляет просроченную задачу в пакет."""
+        if not self._ids:
+            self._first_added = time.monotonic()
+        self._ids.append(prediction_id)
+        if len(self._ids) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Помечает накопленные задачи истекшими и возвращает средства."""
+        if not self._ids:
+            return
+        ids, self._ids = self._ids, []
+        db = SessionLocal()
+        try:
+            expired = expire_predictions(db, ids, limit=len(ids))
+            logger.info(f"Помечено истекшими предсказаний: {expired} из {len(ids)}")
+        except Exception as e:
+            # Не потеряются: их найдет периодический поиск по deadline
+            logger.error(f"Ошибка при пакетной обработке просроченных задач: {e}")
+        finally:
+            db.close()
+
+    def tick(self) -> None:
+        """
+        Сбрасывает пакет по таймеру и периодически ищет просроченные задачи в БД.
+        """
+        now = time.monotonic()
+        if self._ids and now - self._first_added >= self.flush_interval:
+            self.flush()
+
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            db = SessionLocal()
+            try:
+                # Разбираем все накопившиеся просроченные задачи пакетами
+                while expire_predictions(db) >= SWEEP_BATCH_SIZE:
+                    pass
+                purge_idempotency_keys(db)
+            except Exception as e:
+                logger.error(f"Ошибка при поиске просроченных предсказаний: {e}")
+            finally:
+                db.close()
+
+
+# Общий для воркера накопитель просроченных задач
+expired_tasks = ExpiredTaskBatch()
@@ -0,0 +1,199 @@
+"""
+Планировщик справедливой выдачи задач между пользователями.
+
+Реализует deficit round robin поверх пользовательских подочередей:
+каждый активный пользователь за раунд получает FAIR_QUANTUM задач,
+а число задач одного пользователя, одновременно находящихся у воркеров,
+ограничено FAIR_USER_INFLIGHT_LIMIT. Модуль не зависит от RabbitMQ и
+хранит только счетчики, сами сообщения лежат в брокере.
+
+Каждая выдача получает идентификатор (lease), который воркер возвращает в
+уведомлении о завершении. Уведомление по выдаче, уже снятой по таймауту,
+игнорируется и не освобождает место чужой задачи.
+"""
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+
+
+class FairScheduler:
+    """
+    Deficit round robin по пользователям с ограничением задач "в работе".
+    """
+
+    def __init__(
+        self,
+        quantum: int = 1,
+        user_inflight_limit: int = 2,
+        window: int = 6,
+        inflight_timeout: float = 120.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            quantum: Количество задач пользователя за один раунд
+            user_inflight_limit: Максимум задач одного пользователя в работе
+            window: Максимум задач в работе суммарно по всем пользователям
+            inflight_timeout: Время, после которого задача без подтверждения считается потерянной
+            clock: Источник монотонного времени
+        """
+        self.quantum = max(1, quantum)
+        self.user_inflight_limit = max(1, user_inflight_limit)
+        self.window = max(1, window)
+        self.inflight_timeout = inflight_timeout
+        self._clock = clock
+
+        self._active: Deque[str] = deque()
+        self._backlog: Dict[str, int] = {}
+        self._deficit: Dict[str, int] = {}
+        # Пользователь -> выдача -> срок ожидания уведомления (в порядке выдачи)
+        self._inflight: Dict[str, "OrderedDict[str, float]"] = {}
+        self._inflight_total = 0
+
+    @property
+    def inflight_total(self) -> int:
+        """Количество задач, выданных воркерам и еще не завершенных."""
+        return self._inflight_total
+
+    @property
+    def active_users(self) -> int:
+        """Количество пользователей с непустой подочередью."""
+        return len(self._active)
+
+    @property
+    def backlog_total(self) -> int:
+        """Известная суммарная длина подочередей всех пользователей."""
+        return sum(self._backlog.values())
+
+    def backlog(self, user: str) -> int:
+        """Известная длина подочереди пользователя."""
+        return self._backlog.get(user, 0)
+
+    def inflight(self, user: str) -> int:
+        """Количество задач пользователя в работе."""
+        return len(self._inflight.get(user, ()))
+
+    def enqueue(self, user: str, count: int = 1) -> None:
+        """
+        Учитывает новые задачи в подочереди пользователя.
+
+        Args:
+            user: Ключ пользователя
+            count: Количество добавленных задач
+        """
+        if count <= 0:
+            return
+        if user not in self._deficit:
+            self._active.append(user)
+            self._deficit[user] = 0
+        self._backlog[user] = self._backlog.get(user, 0) + count
+
+    def next_user(self) -> Optional[str]:
+        """
+        Выбирает пользователя, чью задачу нужно выдать следующей.
+
+        Returns:
+            Ключ пользователя или None, если выдавать нечего или окно заполнено
+        """
+        self.expire_inflight()
+        if self._inflight_total >= self.window:
+            return None
+
+        for _ in range(len(self._active)):
+            user = self._active[0]
+            if self.inflight(user) >= self.user_inflight_limit:
+                # Пользователь упирается в лимит: пропускаем его ход без накопления дефицита
+                self._deficit[user] = 0
+                self._active.rotate(-1)
+                continue
+
+            if self._deficit[user] <= 0:
+                self._deficit[user] += self.quantum
+            self._deficit[user] -= 1
+            if self._deficit[user] <= 0:
+                self._active.rotate(-1)
+            return user
+
+        return None
+
+    def dispatched(self, user: str, remaining: Optional[int] = None, lease: Optional[str] = None) -> str:
+        """
+        Фиксирует выдачу задачи пользователя воркерам.
+
+        Args:
+            user: Ключ пользователя
+            remaining: Остаток подочереди по данным брокера, если известен
+            lease: Идентификатор выдачи; если не указан, создается новый
+
+        Returns:
+            str: Идентификатор выдачи
+        """
+        lease = lease or uuid.uuid4().hex
+        self._inflight.setdefault(user, OrderedDict())[lease] = self._clock() + self.inflight_timeout
+        self._inflight_total += 1
+        if remaining is None:
+            remaining = self._backlog.get(user, 1) - 1
+        self._set_backlog(user, remaining)
+        return lease
+
+    def drained(self, user: str) -> None:
+        """
+        Фиксирует, что подочередь пользователя оказалась пустой.
+
+        Args:
+            user: Ключ пользователя
+        """
+        self._set_backlog(user, 0)
+
+    def completed(self, user: str, lease: Optional[str] = None) -> bool:
+        """
+        Фиксирует завершение задачи пользователя воркером.
+
+        Args:
+            user: Ключ пользователя
+            lease: Идентификатор выдачи из уведомления; без него (уведомление
+                воркера предыдущей версии) снимается самая старая выдача
+
+        Returns:
+            bool: False, если выдача неизвестна или уже снята по таймауту
+        """
+        leases = self._inflight.get(user)
+        if not leases:
+            return False
+        if lease is None:
+            leases.popitem(last=False)
+        elif leases.pop(lease, None) is None:
+            return False
+        self._inflight_total -= 1
+        if not leases:
+            del self._inflight[user]
+        return True
+
+    def expire_inflight(self) -> int:
+        """
+        Снимает задачи, по которым не пришло уведомление о завершении.
+
+        Returns:
+            Количество снятых задач
+        """
+        now = self._clock()
+        expired = 0
+        for user in list(self._inflight):
+            leases = self._inflight[user]
+            while leases and next(iter(leases.values())) <= now:
+                leases.popitem(last=False)
+                expired += 1
+            if not leases:
+                del self._inflight[user]
+        self._inflight_total -= expired
+        return expired
+
+    def _set_backlog(self, user: str, count: int) -> None:
+        if count > 0:
+            self._backlog[user] = count
+            return
+        self._backlog.pop(user, None)
+        if user in self._deficit:
+            del self._deficit[user]
+            self._active.remove(user)
@@ -0,0 +1,167 @@
+"""
+Полосы обработки задач (lanes) и взвешенный выбор между ними.
+
+Интерактивные задачи из Telegram бота и массовые задачи из API приходят
+в разные очереди. Воркер держит по несколько неподтвержденных задач
+из каждой полосы и выбирает следующую по smooth weighted round robin,
+поэтому интерактивная полоса получает гарантированную долю мощности
+даже при длинной очереди массовых задач.
+"""
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ml_service.latency import summarize_latencies
+from ml_service.messages import decode_message
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+
+
+@dataclass
+class Lane:
+    """Полоса обработки: очередь RabbitMQ и ее вес."""
+    name: str
+    queue: str
+    weight: int
+    ready: Deque[Tuple[Any, Any, Any, Any]] = field(default_factory=deque)
+    current_weight: int = 0
+
+
+class LaneScheduler:
+    """
+    Выбирает следующую задачу среди полос с учетом весов.
+    """
+
+    def __init__(self, lanes: List[Lane]):
+        self.lanes = lanes
+
+    def consumer_for(self, lane: Lane):
+        """
+        Создает callback для basic_consume, складывающий сообщение в полосу.
+
+        Args:
+            lane: Полоса, из очереди которой читает потребитель
+
+        Returns:
+            function: Callback для pika
+        """
+        def _on_message(ch, method, properties, body):
+            lane.ready.append((ch, method, properties, body))
+
+        return _on_message
+
+    def has_ready(self) -> bool:
+        """Есть ли полученные и еще не обработанные задачи."""
+        return any(lane.ready for lane in self.lanes)
+
+    def next(self) -> Optional[Tuple[Lane, Tuple[Any, Any, Any, Any]]]:
+        """
+        Выбирает полосу по smooth weighted round robin среди непустых.
+
+        Returns:
+            Пара (полоса, доставка) или None, если задач нет
+        """
+        candidates = [lane for lane in self.lanes if lane.ready]
+        if not candidates:
+            return None
+
+        total = 0
+        best = None
+        for lane in candidates:
+            lane.current_weight += lane.weight
+            total += lane.weight
+            if best is None or lane.current_weight > best.current_weight:
+                best = lane
+        best.current_weight -= total
+        return best, best.ready.popleft()
+
+
+class LaneStats:
+    """
+    Статистика полосы: обработано задач, время ожидания в очереди и обработки.
+    """
+
+    def __init__(self, window: int = 500):
+        self.processed = 0
+        self.wait_times: Deque[float] = deque(maxlen=window)
+        self.processing_times: Deque[float] = deque(maxlen=window)
+
+    def observe(self, wait_time: Optional[float], processing_time: float) -> None:
+        """Учитывает обработанную задачу."""
+        self.processed += 1
+        if wait_time is not None:
+            self.wait_times.append(wait_time)
+        self.processing_times.append(processing_time)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Возвращает сводку статистики."""
+        return {
+            "processed": self.processed,
+            "wait": summarize_latencies(self.wait_times),
+            "processing": summarize_latencies(self.processing_times)
+        }
+
+
+def queue_wait_seconds(body: bytes, properties=None) -> Optional[float]:
+    """
+    Вычисляет время ожидания задачи в очереди по полю timestamp сообщения.
+
+    Args:
+        body: Тело сообщения
+        properties: Свойства сообщения (формат и сжатие тела)
+
+    Returns:
+        float или None: Секунды с момента создания задачи
+    """
+    try:
+        created = datetime.fromisoformat(decode_message(body, properties)["timestamp"])
+    except Exception:
+        return None
+    return max(0.0, (datetime.now() - created).total_seconds())
+
+
+class LaneReporter:
+    """
+    Периодически пишет в лог глубину очередей и задержки по полосам.
+    """
+
+    def __init__(self, lanes: List[Lane], interval: float = 60.0):
+        self.lanes = lanes
+        self.interval = interval
+        self.stats = {lane.name: LaneStats() for lane in lanes}
+        self._last_report = time.monotonic()
+
+    def observe(self, lane: Lane, body: bytes, processing_time: float, properties=None) -> None:
+        """Учитывает обработанную задачу полосы."""
+        self.stats[lane.name].observe(queue_wait_seconds(body, properties), processing_time)
+
+    def maybe_report(self, channel) -> None:
+        """
+        Пишет отчет, если прошел интервал.
+
+        Args:
+            channel: Канал RabbitMQ для получения глубины очередей
+        """
+        if time.monotonic() - self._last_report < self.interval:
+            return
+        self._last_report = time.monotonic()
+
+        for lane in self.lanes:
+            try:
+                depth = channel.queue_declare(queue=lane.queue, passive=True).method.message_count
+            except Exception as e:
+                logger.warning(f"Не удалось получить глубину очереди {lane.queue}: {e}")
+                depth = None
+            snapshot = self.stats[lane.name].snapshot()
+            logger.info(
+                f"Полоса {lane.name} ({lane.queue}): глубина={depth}, "
+                f"обработано={snapshot['processed']}, "
+                f"ожидание avg/p95={snapshot['wait']['avg']}/{snapshot['wait']['p95']} с, "
+                f"обработка avg/p95={snapshot['processing']['avg']}/{snapshot['processing']['p95']} с"
+            )
@@ -1,21 +1,56 @@
 """
 Модуль для обработки сообщений из очереди.
 """
-import json
+import time
 import logging
 from sqlalchemy.orm import Session
 
+from ml_service.messages import decode_message
+from ml_service.tracing import tracer, KIND_CONSUMER, PUBLISHED_AT_HEADER
 from ml_service.models import Prediction
 from services.ml_worker.worker.services.prediction_service import (
     validate_data,
+    claim_prediction,
+    release_prediction,
     make_prediction,
-    update_prediction_result
+    update_prediction_result,
+    PredictionNotFound
 )
 from services.ml_worker.worker.services.rabbitmq_service import publish_result
+from services.ml_worker.worker.services.expiration_service import is_expired, expired_tasks
+from services.ml_worker.worker.services.cancellation_service import cancelled_tasks
+from services.ml_worker.worker.services.retry_service import retry_policy
 
 logger = logging.getLogger(__name__)
 
 def process_message(ch, method, properties, body, worker_id, db):
+    """
+    Обрабатывает сообщение из очереди в спане трассы, начатой при публикации задачи.
+    
+    Время от публикации до получения сообщения записывается отдельным спаном
+    ожидания в очереди.
+    
+    Args:
+        ch: Канал RabbitMQ
+        method: Метод доставки сообщения
+        properties: Свойства сообщения
+        body: Тело сообщения
+        worker_id: Идентификатор ML-воркера
+        db: Сессия базы данных
+    """
+    headers = getattr(properties, "headers", None) or {}
+    parent = tracer.extract(headers)
+    published_at = headers.get(PUBLISHED_AT_HEADER)
+    if parent is not None and published_at:
+        tracer.record(f"wait {method.routing_key}", int(published_at), time.time_ns(), parent,
+                      **{"messaging.source": method.routing_key,
+                         "messaging.redelivered": bool(getattr(method, "redelivered", False))})
+    
+    attributes = {"messaging.source": method.routing_key, "worker.id": worker_id}
+    with tracer.span("process_message", KIND_CONSUMER, parent=parent, **attributes):
+        _handle_message(ch, method, properties, body, worker_id, db)
+
+def _handle_message(ch, method, properties, body, worker_id, db):
     """
     Обрабатывает сообщение из очереди.
     
@@ -27,9 +62,10 @@ def process_message(ch, method, properties, body, worker_id, db):
         worker_id: Идентификатор ML-воркера
         db: Сессия базы данных
     """
+    claimed_id = None
     try:
         # Разбираем сообщение
-        data = json.loads(body)
+        data = decode_message(body, properties)
         logger.info(f"Получено сообщение: {data}")
         
         # Валидируем данные
@@ -38,28 +74,58 @@ def process_message(ch, method, properties, body, worker_id, db):
             ch.basic_ack(delivery_tag=method.delivery_tag)
             return
         
+        # Задачи с истекшим сроком не выполняем: возврат средств делается пакетом
+        if is_expired(data):
+            logger.info(f"Срок задачи {data['prediction_id']} истек, предсказание не выполняется")
+            expired_tasks.add(data["prediction_id"])
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        
+        # Отмененные задачи не выполняем: средства уже возвращены при отмене
+        if cancelled_tasks.is_cancelled(data["prediction_id"]):
+            logger.info(f"Задача {data['prediction_id']} отменена пользователем, предсказание не выполняется")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        
         # Извлекаем необходимые данные
         prediction_id = data["prediction_id"]
         user_id = data["user_id"]
         input_data = data["data"]
         
+        # Захватываем задачу: повторная доставка уже обработанной или
+        # обрабатываемой задачи не запускает модель еще раз
+        status = claim_prediction(db, prediction_id, worker_id)
+        if status == "missing":
+            # Не подтверждаем и не теряем задачу: повтор с задержкой через политику повторных попыток
+            raise PredictionNotFound(f"Предсказание {prediction_id} не найдено")
+        if status is not None:
+            logger.info(f"Задача {prediction_id} пропущена как дубликат, статус предсказания: {status}")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        claimed_id = prediction_id
+        
         # Выполняем предсказание
         logger.info(f"Выполняем предсказание для {prediction_id}")
         prediction_result = make_prediction(input_data)
         
         # Обновляем результат в базе данных
-        update_prediction_result(db, prediction_id, prediction_result, worker_id)
-        
-        # Публикуем результат в очередь
-        publish_result(prediction_id, prediction_result)
-        
-        logger.info(f"Предсказание {prediction_id} успешно обработано")
+        if update_prediction_result(db, prediction_id, prediction_result, worker_id) is not None:
+            # Публикуем результат в очередь
+            publish_result(prediction_id, prediction_result.to_dict(), user_id)
+            logger.info(f"Предсказание {prediction_id} успешно обработано")
         
         # Подтверждаем обработку сообщения
         ch.basic_ack(delivery_tag=method.delivery_tag)
     
     except Exception as e:
         logger.error(f"Ошибка при обработке сообщения: {e}")
-        # Подтверждаем сообщение даже в случае ошибки
-        # В реальном приложении можно использовать стратегию повторных попыток
+        if claimed_id:
+            release_prediction(db, claimed_id, worker_id)
+        try:
+            # Повторная попытка откладывается брокером и не занимает воркер
+            retry_policy.handle_failure(ch, method, properties, body, e)
+        except Exception as publish_error:
+            logger.error(f"Не удалось отправить задачу на повторную попытку: {publish_error}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return
         ch.basic_ack(delivery_tag=method.delivery_tag) 
\ No newline at end of file
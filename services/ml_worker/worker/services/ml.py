@@ -4,10 +4,10 @@
 import logging
 import time
 import random
-from datetime import datetime
 from typing import Dict, Any
 
 from worker.config.settings import WORKER_ID
+from ml_service.results import PredictionResult
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -54,12 +54,13 @@ def make_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
         input_data: Входные данные для предсказания
         
     Returns:
-        dict: Результат предсказания
+        dict: Результат предсказания (PredictionResult.to_dict), без входного текста
     """
     # В реальном приложении здесь был бы код для загрузки модели и выполнения предсказания
     # Для демонстрации используем имитацию
     try:
         input_text = input_data.get("text", "").lower()
+        started = time.perf_counter()
         
         # Добавляем задержку для имитации работы модели
         time.sleep(random.uniform(1.0, 3.0))
@@ -81,12 +82,13 @@ def make_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
             weights = [0.3, 0.3, 0.4]
             result = random.choices(possible_results, weights=weights, k=1)[0]
         
-        # Добавляем дополнительную информацию
-        result["timestamp"] = datetime.now().isoformat()
-        result["worker_id"] = WORKER_ID
-        result["input_text"] = input_text
-        
-        return result
+        # Входной текст не копируем: он уже сохранен в input_data
+        return PredictionResult(
+            label=result["prediction"],
+            confidence=result["confidence"],
+            latency_ms=int((time.perf_counter() - started) * 1000),
+            extras={"worker_id": WORKER_ID}
+        ).to_dict()
     except Exception as e:
         logger.error(f"Ошибка при выполнении предсказания: {e}")
         return {"error": str(e)} 
\ No newline at end of file
@@ -6,12 +6,20 @@ import random
 import time
 from typing import Dict, Any, Optional
 from datetime import datetime
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from ml_service.models import Prediction
+from ml_service.results import PredictionResult
+from ml_service.prediction_stats import INCREMENT_STATS_SQL
+from ml_service.tracing import tracer
+from services.ml_worker.worker.config.settings import TASK_LEASE_SECONDS, TASK_MAX_ATTEMPTS
 
 logger = logging.getLogger(__name__)
 
+class PredictionNotFound(Exception):
+    """Предсказания задачи нет в БД (транзакция создателя могла еще не зафиксироваться)."""
+
 def validate_data(data: Dict[str, Any]) -> bool:
     """
     Проверяет валидность входных данных для предсказания.
@@ -32,7 +40,80 @@ def validate_data(data: Dict[str, Any]) -> bool:
     # Дополнительные проверки можно добавить здесь
     return True
 
-def make_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
+def claim_prediction(db: Session, prediction_id: str, worker_id: str) -> Optional[str]:
+    """
+    Атомарно захватывает предсказание для обработки.
+    
+    Захватить можно ожидающее предсказание или предсказание, срок захвата
+    которого истек (воркер упал, не завершив обработку), если у задачи
+    остались попытки.
+    
+    Args:
+        db: Сессия базы данных
+        prediction_id: ID предсказания
+        worker_id: ID воркера
+        
+    Returns:
+        None, если предсказание захвачено, иначе его текущий статус
+        (или "missing", если предсказание не найдено)
+    """
+    try:
+        claimed = db.execute(
+            text(
+                "UPDATE predictions "
+                "SET status = 'processing', processed_by = :worker_id, attempts = attempts + 1, "
+                "lease_expires_at = NOW() + make_interval(secs => :lease) "
+                "WHERE id = :prediction_id AND attempts < :max_attempts AND (status = 'pending' "
+                "OR (status = 'processing' AND lease_expires_at < NOW())) "
+                "RETURNING id"
+            ),
+            {
+                "prediction_id": prediction_id,
+                "worker_id": worker_id,
+                "lease": TASK_LEASE_SECONDS,
+                "max_attempts": TASK_MAX_ATTEMPTS
+            }
+        ).first()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    if claimed:
+        return None
+    
+    status = db.execute(
+        text("SELECT status FROM predictions WHERE id = :prediction_id"),
+        {"prediction_id": prediction_id}
+    ).scalar()
+    return status or "missing"
+
+def release_prediction(db: Session, prediction_id: str, worker_id: str) -> None:
+    """
+    Возвращает захваченное предсказание в ожидание после ошибки обработки.
+    
+    Args:
+        db: Сессия базы данных
+        prediction_id: ID предсказания
+        worker_id: ID воркера, захватившего предсказание
+    """
+    try:
+        # Сессия могла остаться в состоянии ошибки после сбоя обработки
+        db.rollback()
+        db.execute(
+            text(
+                "UPDATE predictions SET status = 'pending', lease_expires_at = NULL "
+                "WHERE id = :prediction_id AND status = 'processing' AND processed_by = :worker_id"
+            ),
+            {"prediction_id": prediction_id, "worker_id": worker_id}
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Не удалось освободить предсказание {prediction_id}: {e}")
+
+@tracer.traced("make_prediction")
+def make_prediction(input_data: Dict[str, Any]) -> PredictionResult:
     """
     Выполняет предсказание на основе входных данных.
     
@@ -40,24 +121,28 @@ def make_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
         input_data: Входные данные для модели
         
     Returns:
-        Результат предсказания
+        Типизированный результат предсказания (без входных данных)
     """
+    started = time.perf_counter()
+    
     # Эмулируем задержку работы модели
-    time_to_sleep = random.uniform(1.0, 3.0)
-    time.sleep(time_to_sleep)
+    time.sleep(random.uniform(1.0, 3.0))
     
     # В реальном приложении здесь будет вызов настоящей ML модели
     # Возвращаем тестовый результат
-    return {
-        "result": random.uniform(0, 1),
-        "confidence": random.uniform(0.7, 0.99),
-        "processing_time": time_to_sleep
-    }
+    score = random.uniform(0, 1)
+    return PredictionResult(
+        label="positive" if score >= 0.5 else "negative",
+        confidence=round(random.uniform(0.7, 0.99), 4),
+        latency_ms=int((time.perf_counter() - started) * 1000),
+        extras={"score": round(score, 4)}
+    )
 
+@tracer.traced("update_prediction_result")
 def update_prediction_result(
     db: Session, 
     prediction_id: str, 
-    result: Dict[str, Any], 
+    result: PredictionResult, 
     worker_id: str
 ) -> Optional[Prediction]:
     """
@@ -70,21 +155,45 @@ def update_prediction_result(
         worker_id: ID воркера, выполнившего предсказание
         
     Returns:
-        Обновленный объект предсказания или None
+        Обновленный объект предсказания или None, если результат не нужно сохранять
+        
+    Raises:
+        Exception: Ошибка базы данных; задача будет обработана повторно
     """
     try:
         # Получаем предсказание по ID
-        prediction = db.query(Prediction).filter(Prediction.id == prediction_id).first()
+        prediction = db.query(Prediction).filter(Prediction.id == prediction_id).with_for_update().first()
         
         if not prediction:
             logger.error(f"Предсказание {prediction_id} не найдено")
             return None
         
-        # Обновляем запись
-        prediction.result = result
+        # Результат сохраняет только воркер, который держит захват задачи
+        if prediction.status != "processing" or prediction.processed_by != worker_id:
+            logger.info(
+                f"Предсказание {prediction_id} в статусе {prediction.status} "
+                f"(воркер {prediction.processed_by}), результат не сохраняется"
+            )
+            return None
+        
+        # Обновляем запись: результат в отдельных колонках, в result - только extras
+        for column, value in result.columns().items():
+            setattr(prediction, column, value)
         prediction.status = "completed"
         prediction.completed_at = datetime.utcnow()
         prediction.processed_by = worker_id
+        prediction.lease_expires_at = None
+        
+        # Счетчик статистики пользователя увеличивается в той же транзакции
+        db.execute(
+            text(INCREMENT_STATS_SQL),
+            {
+                "user_id": prediction.user_id,
+                "day": prediction.created_at.date(),
+                "label": result.label,
+                "confidence": result.confidence
+            }
+        )
         
         db.commit()
         logger.info(f"Результат предсказания {prediction_id} успешно обновлен")
@@ -93,4 +202,4 @@ def update_prediction_result(
     except Exception as e:
         db.rollback()
         logger.error(f"Ошибка при обновлении результата предсказания: {e}")
-        return None 
\ No newline at end of file
+        raise 
\ No newline at end of file
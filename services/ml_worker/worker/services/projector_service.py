@@ -0,0 +1,170 @@
+"""
+Проектор сводки пользователя user_dashboard (см. ml_service.dashboard).
+
+Слушает два источника событий:
+
+- очередь ml_results: предсказание пользователя завершено;
+- канал PostgreSQL USER_EVENTS_CHANNEL: изменился баланс (триггер на
+  balances срабатывает при создании и отмене предсказаний, пополнении и
+  возвратах) или предсказание создано либо сменило статус (триггер на
+  predictions).
+
+События за PROJECTOR_FLUSH_INTERVAL секунд объединяются по пользователям,
+строка каждого пользователя пересобирается один раз, после чего сообщения
+ml_results подтверждаются. При сбое сообщения возвращаются в очередь и
+обрабатываются повторно: пересборка строки идемпотентна.
+"""
+import select
+import logging
+from typing import Optional, Set
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from ml_service.dashboard import USER_EVENTS_CHANNEL, refresh_dashboard
+from ml_service.messages import decode_message
+from services.ml_worker.worker.config.settings import (
+    DB_HOST,
+    DB_PORT,
+    DB_NAME,
+    DB_USER,
+    DB_PASS,
+    ML_RESULT_QUEUE,
+    PROJECTOR_FLUSH_INTERVAL,
+    PROJECTOR_PREFETCH
+)
+from services.ml_worker.worker.services.rabbitmq_service import get_rabbitmq_connection, wait_for_rabbitmq
+from services.ml_worker.worker.services.worker_service import wait_for_db
+
+logger = logging.getLogger(__name__)
+
+
+def _connect():
+    return psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+
+
+class DashboardProjector:
+    """
+    Обновляет строки user_dashboard по событиям результатов и журнала средств.
+    """
+
+    def __init__(self, flush_interval: float = PROJECTOR_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.connection = None
+        self.channel = None
+        self.db = None
+        self.listener = None
+        self._users: Set[int] = set()
+        self._predictions: Set[str] = set()
+        self._last_tag: Optional[int] = None
+        self.refreshed = 0
+
+    def _on_result(self, ch, method, properties, body):
+        """Запоминает пользователя завершенного предсказания."""
+        try:
+            message = decode_message(body, properties)
+        except Exception as e:
+            logger.error(f"Некорректное сообщение результата: {e}")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+
+        if message.get("user_id") is not None:
+            self._users.add(int(message["user_id"]))
+        elif message.get("prediction_id"):
+            # Результаты старых воркеров не содержат user_id
+            self._predictions.add(message["prediction_id"])
+        self._last_tag = method.delivery_tag
+
+    def _drain_notifications(self) -> None:
+        """Забирает уведомления о событиях журнала средств."""
+        self.listener.poll()
+        while self.listener.notifies:
+            notify = self.listener.notifies.pop(0)
+            try:
+                self._users.add(int(notify.payload))
+            except ValueError:
+                logger.warning(f"Некорректное уведомление {USER_EVENTS_CHANNEL}: {notify.payload!r}")
+
+    def flush(self) -> int:
+        """
+        Пересобирает строки накопленных пользователей и подтверждает результаты.
+
+        Returns:
+            int: Количество обновленных строк
+        """
+        if not self._users and not self._predictions:
+            return 0
+
+        users = set(self._users)
+        try:
+            with self.db.cursor() as cursor:
+                if self._predictions:
+                    cursor.execute(
+                        "SELECT DISTINCT user_id FROM predictions WHERE id = ANY(%s)",
+                        (list(self._predictions),)
+                    )
+                    users.update(row[0] for row in cursor.fetchall())
+                for user_id in sorted(users):
+                    refresh_dashboard(cursor, user_id)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        if self._last_tag is not None:
+            self.channel.basic_ack(delivery_tag=self._last_tag, multiple=True)
+            self._last_tag = None
+        self._users.clear()
+        self._predictions.clear()
+        self.refreshed += len(users)
+        return len(users)
+
+    def run(self) -> None:
+        """Запускает цикл проектора."""
+        self.db = _connect()
+        self.listener = _connect()
+        self.listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.listener.cursor() as cursor:
+            cursor.execute(f"LISTEN {USER_EVENTS_CHANNEL}")
+
+        self.connection = get_rabbitmq_connection()
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=ML_RESULT_QUEUE, durable=True)
+        self.channel.basic_qos(prefetch_count=PROJECTOR_PREFETCH)
+        self.channel.basic_consume(queue=ML_RESULT_QUEUE, on_message_callback=self._on_result)
+
+        logger.info(f"Проектор user_dashboard запущен: {ML_RESULT_QUEUE} и канал {USER_EVENTS_CHANNEL}")
+        while True:
+            self.connection.process_data_events(time_limit=self.flush_interval / 2)
+            # Ждем уведомления PostgreSQL не дольше оставшейся половины интервала
+            select.select([self.listener], [], [], self.flush_interval / 2)
+            self._drain_notifications()
+            updated = self.flush()
+            if updated:
+                logger.debug(f"Обновлено строк user_dashboard: {updated}")
+
+
+def run_projector():
+    """
+    Запускает проектор сводки пользователей.
+
+    Returns:
+        bool: False, если проектор завершился с ошибкой
+    """
+    if not wait_for_db():
+        logger.error("Не удалось подключиться к базе данных")
+        return False
+
+    if not wait_for_rabbitmq():
+        logger.error("Не удалось подключиться к RabbitMQ")
+        return False
+
+    try:
+        DashboardProjector().run()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал прерывания, завершаем работу")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка проектора: {e}")
+
+    return False
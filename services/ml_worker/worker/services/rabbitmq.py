@@ -3,13 +3,13 @@
 """
 import logging
 import time
-import json
 import pika
 
 from worker.config.settings import (
     RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, 
     RABBITMQ_PASS, RABBITMQ_VHOST, ML_TASK_QUEUE, ML_RESULT_QUEUE
 )
+from ml_service.messages import encode_message, KIND_RESULT
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -85,14 +85,17 @@ def publish_result(prediction_id, result):
             "result": result,
         }
         
+        # Формат и сжатие тела задаются MESSAGE_FORMAT и MESSAGE_COMPRESSION
+        body, message_properties = encode_message(message, KIND_RESULT)
+        
         # Публикуем сообщение
         channel.basic_publish(
             exchange='',
             routing_key=ML_RESULT_QUEUE,
-            body=json.dumps(message),
+            body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # Делаем сообщение постоянным
-                content_type='application/json'
+                **message_properties
             )
         )
         
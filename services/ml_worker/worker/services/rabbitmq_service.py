@@ -1,11 +1,15 @@
 """
 Сервис для работы с RabbitMQ.
 """
-import json
+import os
 import logging
 import time
 import pika
 
+from services.ml_worker.worker.config.settings import ML_TASK_DONE_QUEUE, FAIR_USER_HEADER, FAIR_LEASE_HEADER
+from ml_service.messages import encode_message, KIND_RESULT
+from ml_service.tracing import tracer, KIND_PRODUCER
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -61,13 +65,15 @@ def wait_for_rabbitmq():
     logger.error("Не удалось подключиться к RabbitMQ после нескольких попыток")
     return False
 
-def publish_result(prediction_id, result):
+@tracer.traced("publish_result", KIND_PRODUCER)
+def publish_result(prediction_id, result, user_id=None):
     """
     Публикует результат предсказания в очередь результатов RabbitMQ.
     
     Args:
         prediction_id: ID предсказания
         result: Результат предсказания
+        user_id: ID пользователя (по нему проектор обновляет сводку user_dashboard)
         
     Returns:
         bool: True если публикация успешна, False в случае ошибки
@@ -79,9 +85,12 @@ def publish_result(prediction_id, result):
             "result": result,
             "timestamp": time.time()
         }
+        if user_id is not None:
+            message["user_id"] = user_id
         
-        # Конвертируем сообщение в JSON
-        message_json = json.dumps(message)
+        # Формат и сжатие тела задаются MESSAGE_FORMAT и MESSAGE_COMPRESSION
+        body, message_properties = encode_message(message, KIND_RESULT)
+        tracer.inject(message_properties["headers"])
         
         # Получаем соединение с RabbitMQ
         connection = get_rabbitmq_connection()
@@ -94,10 +103,10 @@ def publish_result(prediction_id, result):
         channel.basic_publish(
             exchange='',
             routing_key=ML_RESULT_QUEUE,
-            body=message_json,
+            body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # делаем сообщение постоянным
-                content_type='application/json'
+                **message_properties
             )
         )
         
@@ -108,4 +117,27 @@ def publish_result(prediction_id, result):
     
     except Exception as e:
         logger.error(f"Ошибка при публикации результата предсказания: {e}")
-        return False 
\ No newline at end of file
+        return False
+
+def publish_task_done(channel, properties) -> None:
+    """
+    Сообщает диспетчеру о завершении задачи.
+
+    Args:
+        channel: Канал RabbitMQ, на котором воркер получил задачу
+        properties: Свойства сообщения задачи
+    """
+    headers = properties.headers or {}
+    user = headers.get(FAIR_USER_HEADER)
+    if user is None:
+        return
+    lease = headers.get(FAIR_LEASE_HEADER)
+    channel.basic_publish(
+        exchange='',
+        routing_key=ML_TASK_DONE_QUEUE,
+        body=str(user).encode('utf-8'),
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            headers={FAIR_LEASE_HEADER: lease} if lease is not None else None
+        )
+    )
@@ -0,0 +1,353 @@
+"""
+Возврат зависших задач в очередь.
+
+Задача зависает, если воркер упал во время обработки (истек срок захвата)
+или если сообщение потерялось и предсказание слишком долго остается в
+статусе pending. Reaper периодически находит такие предсказания по индексу
+(status, created_at), пакетами заново отправляет их в очередь и увеличивает
+счетчик попыток. Задачи, исчерпавшие TASK_MAX_ATTEMPTS попыток, переводятся
+в статус dead с возвратом средств.
+
+Долгое ожидание само по себе не значит, что сообщение потеряно: при
+большой очереди оно может все еще ждать воркера, и повторная отправка
+создала бы дубликат. Поэтому ожидающие задачи считаются потерянными, только
+если в брокере не осталось сообщений задач: рабочие очереди полос, их
+очереди ожидания повторной попытки и подочереди диспетчера (по его
+последнему отчету) пусты. Пока очереди не разобраны, такие задачи не
+трогаются; если сообщение действительно потеряно, по истечении deadline
+предсказание получит статус expired с возвратом средств.
+
+Задача возвращается в очередь своего источника: задачи бота - в
+интерактивную полосу ML_INTERACTIVE_QUEUE, остальные - в ML_TASK_QUEUE.
+"""
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+import pika
+from sqlalchemy import text
+
+from ml_service.db_config import SessionLocal
+from services.ml_worker.worker.config.settings import (
+    REAPER_INTERVAL,
+    REAPER_BATCH_SIZE,
+    REAPER_PENDING_TIMEOUT,
+    TASK_MAX_ATTEMPTS,
+    ML_INTERACTIVE_QUEUE,
+    ML_DISPATCH_QUEUE,
+    ML_BACKLOG_QUEUE,
+    FAIR_DISPATCH_ENABLED,
+    RETRY_DELAYS
+)
+from services.ml_worker.worker.services.refund_service import mark_and_refund
+from services.ml_worker.worker.services.expiration_service import expire_predictions
+from services.ml_worker.worker.services.retry_service import retry_queue_name
+from services.ml_worker.worker.services.rabbitmq_service import (
+    get_rabbitmq_connection,
+    wait_for_rabbitmq,
+    ML_TASK_QUEUE
+)
+from services.ml_worker.worker.services.worker_service import wait_for_db
+from ml_service import codec
+from ml_service.messages import encode_message, KIND_TASK
+from ml_service.admission import decode_backlog_report
+
+logger = logging.getLogger(__name__)
+
+# Источник задач, возвращенных в очередь
+TASK_SOURCE_REAPER = "reaper"
+# Источник задач бота: они возвращаются в интерактивную полосу
+TASK_SOURCE_BOT = "bot"
+
+# Очереди, в которых может находиться сообщение задачи
+TASK_QUEUES = [ML_TASK_QUEUE, ML_DISPATCH_QUEUE, ML_INTERACTIVE_QUEUE] + [
+    retry_queue_name(queue, delay)
+    for queue in (ML_TASK_QUEUE, ML_INTERACTIVE_QUEUE)
+    for delay in RETRY_DELAYS
+]
+
+# Захват воркером истек: воркер упал во время обработки
+LEASE_EXPIRED_CONDITION = "(status = 'processing' AND lease_expires_at < NOW())"
+# Задача слишком долго ожидает. У повторно отправленной задачи
+# lease_expires_at хранит срок следующей проверки.
+PENDING_STALE_CONDITION = (
+    "(status = 'pending' AND created_at < NOW() - make_interval(secs => :pending_timeout) "
+    "AND (lease_expires_at IS NULL OR lease_expires_at < NOW()))"
+)
+
+REQUEUE_SQL = """
+UPDATE predictions p
+SET status = 'pending', processed_by = NULL,
+    lease_expires_at = NOW() + make_interval(secs => :pending_timeout)
+WHERE p.id IN (
+    SELECT id FROM predictions
+    WHERE {condition} AND attempts < :max_attempts
+    ORDER BY created_at
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING p.id, p.user_id, p.input_data, p.created_at, p.deadline, p.attempts, p.source
+"""
+
+
+def stuck_condition(include_pending: bool) -> str:
+    """
+    Условие отбора зависших задач.
+
+    Args:
+        include_pending: Считать ли потерянными долго ожидающие задачи
+
+    Returns:
+        str: SQL-условие
+    """
+    condition = f"({LEASE_EXPIRED_CONDITION} OR {PENDING_STALE_CONDITION})" if include_pending \
+        else LEASE_EXPIRED_CONDITION
+    return f"{condition} AND (deadline IS NULL OR deadline > NOW())"
+
+
+def task_queue(source: Optional[str]) -> str:
+    """Очередь, в которую возвращается задача источника source."""
+    return ML_INTERACTIVE_QUEUE if source == TASK_SOURCE_BOT else ML_TASK_QUEUE
+
+
+def build_task_message(row) -> Dict[str, Any]:
+    """
+    Восстанавливает сообщение задачи по записи предсказания.
+
+    Args:
+        row: Строка результата REQUEUE_SQL
+
+    Returns:
+        dict: Сообщение задачи
+    """
+    prediction_id, user_id, input_data, created_at, deadline = row[:5]
+    if isinstance(input_data, str):
+        input_data = codec.loads(input_data)
+    message = {
+        "prediction_id": prediction_id,
+        "user_id": user_id,
+        "data": input_data,
+        "timestamp": created_at.isoformat(),
+        "source": TASK_SOURCE_REAPER
+    }
+    if deadline is not None:
+        message["deadline"] = deadline.isoformat()
+    return message
+
+
+class Reaper:
+    """
+    Периодический поиск зависших задач.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = REAPER_BATCH_SIZE,
+        pending_timeout: int = REAPER_PENDING_TIMEOUT,
+        max_attempts: int = TASK_MAX_ATTEMPTS
+    ):
+        self.batch_size = batch_size
+        self.pending_timeout = pending_timeout
+        self.max_attempts = max_attempts
+        self.connection = None
+        self.channel = None
+
+    def _ensure_channel(self):
+        if self.connection is None or self.connection.is_closed:
+            self.connection = get_rabbitmq_connection()
+            self.channel = self.connection.channel()
+            # Запись в БД фиксируется только после подтверждения публикации брокером
+            self.channel.confirm_delivery()
+            self.channel.queue_declare(queue=ML_TASK_QUEUE, durable=True)
+            self.channel.queue_declare(queue=ML_INTERACTIVE_QUEUE, durable=True)
+        return self.channel
+
+    def queued_tasks(self) -> Optional[int]:
+        """
+        Количество сообщений задач, еще находящихся в брокере.
+
+        Сообщения, выданные воркерам и еще не подтвержденные, не учитываются,
+        но воркер захватывает задачу сразу после получения.
+
+        Returns:
+            int или None, если состояние очередей неизвестно
+        """
+        connection = get_rabbitmq_connection()
+        try:
+            queued = 0
+            for queue in TASK_QUEUES:
+                # Ошибка пассивного объявления закрывает канал, поэтому каждая
+                # очередь проверяется в своем канале; отсутствующая очередь пуста
+                channel = connection.channel()
+                try:
+                    frame = channel.queue_declare(queue=queue, passive=True)
+                except Exception:
+                    continue
+                queued += frame.method.message_count
+                channel.close()
+
+            if FAIR_DISPATCH_ENABLED:
+                channel = connection.channel()
+                method, _, body = channel.basic_get(queue=ML_BACKLOG_QUEUE, auto_ack=False)
+                if method is None:
+                    # Диспетчер еще не сообщал о своих подочередях
+                    return None
+                channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                # Последний отчет учитывается независимо от возраста: подочереди
+                # остановленного диспетчера сохраняются в брокере
+                queued += decode_backlog_report(body, max_age=float("inf"))
+            return queued
+        except Exception as e:
+            logger.warning(f"Не удалось получить состояние очередей задач: {e}")
+            return None
+        finally:
+            connection.close()
+
+    def bury(self, db, include_pending: bool = False) -> int:
+        """
+        Переводит зависшие задачи без оставшихся попыток в статус dead.
+
+        Args:
+            db: Сессия базы данных
+            include_pending: Считать ли потерянными долго ожидающие задачи
+
+        Returns:
+            int: Количество задач, переведенных в dead
+        """
+        return mark_and_refund(
+            db, "dead", f"{stuck_condition(include_pending)} AND attempts >= :max_attempts",
+            {"pending_timeout": self.pending_timeout, "max_attempts": self.max_attempts},
+            description="Возврат за невыполненное предсказание #",
+            limit=self.batch_size
+        )
+
+    def requeue(self, db, include_pending: bool = False) -> int:
+        """
+        Отправляет пакет зависших задач в очередь их источника заново.
+
+        Args:
+            db: Сессия базы данных
+            include_pending: Считать ли потерянными долго ожидающие задачи
+
+        Returns:
+            int: Количество отправленных задач
+        """
+        try:
+            rows = db.execute(
+                text(REQUEUE_SQL.format(condition=stuck_condition(include_pending))),
+                {
+                    "pending_timeout": self.pending_timeout,
+                    "max_attempts": self.max_attempts,
+                    "limit": self.batch_size
+                }
+            ).fetchall()
+            if not rows:
+                db.rollback()
+                return 0
+
+            channel = self._ensure_channel()
+            now = datetime.now()
+            for row in rows:
+                message = build_task_message(row)
+                deadline = row[4]
+                expiration = None
+                if deadline is not None:
+                    expiration = str(max(1, int((deadline - now).total_seconds() * 1000)))
+                body, message_properties = encode_message(message, KIND_TASK)
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=task_queue(row[6]),
+                    body=body,
+                    properties=pika.BasicProperties(
+                        delivery_mode=2,
+                        expiration=expiration,
+                        **message_properties
+                    )
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        logger.info(
+            f"Возвращено в очередь зависших задач: {len(rows)} "
+            f"(попыток использовано: {', '.join(str(row[5]) for row in rows[:10])})"
+        )
+        return len(rows)
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Выполняет один проход: истекшие, исчерпавшие попытки и зависшие задачи.
+
+        Returns:
+            dict: Количество обработанных задач по видам
+        """
+        stats = {"expired": 0, "dead": 0, "requeued": 0}
+        # Ожидающие задачи считаются потерянными, только если их сообщений
+        # не может быть в брокере
+        include_pending = self.queued_tasks() == 0
+        db = SessionLocal()
+        try:
+            while True:
+                expired = expire_predictions(db, limit=self.batch_size)
+                stats["expired"] += expired
+                if expired < self.batch_size:
+                    break
+            while True:
+                dead = self.bury(db, include_pending)
+                stats["dead"] += dead
+                if dead < self.batch_size:
+                    break
+            while True:
+                requeued = self.requeue(db, include_pending)
+                stats["requeued"] += requeued
+                if requeued < self.batch_size:
+                    break
+        finally:
+            db.close()
+
+        if any(stats.values()):
+            logger.info(
+                f"Reaper: истекших {stats['expired']}, dead {stats['dead']}, "
+                f"возвращено в очередь {stats['requeued']}"
+            )
+        return stats
+
+    def run(self, interval: float = REAPER_INTERVAL) -> None:
+        """Запускает периодический поиск зависших задач."""
+        logger.info(
+            f"Reaper запущен: интервал {interval} с, пакет {self.batch_size}, "
+            f"максимум попыток {self.max_attempts}"
+        )
+        while True:
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка при поиске зависших задач: {e}")
+                self.connection = None
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def run_reaper():
+    """
+    Запускает reaper зависших задач.
+
+    Returns:
+        bool: False, если reaper завершился с ошибкой
+    """
+    if not wait_for_db():
+        logger.error("Не удалось подключиться к базе данных")
+        return False
+
+    if not wait_for_rabbitmq():
+        logger.error("Не удалось подключиться к RabbitMQ")
+        return False
+
+    try:
+        Reaper().run()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал прерывания, завершаем работу")
+        return True
+
+    return False
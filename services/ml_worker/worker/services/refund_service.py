@@ -0,0 +1,79 @@
+"""
+Завершение невыполненных предсказаний с возвратом средств.
+
+Используется для задач, которые воркеры не будут выполнять: просроченных
+и исчерпавших попытки. Статус, транзакции возврата и балансы обновляются
+одним запросом для целого пакета предсказаний.
+"""
+import logging
+from typing import Any, Dict
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Переводит выбранные по условию предсказания в итоговый статус и возвращает
+# их стоимость. Условие должно включать исходный статус, чтобы повторный
+# запрос не вернул средства дважды.
+MARK_AND_REFUND_SQL = """
+WITH marked AS (
+    UPDATE predictions
+    SET status = :status, completed_at = NOW(), lease_expires_at = NULL
+    WHERE id IN (
+        SELECT id FROM predictions
+        WHERE {condition}
+        ORDER BY created_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, user_id, cost
+),
+refunds AS (
+    INSERT INTO transactions (user_id, amount, type, status, description, related_entity_id)
+    SELECT user_id, cost, 'refund', 'completed', :description || id, id
+    FROM marked
+    RETURNING user_id, amount
+),
+refunded AS (
+    UPDATE balances b
+    SET amount = b.amount + r.total, updated_at = NOW()
+    FROM (SELECT user_id, SUM(amount) AS total FROM refunds GROUP BY user_id) r
+    WHERE b.user_id = r.user_id
+    RETURNING b.user_id
+)
+SELECT COUNT(*) FROM marked
+"""
+
+
+def mark_and_refund(
+    db: Session,
+    status: str,
+    condition: str,
+    params: Dict[str, Any],
+    description: str,
+    limit: int
+) -> int:
+    """
+    Переводит пакет предсказаний в итоговый статус и возвращает их стоимость.
+
+    Args:
+        db: Сессия базы данных
+        status: Итоговый статус предсказаний
+        condition: SQL-условие отбора предсказаний
+        params: Параметры условия
+        description: Описание транзакции возврата, к нему добавляется ID предсказания
+        limit: Максимальный размер пакета
+
+    Returns:
+        int: Количество обработанных предсказаний
+    """
+    try:
+        marked = db.execute(
+            text(MARK_AND_REFUND_SQL.format(condition=condition)),
+            {**params, "status": status, "description": description, "limit": limit}
+        ).scalar()
+        db.commit()
+        return marked
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,183 @@
+"""
+Повторная обработка задач после ошибок.
+
+Сообщение, обработка которого завершилась ошибкой, публикуется в очередь
+ожидания с TTL. По истечении TTL брокер через dead letter exchange
+возвращает его в исходную очередь, поэтому задержка не занимает воркер.
+Задачи из очереди диспетчера ML_DISPATCH_QUEUE возвращаются не в нее, а во
+входную очередь ML_TASK_QUEUE: повторная попытка снова проходит через
+диспетчер и учитывается в лимитах пользователя как новая выдача.
+Номер попытки и причина ошибки передаются в заголовках сообщения, контекст
+трассы и время публикации обновляются, поэтому задержка перед повторной
+попыткой видна в трассе отдельным спаном ожидания. После
+исчерпания попыток сообщение попадает в ML_DEAD_QUEUE, а предсказание
+переводится в статус dead с возвратом средств.
+"""
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from ml_service.db_config import SessionLocal
+from services.ml_worker.worker.config.settings import (
+    RETRY_DELAYS,
+    ML_DEAD_QUEUE,
+    ML_TASK_QUEUE,
+    ML_DISPATCH_QUEUE,
+    RETRY_COUNT_HEADER,
+    FAILURE_REASON_HEADER
+)
+from services.ml_worker.worker.services.refund_service import mark_and_refund
+from ml_service.messages import decode_message
+from ml_service.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Ошибки в самом сообщении: повтор не поможет
+NON_RETRYABLE_ERRORS = (ValueError, KeyError, TypeError)
+
+
+def retry_queue_name(queue: str, delay: int) -> str:
+    """Имя очереди ожидания перед повторной попыткой."""
+    return f"{queue}.retry.{delay}s"
+
+
+def failure_reason(error: Exception) -> str:
+    """Причина ошибки для заголовка и метрик."""
+    return type(error).__name__
+
+
+class RetryPolicy:
+    """
+    Повторные попытки с экспоненциально растущей задержкой и очередь недоставленных.
+    """
+
+    def __init__(
+        self,
+        delays: Optional[List[int]] = None,
+        dead_queue: str = ML_DEAD_QUEUE,
+        return_queues: Optional[Dict[str, str]] = None
+    ):
+        """
+        Args:
+            delays: Задержки перед повторными попытками, секунды
+            dead_queue: Очередь недоставленных сообщений
+            return_queues: Рабочая очередь -> очередь, в которую возвращается
+                повторная попытка (по умолчанию - та же очередь)
+        """
+        self.delays = list(RETRY_DELAYS if delays is None else delays)
+        self.dead_queue = dead_queue
+        self.return_queues = {ML_DISPATCH_QUEUE: ML_TASK_QUEUE} if return_queues is None else dict(return_queues)
+        # (причина, исход) -> количество
+        self.failures = Counter()
+        self._last_report = time.monotonic()
+
+    def declare(self, channel, queues: Iterable[str]) -> None:
+        """
+        Объявляет очереди ожидания для каждой рабочей очереди и очередь недоставленных.
+
+        Args:
+            channel: Канал RabbitMQ
+            queues: Рабочие очереди, в которые возвращаются сообщения
+        """
+        channel.queue_declare(queue=self.dead_queue, durable=True)
+        for queue in {self.return_queue(queue) for queue in queues}:
+            channel.queue_declare(queue=queue, durable=True)
+            for delay in self.delays:
+                channel.queue_declare(
+                    queue=retry_queue_name(queue, delay),
+                    durable=True,
+                    arguments={
+                        "x-message-ttl": delay * 1000,
+                        "x-dead-letter-exchange": "",
+                        "x-dead-letter-routing-key": queue
+                    }
+                )
+
+    def return_queue(self, queue: str) -> str:
+        """Очередь, в которую возвращается повторная попытка задачи из queue."""
+        return self.return_queues.get(queue, queue)
+
+    def handle_failure(self, ch, method, properties, body, error: Exception) -> str:
+        """
+        Отправляет сообщение на повторную попытку или в очередь недоставленных.
+
+        Исходное сообщение подтверждается вызывающим кодом.
+
+        Args:
+            ch: Канал RabbitMQ
+            method: Метод доставки сообщения
+            properties: Свойства сообщения
+            body: Тело сообщения
+            error: Ошибка обработки
+
+        Returns:
+            str: "retry" или "dead"
+        """
+        reason = failure_reason(error)
+        headers = dict(properties.headers or {})
+        retry_count = int(headers.get(RETRY_COUNT_HEADER, 0))
+
+        if isinstance(error, NON_RETRYABLE_ERRORS) or retry_count >= len(self.delays):
+            outcome = "dead"
+            routing_key = self.dead_queue
+        else:
+            outcome = "retry"
+            routing_key = retry_queue_name(self.return_queue(method.routing_key), self.delays[retry_count])
+
+        headers[RETRY_COUNT_HEADER] = retry_count + 1
+        headers[FAILURE_REASON_HEADER] = reason
+        # Ожидание повторной попытки отсчитывается от этой публикации, а не от исходной
+        properties.headers = tracer.inject(headers)
+        # Срок задачи проверяется воркером по полю deadline; TTL сообщения
+        # не должен сработать в очереди ожидания раньше задержки
+        properties.expiration = None
+
+        ch.basic_publish(exchange='', routing_key=routing_key, body=body, properties=properties)
+        self.failures[(reason, outcome)] += 1
+
+        if outcome == "dead":
+            logger.error(f"Задача отправлена в {self.dead_queue} после {retry_count + 1} попыток: {reason}")
+            self._bury(body, properties)
+        else:
+            logger.warning(
+                f"Повторная попытка {retry_count + 1}/{len(self.delays)} через "
+                f"{self.delays[retry_count]} с: {reason}"
+            )
+        return outcome
+
+    def _bury(self, body, properties=None) -> None:
+        """Переводит предсказание в статус dead и возвращает средства."""
+        try:
+            prediction_id = decode_message(body, properties)["prediction_id"]
+        except Exception:
+            return
+        db = SessionLocal()
+        try:
+            mark_and_refund(
+                db, "dead", "id = :prediction_id AND status IN ('pending', 'processing')",
+                {"prediction_id": prediction_id},
+                description="Возврат за невыполненное предсказание #",
+                limit=1
+            )
+        except Exception as e:
+            # Предсказание найдет reaper
+            logger.error(f"Не удалось перевести предсказание {prediction_id} в статус dead: {e}")
+        finally:
+            db.close()
+
+    def maybe_report(self, interval: float) -> None:
+        """Пишет в лог счетчики ошибок по причинам, если прошел интервал."""
+        if time.monotonic() - self._last_report < interval:
+            return
+        self._last_report = time.monotonic()
+        if not self.failures:
+            return
+        summary = ", ".join(
+            f"{reason}/{outcome}={count}" for (reason, outcome), count in sorted(self.failures.items())
+        )
+        logger.info(f"Ошибки обработки по причинам: {summary}")
+
+
+# Общая для воркера политика повторных попыток
+retry_policy = RetryPolicy()
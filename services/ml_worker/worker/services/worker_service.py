@@ -10,8 +10,18 @@ from sqlalchemy.orm import Session
 
 from ml_service.db_config import SessionLocal
 from ml_service.models import Prediction
+from ml_service.tracing import setup_tracing
 from services.ml_worker.worker.services.message_processor import process_message
-from services.ml_worker.worker.services.rabbitmq_service import wait_for_rabbitmq
+from services.ml_worker.worker.services.rabbitmq_service import wait_for_rabbitmq, publish_task_done
+from services.ml_worker.worker.services.expiration_service import expired_tasks
+from services.ml_worker.worker.services.retry_service import retry_policy
+from services.ml_worker.worker.services.lanes import (
+    Lane, LaneScheduler, LaneReporter, LANE_INTERACTIVE, LANE_BULK
+)
+from services.ml_worker.worker.config.settings import (
+    FAIR_DISPATCH_ENABLED, ML_DISPATCH_QUEUE, ML_TASK_DONE_QUEUE,
+    ML_INTERACTIVE_QUEUE, LANE_INTERACTIVE_WEIGHT, LANE_BULK_WEIGHT, LANE_PREFETCH, LANE_STATS_INTERVAL
+)
 
 # Настройки RabbitMQ
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
@@ -21,6 +31,9 @@ RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
 ML_TASK_QUEUE = "ml_tasks"
 
+# Массовые задачи при включенном диспетчере воркеры читают из его очереди
+WORKER_TASK_QUEUE = ML_DISPATCH_QUEUE if FAIR_DISPATCH_ENABLED else ML_TASK_QUEUE
+
 # Идентификатор воркера
 WORKER_ID = os.getenv("WORKER_ID", f"worker-{socket.gethostname()}-{os.getpid()}")
 
@@ -68,6 +81,8 @@ def create_message_processor(worker_id):
             process_message(ch, method, properties, body, worker_id, db)
         finally:
             db.close()
+            if FAIR_DISPATCH_ENABLED:
+                publish_task_done(ch, properties)
     
     return _process_message
 
@@ -85,6 +100,8 @@ def run_worker():
         logger.error("Не удалось подключиться к RabbitMQ")
         return False
     
+    setup_tracing("ml-worker")
+    
     # Ожидаем, чтобы дать время другим сервисам запуститься
     time.sleep(5)
     
@@ -102,21 +119,48 @@ def run_worker():
         connection = pika.BlockingConnection(parameters)
         channel = connection.channel()
         
-        # Объявляем очередь
-        channel.queue_declare(queue=ML_TASK_QUEUE, durable=True)
+        lanes = [
+            Lane(name=LANE_INTERACTIVE, queue=ML_INTERACTIVE_QUEUE, weight=LANE_INTERACTIVE_WEIGHT),
+            Lane(name=LANE_BULK, queue=WORKER_TASK_QUEUE, weight=LANE_BULK_WEIGHT),
+        ]
+        scheduler = LaneScheduler(lanes)
+        reporter = LaneReporter(lanes, interval=LANE_STATS_INTERVAL)
+        
+        # Объявляем очереди
+        for lane in lanes:
+            channel.queue_declare(queue=lane.queue, durable=True)
+        if FAIR_DISPATCH_ENABLED:
+            channel.queue_declare(queue=ML_TASK_DONE_QUEUE, durable=True)
+        retry_policy.declare(channel, [lane.queue for lane in lanes])
         
-        # Настраиваем prefetch (сколько сообщений обрабатывать за раз)
-        channel.basic_qos(prefetch_count=1)
+        # Prefetch действует на каждого потребителя: из каждой полосы воркер держит
+        # задачу в работе и задачу про запас, чтобы выбор между полосами не зависел
+        # от задержки доставки следующего сообщения
+        channel.basic_qos(prefetch_count=LANE_PREFETCH)
         
         # Создаем обработчик сообщений с передачей worker_id
         message_processor = create_message_processor(WORKER_ID)
         
-        # Начинаем потреблять сообщения
-        channel.basic_consume(queue=ML_TASK_QUEUE, on_message_callback=message_processor)
+        # Начинаем потреблять сообщения: доставки складываются в полосы
+        for lane in lanes:
+            channel.basic_consume(queue=lane.queue, on_message_callback=scheduler.consumer_for(lane))
+        
+        logger.info(
+            f"ML Worker {WORKER_ID} запущен и ожидает сообщения из очередей "
+            f"{', '.join(f'{lane.queue} (вес {lane.weight})' for lane in lanes)}"
+        )
         
-        logger.info(f"ML Worker {WORKER_ID} запущен и ожидает сообщения")
-        channel.start_consuming()
-        return True
+        while True:
+            connection.process_data_events(time_limit=0 if scheduler.has_ready() else 1)
+            selected = scheduler.next()
+            if selected is not None:
+                lane, (ch, method, properties, body) = selected
+                started = time.monotonic()
+                message_processor(ch, method, properties, body)
+                reporter.observe(lane, body, time.monotonic() - started, properties)
+            expired_tasks.tick()
+            reporter.maybe_report(channel)
+            retry_policy.maybe_report(LANE_STATS_INTERVAL)
     
     except KeyboardInterrupt:
         logger.info("Получен сигнал прерывания, завершаем работу")